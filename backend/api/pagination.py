@@ -0,0 +1,130 @@
+import base64
+import json
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+
+
+class KeysetPagination(BasePagination):
+    """
+    Постраничная выдача по ключу (keyset/cursor) без COUNT и OFFSET.
+
+    Список упорядочивается по `ordering` представления (по умолчанию `-created_at, -id`), последний ключ
+    страницы кодируется в непрозрачный курсор `next`. Следующая страница выбирается условием
+    "ключ меньше курсора", поэтому её стоимость не зависит от номера страницы и размера таблицы.
+    Для `has_more` читается одна лишняя строка, общее количество не считается.
+
+    Постраничная выдача включается параметрами запроса `limit` (не больше `max_page_size`) и/или `cursor`,
+    ответ тогда `{"results": [...], "next": str | null, "has_more": bool}`. Без них возвращается
+    весь список обычным массивом, как раньше (на него рассчитан фронтенд).
+    """
+    ordering = ('-created_at', '-id')
+    page_size = 50
+    max_page_size = 500
+    limit_query_param = 'limit'
+    cursor_query_param = 'cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.limit_query_param not in request.query_params and self.cursor_query_param not in request.query_params:
+            return None
+
+        ordering = getattr(view, 'ordering', None) or self.ordering
+        limit = self.get_limit(request)
+
+        queryset = queryset.order_by(*ordering)
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            queryset = queryset.filter(self.after_key(ordering, self.decode_cursor(cursor, queryset.model, ordering)))
+
+        page = list(queryset[:limit + 1])
+        self.has_more = len(page) > limit
+        page = page[:limit]
+        self.next_cursor = self.encode_cursor(page[-1], ordering) if self.has_more else None
+        return page
+
+    def get_paginated_response(self, data):
+        return Response({
+            'results': data,
+            'next': self.next_cursor,
+            'has_more': self.has_more,
+        })
+
+    def get_limit(self, request) -> int:
+        value = request.query_params.get(self.limit_query_param)
+        if not value:
+            return self.page_size
+        try:
+            limit = int(value)
+        except ValueError:
+            limit = 0
+        if limit <= 0:
+            raise ValidationError({self.limit_query_param: "Размер страницы должен быть положительным числом."})
+        return min(limit, self.max_page_size)
+
+    @staticmethod
+    def after_key(ordering, values) -> Q:
+        """
+        Условие "строка идёт после ключа `values`" для составного ключа:
+        `(a, b) > (x, y)` <=> `a > x OR (a = x AND b > y)` (для убывающих полей - `<`).
+        """
+        condition = Q()
+        equal = {}
+        for field, value in zip(ordering, values):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= Q(**equal, **{f"{name}__{lookup}": value})
+            equal[name] = value
+        return condition
+
+    def encode_cursor(self, instance, ordering) -> str:
+        values = []
+        for field in ordering:
+            value = getattr(instance, field.lstrip('-'))
+            values.append(value.isoformat() if hasattr(value, 'isoformat') else value)
+        return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+    def decode_cursor(self, cursor: str, model, ordering) -> list:
+        """Значения ключа из курсора, приведённые к типам полей `ordering`."""
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            if not isinstance(values, list) or len(values) != len(ordering):
+                raise ValueError(cursor)
+            return [
+                model._meta.get_field(field.lstrip('-')).to_python(value)
+                for field, value in zip(ordering, values)
+            ]
+        except (ValueError, TypeError, DjangoValidationError):
+            raise ValidationError({self.cursor_query_param: "Неверный курсор."})
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.limit_query_param,
+                'required': False,
+                'in': 'query',
+                'description': f"Размер страницы (по умолчанию {self.page_size}, не больше {self.max_page_size}). "
+                               "Без `limit` и `cursor` список возвращается целиком массивом.",
+                'schema': {'type': 'integer'},
+            },
+            {
+                'name': self.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': "Курсор следующей страницы (`next` из предыдущего ответа).",
+                'schema': {'type': 'string'},
+            },
+        ]
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results', 'next', 'has_more'],
+            'properties': {
+                'results': schema,
+                'next': {'type': 'string', 'nullable': True, 'example': 'WyIyMDI1LTAzLTAzVDEwOjAwOjAwKzAzOjAwIiwgNDJd'},
+                'has_more': {'type': 'boolean', 'example': True},
+            },
+        }
@@ -1,7 +1,6 @@
 from rest_framework import serializers
 from backend.models import documents
 from backend.scripts.field_validate import field_validate
-from backend.scripts.fill_document import find_fields
 import os
 
 class TemplateSerializer(serializers.ModelSerializer):
@@ -14,10 +13,13 @@ class TemplateSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
     def get_found_fields(self, obj):
-        """Получаем список найденных полей в шаблоне"""
-        if obj.template_file:
-            return find_fields(obj.template_file)
-        return []
+        """
+        Получаем список найденных полей в шаблоне.
+        Поля извлекаются из файла при загрузке шаблона и хранятся в `Template.found_fields`.
+        Сериализатор ничего не записывает: старые записи без `found_fields` заполняет команда `scan_templates`,
+        до этого для них возвращается пустой список.
+        """
+        return obj.found_fields if obj.found_fields is not None else []
 
     def validate_template_file(self, value):
         """Проверка что файл является валидным DOCX"""
@@ -60,6 +62,13 @@ class DocumentSerializer(serializers.ModelSerializer):
         model = documents.Document
         fields = '__all__'
 
+class DocumentJobSerializer(serializers.ModelSerializer):
+    save_path = serializers.CharField(source='document.save_path', read_only=True)
+
+    class Meta:
+        model = documents.DocumentJob
+        exclude = ['payload']
+
 class DocumentFieldSerializer(serializers.ModelSerializer):
     type = serializers.ChoiceField(choices=documents.DocumentField.FIELD_TYPES)
 
@@ -92,3 +101,27 @@ class TableFieldValueSerializer(serializers.ModelSerializer):
     class Meta:
         model = documents.TableValues
         fields = '__all__'
+
+
+class DocumentBatchItemSerializer(serializers.Serializer):
+    """
+    Элемент пакетного создания документов (`document/save/batch/`). Проверяет только форму элемента:
+    значения полей проверяются позже через `field_validate` по полям шаблона.
+    """
+    template_id = serializers.IntegerField()
+    data = serializers.ListField(
+        child=serializers.DictField(),
+        help_text="Список объектов {field_id, value}; значение-список - столбец таблицы",
+    )
+    shown_date = serializers.DateField(
+        required=False,
+        allow_null=True,
+        input_formats=['iso-8601'],
+        error_messages={'invalid': "Дата должна быть в формате ГГГГ-ММ-ДД."},
+    )
+
+    def to_internal_value(self, data):
+        # Пустая строка означает дату по умолчанию, как в одиночном создании документа
+        if isinstance(data, dict) and data.get('shown_date') == "":
+            data = {**data, 'shown_date': None}
+        return super().to_internal_value(data)
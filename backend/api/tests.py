@@ -0,0 +1,832 @@
+import base64
+import datetime
+import io
+import json
+import os
+import tempfile
+import time
+import zipfile
+from decimal import Decimal
+from unittest import mock
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils.cache import quote_etag
+from docx import Document as Docx
+from rest_framework.renderers import JSONRenderer
+
+from core.settings.base import MEDIA_ROOT
+
+from api.renderers import ORJSONRenderer
+from api.views.documents import DocumentExportView, parse_range
+from api.views.schema import envelope
+from backend.middleware import SessionRefreshMiddleware
+from backend.models.company import Contractor, ContractorPerson, Executor, ExecutorPerson
+from backend.models.documents import Document, DocumentCounter, DocumentField, DocumentJob, DocumentsValues, TableField, Template
+from backend.models.fields import Field
+from backend.models.user import User, UsersValues
+from backend.scripts import document_batch
+from backend.scripts.document_queue import run_job
+
+
+def make_docx() -> io.BytesIO:
+    """Шаблон документа: плейсхолдеры в абзаце и таблица со строкой "RC"."""
+    document = Docx()
+    document.add_paragraph("Дата {{ order_date }} № {{ order_number }} {{ custom1 }} итог {{ total_cost }}")
+    table = document.add_table(rows=2, cols=3)
+    for index, header in enumerate(["№", "Работа", "Цена"]):
+        table.rows[0].cells[index].text = header
+        table.rows[1].cells[index].text = f"RC{index}"
+    buffer = io.BytesIO()
+    document.save(buffer)
+    buffer.seek(0)
+    buffer.name = "act.docx"
+    return buffer
+
+
+class ApiTestCase(TestCase):
+    """Компания-исполнитель с пользователем, лицами и шаблоном; клиент вошёл под `self.user`."""
+
+    def setUp(self):
+        self.executor = Executor.objects.create(company_name="Исполнитель")
+        self.user = User.objects.create_user(username="owner", password="Passw0rd", company=self.executor, is_company_superuser=True)
+        self.executor_person = ExecutorPerson.objects.create(
+            person_type="ООО Исполнитель", first_name="Иван", last_name="Иванов", surname="Иванович",
+            post="Директор", company=self.executor,
+        )
+        self.contractor = Contractor.objects.create(company_name="Заказчик", related_executor=self.executor)
+        self.contractor_person = self.create_contractor_person(0)
+        self.template = Template.objects.create(
+            template_name="Акт", template_type="ACT", found_fields=[],
+            related_executor_person=self.executor_person, related_contractor_person=self.contractor_person,
+        )
+        self.login(self.user)
+
+        files = tempfile.TemporaryDirectory()
+        self.addCleanup(files.cleanup)
+        self.files_dir = files.name
+
+    def login(self, user: User):
+        self.client.force_login(user)
+        # Сессия только что продлена: SessionRefreshMiddleware не будет записывать её при запросах теста
+        session = self.client.session
+        session[SessionRefreshMiddleware.REFRESHED_AT_KEY] = int(time.time())
+        session.save()
+
+    def create_contractor_person(self, n: int) -> ContractorPerson:
+        return ContractorPerson.objects.create(
+            person_type="ООО Заказчик", first_name=f"Пётр{n}", last_name="Петров", surname="Петрович",
+            post="Директор", company=self.contractor, contractor_city="Москва", contract_number=n,
+            contract_date=datetime.datetime(2025, 1, 1, tzinfo=datetime.timezone.utc),
+        )
+
+    def upload_template(self) -> Template:
+        """
+        Загружает шаблон `make_docx()` через API и добавляет ему поле документа `custom1`.
+        Созданные в `MEDIA_ROOT` файлы (шаблон и документы) удаляются после теста.
+        """
+        before = set(MEDIA_ROOT.rglob("*"))
+
+        def remove_new_files():
+            for path in sorted(set(MEDIA_ROOT.rglob("*")) - before, reverse=True):
+                path.unlink() if path.is_file() else path.rmdir()
+        self.addCleanup(remove_new_files)
+
+        call_command("create_initial_fields", stdout=io.StringIO())
+        response = self.client.post("/templates/", {
+            "0[fieldId]": "template_name", "0[value]": "Акт_docx",
+            "1[fieldId]": "template_type", "1[value]": "ACT",
+            "2[fieldId]": "related_executor_person", "2[value]": str(self.executor_person.id),
+            "3[fieldId]": "related_contractor_person", "3[value]": str(self.contractor_person.id),
+            "4[fieldId]": "template_file", "4[value]": make_docx(),
+        })
+        self.assertEqual(response.status_code, 201, response.content)
+        template = Template.objects.get(pk=response.json()["details"]["id"])
+        response = self.client.post(f"/templates/{template.id}/fields/", {"data": [
+            {"field_id": "name", "value": "Поле"}, {"field_id": "key_name", "value": "custom1"},
+            {"field_id": "is_required", "value": True}, {"field_id": "type", "value": "TEXT"},
+        ]}, content_type="application/json")
+        self.assertIn(response.status_code, (200, 201), response.content)
+        return template
+
+    def create_document(self, template: Template | None = None, content: bytes = b"0123456789") -> Document:
+        """Документ шаблона `template` (по умолчанию `self.template`) с файлом `content`."""
+        template = template or self.template
+        path = os.path.join(self.files_dir, f"{Document.objects.count()}.docx")
+        with open(path, "wb") as file:
+            file.write(content)
+        return Document.objects.create(template=template, shown_date=datetime.date(2025, 1, 1), save_path=path)
+
+
+class TenantIsolationTests(ApiTestCase):
+    """Пользователь без компании и пользователь другой компании не видят чужих документов."""
+
+    def setUp(self):
+        super().setUp()
+        self.other_executor = Executor.objects.create(company_name="Другой исполнитель")
+        self.other_user = User.objects.create_user(username="other", password="Passw0rd", company=self.other_executor)
+        self.no_company_user = User.objects.create_user(username="nobody", password="Passw0rd")
+        # Шаблон без лица исполнителя: `related_executor_person__company_id IS NULL`
+        self.orphan_template = Template.objects.create(template_name="Без исполнителя", template_type="ACT", found_fields=[])
+        self.document = self.create_document()
+        self.orphan_document = self.create_document(self.orphan_template)
+
+    def test_download_owner(self):
+        response = self.client.get(f"/document/download/{self.document.id}/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b"".join(response.streaming_content), b"0123456789")
+
+    def test_download_user_without_company(self):
+        self.login(self.no_company_user)
+        for document in (self.document, self.orphan_document):
+            with self.subTest(document=document.id):
+                self.assertEqual(self.client.get(f"/document/download/{document.id}/").status_code, 404)
+
+    def test_download_other_company(self):
+        self.login(self.other_user)
+        for document in (self.document, self.orphan_document):
+            with self.subTest(document=document.id):
+                self.assertEqual(self.client.get(f"/document/download/{document.id}/").status_code, 404)
+
+    def export_names(self) -> list[str]:
+        response = self.client.get("/document/export/")
+        self.assertEqual(response.status_code, 200)
+        with zipfile.ZipFile(io.BytesIO(b"".join(response.streaming_content))) as archive:
+            return sorted(name for name in archive.namelist() if name != "manifest.csv")
+
+    def test_export_owner(self):
+        self.assertEqual(self.export_names(), [f"{self.document.id}_Акт.docx"])
+
+    def test_export_user_without_company(self):
+        self.login(self.no_company_user)
+        self.assertEqual(self.export_names(), [])
+
+    def test_export_other_company(self):
+        self.login(self.other_user)
+        self.assertEqual(self.export_names(), [])
+
+
+    def list_ids(self, url: str) -> list[int]:
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return sorted(item["id"] for item in response.json()["details"])
+
+    def test_lists_owner(self):
+        self.assertEqual(self.list_ids("/document/list/"), [self.document.id])
+        self.assertEqual(self.list_ids("/templates/company/current/"), [self.template.id])
+
+    def test_lists_user_without_company(self):
+        self.login(self.no_company_user)
+        self.assertEqual(self.list_ids("/document/list/"), [])
+        self.assertEqual(self.list_ids("/templates/company/current/"), [])
+
+    def test_lists_other_company(self):
+        self.login(self.other_user)
+        self.assertEqual(self.list_ids("/document/list/"), [])
+        self.assertEqual(self.list_ids("/templates/company/current/"), [])
+
+
+    def test_job_status(self):
+        job = DocumentJob.objects.create(document=self.document, payload={})
+        orphan_job = DocumentJob.objects.create(document=self.orphan_document, payload={})
+        self.assertEqual(self.client.get(f"/document/jobs/{job.id}/").status_code, 200)
+        for user in (self.no_company_user, self.other_user):
+            self.login(user)
+            for checked in (job, orphan_job):
+                with self.subTest(user=user.username, job=checked.id):
+                    self.assertEqual(self.client.get(f"/document/jobs/{checked.id}/").status_code, 404)
+
+
+
+class DocumentDownloadTests(ApiTestCase):
+    """Условные запросы, загрузка по частям и имя файла при скачивании документа."""
+
+    def setUp(self):
+        super().setUp()
+        self.document = self.create_document()
+        self.url = f"/document/download/{self.document.id}/"
+
+    def get(self, **headers):
+        response = self.client.get(self.url, headers=headers)
+        body = b"".join(response.streaming_content) if response.streaming else response.content
+        return response, body
+
+    def test_parse_range(self):
+        cases = {
+            "bytes=0-4": (0, 4),
+            "bytes=5-": (5, 9),
+            "bytes=3-100": (3, 9),
+            " bytes=9-9 ": (9, 9),
+            "bytes=-3": (7, 9),
+            "bytes=-20": (0, 9),
+            "bytes=-0": False,
+            "bytes=10-": False,
+            "bytes=4-2": None,
+            "bytes=-": None,
+            "bytes=0-1,4-5": None,
+            "items=0-1": None,
+        }
+        for header, expected in cases.items():
+            with self.subTest(header=header):
+                self.assertEqual(parse_range(header, 10), expected)
+
+    def test_full_file(self):
+        response, body = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(body, b"0123456789")
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+        self.assertEqual(response["ETag"], quote_etag(self.document.get_content_hash()))
+
+    def test_filename_rfc5987(self):
+        response, _ = self.get()
+        name = f"{self.document.id}_Акт.docx"
+        self.assertEqual(self.document.download_name(), name)
+        self.assertIn(f"filename*=utf-8''{quote(name)}", response["Content-Disposition"])
+        self.assertTrue(response["Content-Disposition"].startswith("attachment"))
+        # Тот же заголовок у ответа с диапазоном
+        response, _ = self.get(Range="bytes=0-1")
+        self.assertIn(f"filename*=utf-8''{quote(name)}", response["Content-Disposition"])
+
+    def test_partial_content(self):
+        for header, body, content_range in [
+            ("bytes=2-5", b"2345", "bytes 2-5/10"),
+            ("bytes=7-", b"789", "bytes 7-9/10"),
+            ("bytes=-3", b"789", "bytes 7-9/10"),
+            ("bytes=-50", b"0123456789", "bytes 0-9/10"),
+        ]:
+            with self.subTest(header=header):
+                response, content = self.get(Range=header)
+                self.assertEqual(response.status_code, 206)
+                self.assertEqual(content, body)
+                self.assertEqual(response["Content-Range"], content_range)
+                self.assertEqual(response["Content-Length"], str(len(body)))
+
+    def test_range_not_satisfiable(self):
+        for header in ("bytes=10-", "bytes=-0"):
+            with self.subTest(header=header):
+                response, _ = self.get(Range=header)
+                self.assertEqual(response.status_code, 416)
+                self.assertEqual(response["Content-Range"], "bytes */10")
+
+    def test_multiple_ranges_return_whole_file(self):
+        # Несколько диапазонов (multipart/byteranges) не поддерживаются: отдаётся весь файл
+        response, body = self.get(Range="bytes=0-1,4-5")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(body, b"0123456789")
+
+    def test_if_range(self):
+        etag = self.get()[0]["ETag"]
+        last_modified = self.get()[0]["Last-Modified"]
+        for if_range, expected in [(etag, 206), (last_modified, 206), ('"stale"', 200), ("Wed, 01 Jan 2020 00:00:00 GMT", 200)]:
+            with self.subTest(if_range=if_range):
+                response, body = self.get(Range="bytes=0-1", **{"If-Range": if_range})
+                self.assertEqual(response.status_code, expected)
+                self.assertEqual(body, b"01" if expected == 206 else b"0123456789")
+
+    def test_not_modified(self):
+        first, _ = self.get()
+        for headers in ({"If-None-Match": first["ETag"]}, {"If-Modified-Since": first["Last-Modified"]}):
+            with self.subTest(headers=headers):
+                response, body = self.get(**headers)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(body, b"")
+                self.assertEqual(response["ETag"], first["ETag"])
+        # If-None-Match важнее If-Modified-Since
+        response, _ = self.get(**{"If-None-Match": '"other"', "If-Modified-Since": first["Last-Modified"]})
+        self.assertEqual(response.status_code, 200)
+
+    def test_etag_follows_content(self):
+        etag = self.get()[0]["ETag"]
+        other = self.create_document(content=b"other")
+        self.assertNotEqual(self.client.get(f"/document/download/{other.id}/")["ETag"], etag)
+
+
+class KeysetPaginationTests(ApiTestCase):
+    url = "/document/list/"
+
+    def setUp(self):
+        super().setUp()
+        # Пары документов с одинаковым `created_at`: порядок внутри пары задаёт `id`
+        moments = [datetime.datetime(2025, 1, day, tzinfo=datetime.timezone.utc) for day in (1, 1, 2, 2, 3)]
+        self.documents = [self.create_document() for _ in moments]
+        for document, moment in zip(self.documents, moments):
+            Document.objects.filter(pk=document.pk).update(created_at=moment)
+        self.expected = [document.id for document in reversed(self.documents)]
+
+    def page(self, **params) -> dict:
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()["details"]
+
+    def collect(self, limit: int) -> list[int]:
+        ids, cursor = [], None
+        while True:
+            page = self.page(limit=limit, **({"cursor": cursor} if cursor else {}))
+            ids += [item["id"] for item in page["results"]]
+            self.assertEqual(page["has_more"], page["next"] is not None)
+            if not page["has_more"]:
+                return ids
+            cursor = page["next"]
+
+    def test_unpaginated(self):
+        # Без `limit` и `cursor` - весь список обычным массивом
+        self.assertEqual(sorted(item["id"] for item in self.page()), sorted(self.expected))
+
+    def test_cursor_round_trip(self):
+        # Ни одна строка не теряется и не повторяется, в том числе на границе одинаковых `created_at`
+        for limit in (1, 2, 3, 5, 10):
+            with self.subTest(limit=limit):
+                self.assertEqual(self.collect(limit), self.expected)
+
+    def test_has_more_boundary(self):
+        page = self.page(limit=5)
+        self.assertEqual(len(page["results"]), 5)
+        self.assertFalse(page["has_more"])
+        self.assertIsNone(page["next"])
+
+        page = self.page(limit=4)
+        self.assertTrue(page["has_more"])
+        last = self.page(limit=4, cursor=page["next"])
+        self.assertEqual([item["id"] for item in last["results"]], self.expected[4:])
+        self.assertFalse(last["has_more"])
+
+    def test_ties_on_created_at(self):
+        # Курсор указывает на первый из двух документов с одинаковым `created_at`
+        page = self.page(limit=2)
+        self.assertEqual([item["id"] for item in page["results"]], self.expected[:2])
+        page = self.page(limit=1, cursor=page["next"])
+        self.assertEqual([item["id"] for item in page["results"]], [self.expected[2]])
+
+    def test_malformed_cursor(self):
+        valid = self.page(limit=1)["next"]
+        for cursor in ("garbage", "!!!", base64.urlsafe_b64encode(b"[1]").decode(), base64.urlsafe_b64encode(b'["x", 1]').decode(), valid[:-4]):
+            with self.subTest(cursor=cursor):
+                response = self.client.get(self.url, {"cursor": cursor})
+                self.assertEqual(response.status_code, 400)
+                self.assertIn("cursor", response.json()["errors"])
+
+    def test_invalid_limit(self):
+        for limit in ("0", "-1", "x"):
+            with self.subTest(limit=limit):
+                self.assertEqual(self.client.get(self.url, {"limit": limit}).status_code, 400)
+        self.assertEqual(len(self.page(limit=10 ** 6)["results"]), 5)
+
+
+class FieldsSchemaTests(ApiTestCase):
+    url = "/company/fields/"
+
+    def setUp(self):
+        super().setUp()
+        self.field = Field.objects.create(id="executor_test", name="Тест", key_name="test", related_item="Executor", type="TEXT")
+
+    def test_etag(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("test", [item["key_name"] for item in response.json()["details"]])
+        self.assertTrue(response["ETag"].startswith('"'))
+        self.assertIn("no-cache", response["Cache-Control"])
+
+    def test_not_modified(self):
+        etag = self.client.get(self.url)["ETag"]
+        response = self.client.get(self.url, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+        self.assertEqual(response["ETag"], etag)
+        # Чужой ETag (или любой из списка) - обычный ответ
+        self.assertEqual(self.client.get(self.url, headers={"If-None-Match": '"other"'}).status_code, 200)
+        self.assertEqual(self.client.get(self.url, headers={"If-None-Match": f'"other", {etag}'}).status_code, 304)
+
+    def test_etag_changes_after_field_edit(self):
+        etag = self.client.get(self.url)["ETag"]
+        self.field.name = "Другое название"
+        self.field.save()
+
+        response = self.client.get(self.url, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertIn("Другое название", [item["name"] for item in response.json()["details"]])
+
+        new_etag = response["ETag"]
+        Field.objects.create(id="executor_added", name="Новое", key_name="added", related_item="Executor", type="TEXT")
+        self.assertEqual(self.client.get(self.url, headers={"If-None-Match": new_etag}).status_code, 200)
+
+
+class DocumentBatchTests(ApiTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.docx_template = self.upload_template()
+
+    def item(self, **extra) -> dict:
+        return {"template_id": self.docx_template.id, "data": [{"field_id": "custom1", "value": "x"}], **extra}
+
+    def post(self, items, query: str = ""):
+        return self.client.post(f"/document/save/batch/{query}", {"items": items}, content_type="application/json")
+
+    def test_create(self):
+        response = self.post([self.item(), self.item(shown_date=""), {"template_id": 999999, "data": []}])
+        self.assertEqual(response.status_code, 201, response.content)
+        items = response.json()["details"]["items"]
+        self.assertIsNone(items[0]["errors"])
+        self.assertIsNone(items[1]["errors"])
+        self.assertIn("template_id", items[2]["errors"])
+        for document in Document.objects.filter(template=self.docx_template):
+            self.assertEqual(document.status, "READY")
+            self.assertTrue(os.path.isfile(document.save_path))
+
+    def test_malformed_items(self):
+        response = self.post([self.item(), {"template_id": self.docx_template.id}, "x", self.item(shown_date="03.03.2025")])
+        self.assertEqual(response.status_code, 400)
+        errors = response.json()["errors"]["items"]
+        self.assertEqual(errors[0], {})
+        self.assertIn("data", errors[1])
+        self.assertIn("non_field_errors", errors[2])
+        self.assertIn("shown_date", errors[3])
+        self.assertFalse(Document.objects.filter(template=self.docx_template).exists())
+
+    def test_user_without_company(self):
+        self.login(User.objects.create_user(username="nobody", password="Passw0rd"))
+        response = self.post([self.item()])
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("template_id", response.json()["errors"]["items"][0]["errors"])
+
+    def test_failed_render_is_marked(self):
+        def render_many(tasks):
+            return [{"error": "boom", "content": None}] + [document_batch.render_to_bytes(task) for task in tasks[1:]]
+
+        with mock.patch("api.views.documents.render_many", render_many):
+            response = self.post([self.item(), self.item()])
+        self.assertEqual(response.status_code, 201, response.content)
+        failed, done = response.json()["details"]["items"]
+        self.assertEqual(failed["document"]["status"], "FAILED")
+        self.assertIn("boom", failed["errors"]["unknown"])
+        self.assertEqual(done["document"]["status"], "READY")
+        self.assertFalse(Document.objects.get(pk=failed["document"]["id"]).save_path)
+
+    def test_zip(self):
+        response = self.post([self.item(), self.item()], query="?zip=true")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        with zipfile.ZipFile(io.BytesIO(b"".join(response.streaming_content))) as archive:
+            names = archive.namelist()
+            results = json.loads(archive.read("results.json"))
+        documents = Document.objects.filter(template=self.docx_template).order_by("id")
+        self.assertEqual(sorted(names), sorted([doc.download_name() for doc in documents] + ["results.json"]))
+        self.assertEqual([item["document"]["id"] for item in results], [doc.id for doc in documents])
+
+    @override_settings(DOCUMENT_BATCH_PROCESSES=2)
+    def test_shared_pool(self):
+        self.addCleanup(setattr, document_batch, "_pool", None)
+        pools = []
+        for _ in range(2):
+            self.assertEqual(self.post([self.item(), self.item(), self.item()]).status_code, 201)
+            pools.append(document_batch._pool)
+        self.assertIs(pools[0], pools[1])
+        self.assertEqual(pools[0]._max_workers, 2)
+        self.assertEqual(Document.objects.filter(template=self.docx_template, status="READY").count(), 6)
+
+
+class DocumentCreateTests(ApiTestCase):
+    """Создание документа: значения полей, строки таблицы и файл, заполненный в памяти за один проход."""
+
+    def setUp(self):
+        super().setUp()
+        self.docx_template = self.upload_template()
+        for order, (key_name, extra) in enumerate([("n", {"is_autoincremental": True}), ("work", {}), ("price", {"is_summable": True})]):
+            TableField.objects.create(
+                id=f"{key_name}__{self.docx_template.id}", name=key_name, key_name=key_name, related_item="TableField",
+                type="TEXT", order=order, related_template=self.docx_template, **extra,
+            )
+        self.data = [
+            {"field_id": "custom1", "value": "Значение"},
+            {"field_id": "work", "value": ["Разработка", "Поддержка"]},
+            {"field_id": "price", "value": ["100.10", "0.20"]},
+        ]
+
+    def post(self, data=None, query: str = ""):
+        return self.client.post(
+            f"/document/save/{self.docx_template.id}/{query}", {"data": self.data if data is None else data, "shown_date": "2025-03-03"},
+            content_type="application/json",
+        )
+
+    def test_create(self):
+        response = self.post()
+        self.assertEqual(response.status_code, 201, response.content)
+        document = Document.objects.get(pk=response.json()["details"]["id"])
+        self.assertEqual(document.status, "READY")
+        self.assertEqual(document.shown_date, datetime.date(2025, 3, 3))
+
+        self.assertEqual(list(DocumentsValues.objects.filter(document_id=document).values_list("field_id__key_name", "value")), [("custom1", "Значение")])
+        self.assertEqual(document.get_table(), [["1", "Разработка", "100.10"], ["2", "Поддержка", "0.20"]])
+
+        docx = Docx(document.save_path)
+        text = docx.paragraphs[0].text
+        self.assertIn("Значение", text)
+        self.assertIn(f"№ {document.document_number}", text)
+        self.assertIn("100,30", text)
+        self.assertIn("Разработка", [cell.text for row in docx.tables[0].rows for cell in row.cells])
+        # Временные файлы не создаются: в хранилище только сам документ
+        self.assertFalse([name for name in os.listdir(os.path.dirname(document.save_path)) if name.endswith(".tmp")])
+
+    def test_invalid_data_rolls_back(self):
+        count = Document.objects.count()
+        response = self.post([{"field_id": "custom1", "value": "x"}, {"field_id": "price", "value": ["1", "abc"]}])
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("price", response.json()["errors"])
+        self.assertEqual(Document.objects.count(), count)
+
+    def test_found_fields_stored(self):
+        # Плейсхолдеры найдены при загрузке шаблона и при чтении списка не извлекаются из файла заново
+        self.assertIn("custom1", self.docx_template.found_fields)
+        with mock.patch("backend.scripts.template_cache.CompiledTemplate") as compiled:
+            response = self.client.get("/templates/company/current/")
+        compiled.assert_not_called()
+        found = {item["id"]: item["found_fields"] for item in response.json()["details"]}
+        self.assertEqual(found[self.docx_template.id], self.docx_template.found_fields)
+        self.assertEqual(found[self.template.id], [])
+
+    def test_async_job(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.post(query="?async=true")
+        self.assertEqual(response.status_code, 202, response.content)
+        job = DocumentJob.objects.get(pk=response.json()["details"]["id"])
+        self.assertEqual(job.status, "QUEUED")
+        self.assertEqual(job.document.status, "PENDING")
+        self.assertEqual(len(callbacks), 1)
+
+        # Задачу выполняет фоновый поток; здесь - синхронно, в соединении теста
+        with mock.patch("backend.scripts.document_queue.close_old_connections"):
+            self.assertTrue(run_job(job.id))
+            self.assertFalse(run_job(job.id))
+        response = self.client.get(f"/document/jobs/{job.id}/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["details"]["status"], "DONE")
+        job.document.refresh_from_db()
+        self.assertEqual(job.document.status, "READY")
+        self.assertTrue(os.path.isfile(job.document.save_path))
+
+    def test_async_job_failure(self):
+        with self.captureOnCommitCallbacks():
+            job_id = self.post(query="?async=true").json()["details"]["id"]
+        with mock.patch("backend.scripts.document_queue.close_old_connections"), \
+                mock.patch("backend.scripts.document_queue.fill_document", return_value={"error": "boom"}):
+            run_job(job_id)
+        job = DocumentJob.objects.select_related("document").get(pk=job_id)
+        self.assertEqual((job.status, job.error, job.document.status), ("FAILED", "boom", "FAILED"))
+
+
+class DocumentExportTests(ApiTestCase):
+
+    def test_manifest_and_files(self):
+        first = self.create_document(content=b"first")
+        missing = self.create_document()
+        os.remove(missing.save_path)
+        Document.objects.filter(pk=missing.pk).update(shown_date=datetime.date(2025, 2, 1))
+
+        response = self.client.get("/document/export/")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        with zipfile.ZipFile(io.BytesIO(b"".join(response.streaming_content))) as archive:
+            self.assertEqual(archive.read(f"{first.id}_Акт.docx"), b"first")
+            manifest = archive.read("manifest.csv").decode("utf-8-sig").splitlines()
+        self.assertEqual(manifest[0].split(","), DocumentExportView.MANIFEST_HEADER)
+        self.assertEqual([line.split(",")[0] for line in manifest[1:]], [str(first.id), str(missing.id)])
+        # Файла нет на диске - в манифесте пустое имя
+        self.assertEqual(manifest[2].split(",")[-1], "")
+
+    def test_filters(self):
+        self.create_document()
+        response = self.client.get("/document/export/", {"date_from": "2025-02-01"})
+        with zipfile.ZipFile(io.BytesIO(b"".join(response.streaming_content))) as archive:
+            self.assertEqual(archive.namelist(), ["manifest.csv"])
+        self.assertEqual(self.client.get("/document/export/", {"date_from": "01.02.2025"}).status_code, 400)
+
+
+class SessionRefreshTests(ApiTestCase):
+
+    def session_writes(self) -> int:
+        with CaptureQueriesContext(connection) as captured:
+            self.assertEqual(self.client.get("/document/list/").status_code, 200)
+        return sum(1 for query in captured if "django_session" in query["sql"] and not query["sql"].startswith("SELECT"))
+
+    def test_fresh_session_not_written(self):
+        self.assertEqual(self.session_writes(), 0)
+        self.assertEqual(self.session_writes(), 0)
+
+    def test_stale_session_refreshed(self):
+        session = self.client.session
+        session[SessionRefreshMiddleware.REFRESHED_AT_KEY] = int(time.time()) - settings.SESSION_COOKIE_AGE
+        session.save()
+        self.assertEqual(self.session_writes(), 1)
+        self.assertEqual(self.session_writes(), 0)
+
+
+class EnvelopeTests(ApiTestCase):
+
+    def test_envelope(self):
+        self.assertEqual(envelope([1], 200), {"details": [1], "errors": None})
+        self.assertEqual(envelope({"a": "b"}, 400), {"details": None, "errors": {"a": "b"}})
+        self.assertEqual(envelope(None, 500), {"details": None, "errors": None})
+
+    def test_responses(self):
+        response = self.client.get("/document/list/", {"date_from": "x"})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {"details": None, "errors": {"date_from": "Дата должна быть в формате ГГГГ-ММ-ДД."}})
+
+        self.create_document()
+        response = self.client.get("/document/list/")
+        self.assertEqual(response["Content-Type"], "application/json")
+        self.assertIsNone(response.json()["errors"])
+        self.assertEqual(response.json()["details"][0]["shown_date"], "2025-01-01")
+
+    def test_renderer(self):
+        content = ORJSONRenderer().render({"sum": Decimal("1.10"), "text": "строка\u2028", "at": datetime.datetime(2025, 1, 1, 10, 0)})
+        self.assertEqual(content, JSONRenderer().render({"sum": Decimal("1.10"), "text": "строка\u2028", "at": datetime.datetime(2025, 1, 1, 10, 0)}))
+
+
+class DocumentNumberTests(ApiTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.docx_template = self.upload_template()
+
+    def post(self):
+        return self.client.post(
+            f"/document/save/{self.docx_template.id}/",
+            {"data": [{"field_id": "custom1", "value": "x"}]},
+            content_type="application/json",
+        )
+
+    def test_sequential_numbers(self):
+        first, second = self.post(), self.post()
+        self.assertEqual(first.status_code, 201, first.content)
+        numbers = [first.json()["details"]["document_number"], second.json()["details"]["document_number"]]
+        self.assertEqual(numbers, [numbers[0], numbers[0] + 1])
+
+    def test_number_allocated_outside_document_transaction(self):
+        depths = []
+        next_value = DocumentCounter.next_value
+
+        def record(scope):
+            depths.append(len(connection.atomic_blocks))
+            return next_value(scope)
+
+        outer = len(connection.atomic_blocks)
+        with mock.patch.object(DocumentCounter, "next_value", record):
+            self.assertEqual(self.post().status_code, 201)
+        # Только транзакции самого теста: счётчик не обновляется внутри транзакции создания документа
+        self.assertEqual(depths, [outer])
+
+    def test_failed_render_skips_number(self):
+        first = self.post().json()["details"]["document_number"]
+        with mock.patch("api.views.documents.fill_document", return_value={"error": "boom"}):
+            self.assertEqual(self.post().status_code, 400)
+        self.assertEqual(self.post().json()["details"]["document_number"], first + 2)
+        self.assertEqual(Document.objects.filter(template=self.docx_template).count(), 2)
+
+
+class PurgeDocumentFilesTests(ApiTestCase):
+
+    def write(self, name: str, age: int) -> str:
+        path = os.path.join(self.files_dir, name)
+        with open(path, "wb") as file:
+            file.write(b"0")
+        mtime = time.time() - age
+        os.utime(path, (mtime, mtime))
+        return path
+
+    def test_min_age_applies_to_every_file(self):
+        referenced = self.create_document().save_path
+        old_file, old_tmp = self.write("old.docx", 7200), self.write("old.tmp", 7200)
+        # Свежие файлы могут принадлежать ещё не завершённой транзакции
+        new_file, new_tmp = self.write("new.docx", 0), self.write("new.tmp", 0)
+
+        with mock.patch("backend.management.commands.purge_document_files.DOCUMENTS_FOLDER", self.files_dir):
+            call_command("purge_document_files", stdout=io.StringIO())
+
+        self.assertTrue(os.path.exists(referenced))
+        self.assertFalse(os.path.exists(old_file))
+        self.assertFalse(os.path.exists(old_tmp))
+        self.assertTrue(os.path.exists(new_file))
+        self.assertTrue(os.path.exists(new_tmp))
+
+
+@override_settings(QUERY_BUDGET_CHECKS=True)
+class ListQueryBudgetTests(ApiTestCase):
+    """
+    Списки API выполняют одинаковое число запросов к БД для 1 и для 100 элементов (нет N+1).
+    С `QUERY_BUDGET_CHECKS` представление само проверяет свой `query_budget` и падает при превышении.
+    """
+
+    def custom_field(self, n: int, related_item: str, **extra) -> dict:
+        return {
+            "id": f"custom{n}__{self.executor.id}", "name": f"Поле {n}", "key_name": f"custom{n}",
+            "related_item": related_item, "type": "TEXT", **extra,
+        }
+
+    # Каждый метод дописывает элементы списка так, чтобы всего их стало `count`
+
+    def add_users(self, start: int, count: int):
+        User.objects.bulk_create(
+            User(username=f"user{n}", company=self.executor) for n in range(start, count)
+        )
+
+    def add_contractors(self, start: int, count: int):
+        Contractor.objects.bulk_create(
+            Contractor(company_name=f"Заказчик {n}", related_executor=self.executor) for n in range(start, count)
+        )
+
+    def add_executor_persons(self, start: int, count: int):
+        ExecutorPerson.objects.bulk_create(
+            ExecutorPerson(first_name=f"Иван{n}", last_name="Иванов", surname="Иванович", post="Директор", company=self.executor)
+            for n in range(start, count)
+        )
+
+    def add_contractor_persons(self, start: int, count: int):
+        for n in range(start, count):
+            self.create_contractor_person(n)
+
+    def add_user_fields(self, start: int, count: int):
+        Field.objects.bulk_create(
+            Field(is_custom=True, **self.custom_field(n, "User")) for n in range(start, count)
+        )
+
+    def add_user_values(self, start: int, count: int):
+        self.add_user_fields(start, count)
+        UsersValues.objects.bulk_create(
+            UsersValues(id=f"owner__custom{n}", user_id=self.user, field_id_id=f"custom{n}__{self.executor.id}", value=str(n))
+            for n in range(start, count)
+        )
+
+    def add_templates(self, start: int, count: int):
+        Template.objects.bulk_create(
+            Template(
+                template_name=f"Акт {n}", template_type="ACT", found_fields=[],
+                related_executor_person=self.executor_person, related_contractor_person=self.contractor_person,
+            )
+            for n in range(start, count)
+        )
+
+    def add_document_fields(self, start: int, count: int):
+        DocumentField.objects.bulk_create(
+            DocumentField(related_template=self.template, **self.custom_field(n, "DocumentField"))
+            for n in range(start, count)
+        )
+
+    def add_table_fields(self, start: int, count: int):
+        TableField.objects.bulk_create(
+            TableField(related_template=self.template, order=n, **self.custom_field(n, "TableField"))
+            for n in range(start, count)
+        )
+
+    def add_documents(self, start: int, count: int):
+        Document.objects.bulk_create(
+            Document(template=self.template, shown_date=datetime.date(2025, 1, 1), document_number=n + 1)
+            for n in range(start, count)
+        )
+
+    def get_list(self, url: str) -> tuple[int, list]:
+        """Число запросов к БД и элементы списка по адресу `url`."""
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, response.content)
+        details = response.json()["details"]
+        return len(captured), details["results"] if isinstance(details, dict) else details
+
+    def assert_constant_queries(self, url: str, add_items, existing: int = 0, query: str = ""):
+        """Список из 1 и из 100 элементов; `existing` - сколько элементов создано в `setUp`."""
+        add_items(existing, 1)
+        queries_one, items = self.get_list(url + query)
+        self.assertEqual(len(items), 1)
+
+        add_items(1, 100)
+        queries_many, items = self.get_list(url + query)
+        self.assertEqual(len(items), 100)
+        self.assertEqual(queries_many, queries_one)
+
+    def test_constant_queries(self):
+        # (адрес, метод добавления элементов, сколько элементов создано в `setUp`, параметры запроса)
+        lists = [
+            ("/company/users/", self.add_users, 1, ""),
+            ("/company/contractors/", self.add_contractors, 1, ""),
+            ("/persons/executor/", self.add_executor_persons, 1, ""),
+            ("/persons/contractor/", self.add_contractor_persons, 1, ""),
+            ("/user/values/", self.add_user_values, 0, ""),
+            ("/templates/company/current/", self.add_templates, 1, ""),
+            (f"/templates/company/{self.executor.id}/", self.add_templates, 1, ""),
+            (f"/templates/{self.template.id}/fields/", self.add_document_fields, 0, ""),
+            (f"/document/save/{self.template.id}/", self.add_document_fields, 0, ""),
+            (f"/templates/tables/{self.template.id}/", self.add_table_fields, 0, ""),
+            ("/document/list/", self.add_documents, 0, ""),
+            ("/document/list/", self.add_documents, 0, "?limit=500"),
+            ("/templates/company/current/", self.add_templates, 1, "?limit=500"),
+        ]
+        for url, add_items, existing, query in lists:
+            with self.subTest(url=url + query), transaction.atomic():
+                self.assert_constant_queries(url, add_items, existing, query)
+                # Элементы одного списка не должны попасть в следующий
+                transaction.set_rollback(True)
@@ -47,8 +47,11 @@ urlpatterns = [
 
     # Вставить про документы
     path('document/save/<int:tid>/', documents.DocumentFieldsCreateView.as_view(), name='document_create'),
+    path('document/save/batch/', documents.DocumentBatchCreateView.as_view(), name='document_batch_create'),
     path('document/list/', documents.DocumentListView.as_view(), name='document_list'),
-    path('document/download/<int:did>/', documents.DocumentDownloadView, name='document_download'),
+    path('document/export/', documents.DocumentExportView.as_view(), name='document_export'),
+    path('document/download/<int:did>/', documents.DocumentDownloadView.as_view(), name='document_download'),
+    path('document/jobs/<int:pk>/', documents.DocumentJobView.as_view(), name='document_job'),
 
     path('document/types/', documents.DocumentTypesView.as_view(), name='document_types'),
     path('field/types/', documents.FieldTypesView.as_view(), name='field_types'),
@@ -1,5 +1,7 @@
 from rest_framework import generics
 from api.views.schema import SchemaAPIView
+from api.pagination import KeysetPagination
+from api.views.field import fields_schema_response
 from rest_framework.exceptions import ValidationError
 # Permissions
 from rest_framework.permissions import AllowAny
@@ -29,7 +31,6 @@ from backend.models.user import User, UsersValues
 from backend.models.fields import Field
 # Validation
 from backend.scripts.field_validate import field_validate
-from backend.scripts.find_datavalue import find_dataValue
 from backend.scripts.load_data import load_data
 # autodoc
 from drf_spectacular.utils import (
@@ -163,14 +164,14 @@ class CompanyRegisterView(SchemaAPIView, generics.ListCreateAPIView):
 
     def get(self, request, *args, **kwargs):
         self. details_serializer = FieldSerializer
-        return generics.ListCreateAPIView.get(self, request, *args, **kwargs)
+        return fields_schema_response(request, "Executor")
 
     def create(self, request, *args, **kwargs):
         data = load_data(request.data)
 
-        error = field_validate(data, "Executor")
-        if error is not None:
-            raise ValidationError({error["field_id"]: error["error"]})
+        errors = field_validate(data, "Executor")
+        if errors is not None:
+            raise ValidationError(errors)
 
         username = None
         password = None
@@ -419,11 +420,15 @@ class CompanyUsersView(SchemaAPIView, generics.ListAPIView):
     serializer_class = UserSerializer
     details_serializer = UserSerializer
     error_messages = {}
+    pagination_class = KeysetPagination
+    ordering = ('username',)
+    query_budget = 3
 
     def get_queryset(self):
-        if not self.request.user.company:
-            return []
-        return User.objects.filter(company=self.request.user.company)
+        if not self.request.user.company_id:
+            return User.objects.none()
+        # UserSerializer выводит компанию вложенным объектом
+        return User.objects.filter(company_id=self.request.user.company_id).select_related('company')
 
 
 class CompanyUserPCView(SchemaAPIView, generics.GenericAPIView):
@@ -561,23 +566,23 @@ class ContractorCreateView(SchemaAPIView, generics.ListCreateAPIView):
 
     def get(self, request, *args, **kwargs):
         self.details_serializer = FieldSerializer
-        return generics.ListCreateAPIView.get(self, request, *args, **kwargs)
+        return fields_schema_response(request, "Contractor")
 
     def create(self, request, *args, **kwargs):
         data = load_data(request.data)
 
-        error = field_validate(data, "Contractor")
-        if error is not None:
-            raise ValidationError({error["field_id"]: error["error"]})
+        errors = field_validate(data, "Contractor")
+        if errors is not None:
+            raise ValidationError(errors)
 
         try:
             contractor = Contractor.objects.create(
-                company_name = find_dataValue(data, "company_name"),
-                company_fullName = find_dataValue(data, "company_fullName"),
+                company_name = data.get("company_name"),
+                company_fullName = data.get("company_fullName"),
                 related_executor=request.user.company
             )
         except Exception as e:
-            if "UNIQUE constraint" in str(e):
+            if "unique constraint" in str(e).lower():
                 raise ValidationError({"company_name": "Данная компания-заказчик уже существует в этой компании."})
             raise ValidationError({"unknown": f"Ошибка создания заказчика: {e}"})
         
@@ -641,9 +646,12 @@ class ContractorListView(SchemaAPIView, generics.ListAPIView):
     serializer_class = ContractorSerializer
     details_serializer = ContractorSerializer
     permission_classes = [IsAuthed]
+    pagination_class = KeysetPagination
+    ordering = ('-created_at', '-id')
+    query_budget = 3
 
     def get_queryset(self):
-        return Contractor.objects.filter(related_executor=self.request.user.company.id)
+        return Contractor.objects.filter(related_executor_id=self.request.user.company_id)
 
 
 class ContractorDeleteView(SchemaAPIView, generics.RetrieveDestroyAPIView):
@@ -725,28 +733,29 @@ class ExecutorPersonListCreateView(SchemaAPIView, generics.ListCreateAPIView):
     serializer_class = CompanyExecutorPersonSerializer
     details_serializer = CompanyExecutorPersonSerializer
     permission_classes = [IsAuthedOrReadOnly]
+    query_budget = 3
 
     def get_queryset(self):
-        return ExecutorPerson.objects.filter(company=self.request.user.company)
+        return ExecutorPerson.objects.filter(company_id=self.request.user.company_id)
     
     def create(self, request, *args, **kwargs):
         data = load_data(request.data)
 
-        error = field_validate(data, "ExecutorPerson")
-        if error is not None:
-            raise ValidationError({error["field_id"]: error["error"]})
+        errors = field_validate(data, "ExecutorPerson")
+        if errors is not None:
+            raise ValidationError(errors)
 
         try:
             person = ExecutorPerson.objects.create(
-                person_type=find_dataValue(data, "person_type"),
-                first_name=find_dataValue(data, "first_name"),
-                last_name=find_dataValue(data, "last_name"),
-                surname=find_dataValue(data, "surname"),
-                post=find_dataValue(data, "post"),
+                person_type=data.get("person_type"),
+                first_name=data.get("first_name"),
+                last_name=data.get("last_name"),
+                surname=data.get("surname"),
+                post=data.get("post"),
                 company=request.user.company,
             )
         except Exception as e:
-            if "UNIQUE constraint" in str(e):
+            if "unique constraint" in str(e).lower():
                 raise ValidationError({"FCs": "Юридическое лицо данной компании с данным ФИО уже существует."})
             raise ValidationError({"unknown": f"Ошибка создания юридичекого лица исполнителя: {e}"})
         
@@ -828,39 +837,40 @@ class ContractorPersonListCreateView(SchemaAPIView, generics.ListCreateAPIView):
         "company": "Не найден заказчик с ID",
     }
     permission_classes = [IsAuthedOrReadOnly]
+    query_budget = 3
 
     def get_queryset(self):
-        return ContractorPerson.objects.filter(company__related_executor=self.request.user.company)
+        return ContractorPerson.objects.filter(company__related_executor_id=self.request.user.company_id)
     
     def create(self, request, *args, **kwargs):
         data = load_data(request.data)
 
-        error = field_validate(data, "ContractorPerson")
-        if error is not None:
-            raise ValidationError({error["field_id"]: error["error"]})
+        errors = field_validate(data, "ContractorPerson")
+        if errors is not None:
+            raise ValidationError(errors)
 
         try:
-            contractor_id = Contractor.objects.filter(id=int(find_dataValue(data, "company"))).first()
+            contractor_id = Contractor.objects.filter(id=int(data.get("company"))).first()
         except:
-            raise ValidationError(self.error_messages["company"] + find_dataValue(data, "company"))
+            raise ValidationError(self.error_messages["company"] + data.get("company"))
         
         if contractor_id is None:
-            raise ValidationError(self.error_messages["company"] + find_dataValue(data, "company"))
+            raise ValidationError(self.error_messages["company"] + data.get("company"))
 
         try:
             person = ContractorPerson.objects.create(
-                person_type=find_dataValue(data, "person_type"),
-                first_name=find_dataValue(data, "first_name"),
-                last_name=find_dataValue(data, "last_name"),
-                surname=find_dataValue(data, "surname"),
-                post=find_dataValue(data, "post"),
+                person_type=data.get("person_type"),
+                first_name=data.get("first_name"),
+                last_name=data.get("last_name"),
+                surname=data.get("surname"),
+                post=data.get("post"),
                 company=contractor_id,
-                contractor_city=find_dataValue(data, "contractor_city"),
-                contract_number=find_dataValue(data, "contract_number"),
-                contract_date=find_dataValue(data, "contract_date"),
+                contractor_city=data.get("contractor_city"),
+                contract_number=data.get("contract_number"),
+                contract_date=data.get("contract_date"),
             )
         except Exception as e:
-            if "UNIQUE constraint" in str(e):
+            if "unique constraint" in str(e).lower():
                 raise ValidationError({"FCs": "Юридическое лицо данной компании с данным ФИО уже существует."})
             raise ValidationError({"unknown": f"Ошибка создания юридичекого лица заказчика: {e}"})
         
@@ -882,8 +892,14 @@ class ExecutorPersonFieldsListView(SchemaAPIView, generics.ListAPIView):
     queryset = Field.objects.filter(related_item="ExecutorPerson")
     permission_classes = [AllowAny]
 
+    def get(self, request, *args, **kwargs):
+        return fields_schema_response(request, "ExecutorPerson")
+
 class ContractorPersonFieldsListView(SchemaAPIView, generics.ListAPIView):
     serializer_class = FieldSerializer
     details_serializer = FieldSerializer
     queryset = Field.objects.filter(related_item="ContractorPerson")
-    permission_classes = [AllowAny]
\ No newline at end of file
+    permission_classes = [AllowAny]
+
+    def get(self, request, *args, **kwargs):
+        return fields_schema_response(request, "ContractorPerson")
\ No newline at end of file
@@ -4,14 +4,16 @@ from rest_framework.response import Response
 from rest_framework import status, generics
 from rest_framework.views import APIView
 from api.views.schema import SchemaAPIView
+from api.pagination import KeysetPagination
+from api.views.field import fields_schema_response
 from rest_framework.exceptions import ValidationError
 # Permissions
 from rest_framework import permissions  
 from api.permissions import IsAuthed, IsAuthedOrReadOnly
 # models 
 from backend.models.fields import Field
-from backend.models.documents import Template, Document, DocumentField, TableField, DocumentsValues, TableValues
-from backend.models.company import ContractorPerson, ExecutorPerson, Executor
+from backend.models.documents import Template, Document, DocumentField, TableField, DocumentsValues, TableValues, DocumentJob
+from backend.models.company import ContractorPerson, ExecutorPerson
 # autodocs
 from drf_spectacular.utils import (
     extend_schema, extend_schema_view,
@@ -21,8 +23,9 @@ from drf_spectacular.utils import (
 from api.serializers.documents import (
     TemplateSerializer,
     DocumentSerializer,
+    DocumentJobSerializer,
+    DocumentBatchItemSerializer,
     DocumentFieldSerializer,
-    DocumentFieldValueSerializer,
     TableFieldSerializer,
 )
 from api.serializers.field import FieldSerializer
@@ -35,19 +38,28 @@ from api.serializers.schema import (
 # scripts
 from backend.scripts.field_validate import field_validate
 from backend.scripts.fill_document import fill_document, find_fields, find_table_columns
+from backend.scripts.document_storage import store_content, DOCX_MIME_TYPE
+from backend.scripts.document_queue import enqueue_job
+from backend.scripts.document_batch import render_many
+from backend.scripts.zip_stream import stream_zip
 import json
-from backend.scripts.find_datavalue import find_dataValue
 from backend.scripts.load_data import load_data
+from backend.scripts.payload import Payload
+from backend.scripts.table_builder import build_table
+from backend.scripts.business_calendar import current_shown_date
 # file settings
 from django.conf import settings
+from django.db import transaction
 import os
 #from magic import Magic
-from workalendar.europe import Russia
 from datetime import date
-from core.settings.base import DOCUMENTS_FOLDER, MEDIA_ROOT
-import locale
+from core.settings.base import MEDIA_ROOT
 
-from django.http import FileResponse
+import re
+
+from django.http import FileResponse, StreamingHttpResponse, HttpResponse, Http404
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.http import content_disposition_header, http_date
 
 # region DocTypes_docs
 @extend_schema(tags=["Documents"])
@@ -259,8 +271,7 @@ class TemplateListCreateView(SchemaAPIView, generics.ListCreateAPIView):
     
     def get(self, request, *args, **kwargs):
         self.details_serializer = FieldSerializer
-        fields = Field.objects.filter(related_item="Template")
-        return Response(FieldSerializer(fields, many=True).data, status=status.HTTP_200_OK)
+        return fields_schema_response(request, "Template")
 
     def create(self, request, *args, **kwargs):
         data = []
@@ -302,31 +313,32 @@ class TemplateListCreateView(SchemaAPIView, generics.ListCreateAPIView):
 
             index += 1
 
-        error = field_validate(data, "Template")
-        if error is not None:
-            raise ValidationError({error["field_id"]: error["error"]})
+        data = Payload(data)
+        errors = field_validate(data, "Template")
+        if errors is not None:
+            raise ValidationError(errors)
 
         try: 
-            contractor = ContractorPerson.objects.get(id=find_dataValue(data, 'related_contractor_person'))
+            contractor = ContractorPerson.objects.get(id=data.get('related_contractor_person'))
         except:
             return Response({"related_contractor_person": "Не найдено юридическое лицо заказчика"}, status=status.HTTP_400_BAD_REQUEST)
         
         try: 
-            executor = ExecutorPerson.objects.get(id=find_dataValue(data, 'related_executor_person'))
+            executor = ExecutorPerson.objects.get(id=data.get('related_executor_person'))
         except:
             return Response({"related_contractor_person": "Не найдено юридическое лицо исполнителя"}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
             # template = Template(
-            #     name=find_dataValue(data, 'name'),
-            #     type=find_dataValue(data, 'type'),
+            #     name=data.get('name'),
+            #     type=data.get('type'),
             #     file=file_path,
             #     related_contractor_person=contractor,
             #     related_executor_person=executor,
             # )
             serializer = self.serializer_class(data=data)
         except Exception as e:
-            if "UNIQUE constraint" in str(e):
+            if "unique constraint" in str(e).lower():
                 raise ValidationError({"template_name": "Данный шаблон уже существует."})
             return Response({"unknown": f"Неизвестная ошибка: {e}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
@@ -334,13 +346,18 @@ class TemplateListCreateView(SchemaAPIView, generics.ListCreateAPIView):
 
         if serializer.is_valid():
             serializer.save()
-            # future_fields = find_fields(find_dataValue(data, "template_file"))
+            # future_fields = find_fields(data.get("template_file"))
             # serializer.found_fields = future_fields
         else:
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         
-        # Обрабатываем таблицы в шаблоне
+        # Один раз извлекаем плейсхолдеры и заголовки таблицы, чтобы не разбирать файл при каждом выводе шаблона
         table_columns = find_table_columns(serializer.instance.template_file)
+        serializer.instance.found_fields = find_fields(serializer.instance.template_file)
+        serializer.instance.table_headers = table_columns
+        serializer.instance.save(update_fields=["found_fields", "table_headers"])
+
+        # Обрабатываем таблицы в шаблоне
         index = 10
         for column in table_columns:
             table_field = TableField.objects.create(
@@ -593,6 +610,7 @@ class TemplateDocumentFieldsListCreateView(SchemaAPIView, generics.ListCreateAPI
     serializer_class = DocumentFieldSerializer
     details_serializer = DocumentFieldSerializer
     permission_classes = [IsAuthedOrReadOnly]
+    query_budget = 3
 
     def get_queryset(self):
         template_id = self.kwargs.get('tid')
@@ -601,14 +619,14 @@ class TemplateDocumentFieldsListCreateView(SchemaAPIView, generics.ListCreateAPI
     def create(self, request, *args, **kwargs):
         data = load_data(request.data)
         
-        error = field_validate(data, "DocumentField")
-        if error is not None:
-            raise ValidationError({error["field_id"]: error["error"]})
+        errors = field_validate(data, "DocumentField")
+        if errors is not None:
+            raise ValidationError(errors)
 
         required_fields = Field.objects.filter(related_item="DocumentField", is_custom=False, is_required=True)
         missing_fields = []
         for field in required_fields:
-            if find_dataValue(data, field.key_name) is None:
+            if data.get(field.key_name) is None:
                 missing_fields.append(field.key_name)
 
         if len(missing_fields) > 0:
@@ -622,36 +640,36 @@ class TemplateDocumentFieldsListCreateView(SchemaAPIView, generics.ListCreateAPI
         
         try:
             doc_field = DocumentField.objects.create(
-                id=f"{find_dataValue(data, 'key_name')}__Template__{str(Template.objects.filter(id=template.id).first().template_name).replace(' ', '_')}",
-                name=find_dataValue(data, 'name'),
-                key_name=find_dataValue(data, 'key_name'),
-                is_required=find_dataValue(data, 'is_required'),
-                type=find_dataValue(data, 'type'),
-                validation_regex=find_dataValue(data, 'validation_regex'),
+                id=f"{data.get('key_name')}__Template__{str(Template.objects.filter(id=template.id).first().template_name).replace(' ', '_')}",
+                name=data.get('name'),
+                key_name=data.get('key_name'),
+                is_required=data.get('is_required'),
+                type=data.get('type'),
+                validation_regex=data.get('validation_regex'),
                 related_item="DocumentField",
                 is_custom=True,
                 related_info=None,
-                placeholder=f"Введите значение поля {str(find_dataValue(data, 'name')).upper()}",
+                placeholder=f"Введите значение поля {str(data.get('name')).upper()}",
                 related_template=Template.objects.filter(id=template.id).first(), # Можно заменить на name но лучше не надо
             )
 
             return Response(self.serializer_class(doc_field).data, status=status.HTTP_201_CREATED)
         except Exception as e:
-            if "UNIQUE constraint" in str(e):
+            if "unique constraint" in str(e).lower():
                 raise ValidationError({"key_name": "Данное поле в документе уже существует."})
             raise ValidationError({"unknown": f"Ошибка создания поля документа: {e}"})
     
     def put(self, request, *args, **kwargs):
         data = load_data(request.data)
         
-        error = field_validate(data, "DocumentField")
-        if error is not None:
-            raise ValidationError({error["field_id"]: error["error"]})
+        errors = field_validate(data, "DocumentField")
+        if errors is not None:
+            raise ValidationError(errors)
 
         required_fields = Field.objects.filter(related_item="DocumentField", is_custom=False, is_required=True)
         missing_fields = []
         for field in required_fields:
-            if find_dataValue(data, field.key_name) is None:
+            if data.get(field.key_name) is None:
                 missing_fields.append(field.key_name)
 
         if len(missing_fields) > 0:
@@ -663,16 +681,16 @@ class TemplateDocumentFieldsListCreateView(SchemaAPIView, generics.ListCreateAPI
             raise ValidationError({"template_id": f"Шаблон с TID {self.kwargs.get('tid')} не найден."})
 
         instance = DocumentField.objects.get(
-            id=f"{find_dataValue(data, 'key_name')}__Template__{str(Template.objects.filter(id=template.id).first().template_name).replace(' ', '_')}",
-            key_name=find_dataValue(data, 'key_name'),
+            id=f"{data.get('key_name')}__Template__{str(Template.objects.filter(id=template.id).first().template_name).replace(' ', '_')}",
+            key_name=data.get('key_name'),
             related_template=template,
             )
         if instance:
-            instance.name = find_dataValue(data, 'name')
-            instance.is_required = find_dataValue(data, 'is_required')
-            instance.type = find_dataValue(data, 'type')
-            instance.validation_regex = find_dataValue(data, 'validation_regex')
-            instance.placeholder = f"Введите значение поля {str(find_dataValue(data, 'name')).upper()}"
+            instance.name = data.get('name')
+            instance.is_required = data.get('is_required')
+            instance.type = data.get('type')
+            instance.validation_regex = data.get('validation_regex')
+            instance.placeholder = f"Введите значение поля {str(data.get('name')).upper()}"
             instance.save()
         else:
             raise ValidationError({"unknown": "Данное поле не найдено."})
@@ -689,6 +707,9 @@ class TemplateDocumentFieldsFieldsView(SchemaAPIView, generics.ListAPIView):
     def get_queryset(self):
         return Field.objects.filter(related_item="DocumentField", is_custom=False)
 
+    def get(self, request, *args, **kwargs):
+        return fields_schema_response(request, "DocumentField", is_custom=False)
+
 
 # TableFieldsListCreateView
 # Создать поле столбца таблицы
@@ -698,22 +719,21 @@ class TableFieldsListCreateView(SchemaAPIView, generics.ListCreateAPIView):
     permission_classes = [IsAuthedOrReadOnly]
 
     def get(self, request, *args, **kwargs):
-        fields = Field.objects.filter(related_item="TableField", is_custom=False)
         self.details_serializer = FieldSerializer
-        return Response(FieldSerializer(fields, many=True).data, status=status.HTTP_200_OK)
+        return fields_schema_response(request, "TableField", is_custom=False)
 
     def create(self, request, tk: int, *args, **kwargs):
         self.details_serializer = TableFieldSerializer
         data = load_data(request.data)
 
-        error = field_validate(data, "TableField")
-        if error is not None:
-            raise ValidationError({error["field_id"]: error["error"]})
+        errors = field_validate(data, "TableField")
+        if errors is not None:
+            raise ValidationError(errors)
 
         required_fields = Field.objects.filter(related_item="TableField", is_custom=False, is_required=True)
         missing_fields = []
         for field in required_fields:
-            if find_dataValue(data, field.key_name) is None:
+            if data.get(field.key_name) is None:
                 missing_fields.append(field.key_name)
 
         if len(missing_fields) > 0:
@@ -727,25 +747,25 @@ class TableFieldsListCreateView(SchemaAPIView, generics.ListCreateAPIView):
         
         try:
             table_field = TableField.objects.create(
-                id=f"{find_dataValue(data, 'key_name')}__Table__{str(template.template_name).replace(' ', '_')}",
-                name=find_dataValue(data, 'name'),
-                key_name=find_dataValue(data, 'key_name'),
-                order= find_dataValue(data, 'order'),
-                is_required=find_dataValue(data, 'is_required'),
-                is_autoincremental=find_dataValue(data, 'is_autoincremental'),
-                type=find_dataValue(data, 'type'),
-                validation_regex=find_dataValue(data, 'validation_regex'),
+                id=f"{data.get('key_name')}__Table__{str(template.template_name).replace(' ', '_')}",
+                name=data.get('name'),
+                key_name=data.get('key_name'),
+                order= data.get('order'),
+                is_required=data.get('is_required'),
+                is_autoincremental=data.get('is_autoincremental'),
+                type=data.get('type'),
+                validation_regex=data.get('validation_regex'),
                 related_item="Template",
                 is_custom=True,
-                is_summable=find_dataValue(data, 'is_summable'),
+                is_summable=data.get('is_summable'),
                 related_info=None,
-                placeholder=f"Введите значение поля {str(find_dataValue(data, 'name')).upper()}",
+                placeholder=f"Введите значение поля {str(data.get('name')).upper()}",
                 related_template=template, # Можно заменить на name но лучше не надо
             )
 
             return Response(self.serializer_class(table_field).data, status=status.HTTP_201_CREATED)
         except Exception as e:
-            if "UNIQUE constraint" in str(e):
+            if "unique constraint" in str(e).lower():
                 raise ValidationError({"key_name": "В шаблоне уже существует данный столбец таблицы с таким же названием или порядком."})
             raise ValidationError({"unknown": f"Ошибка создания поля столбца таблицы: {e}"})
 
@@ -753,14 +773,14 @@ class TableFieldsListCreateView(SchemaAPIView, generics.ListCreateAPIView):
         self.details_serializer = TableFieldSerializer
         data = load_data(request.data)
 
-        error = field_validate(data, "TableField")
-        if error is not None:
-            raise ValidationError({error["field_id"]: error["error"]})
+        errors = field_validate(data, "TableField")
+        if errors is not None:
+            raise ValidationError(errors)
         
         required_fields = Field.objects.filter(related_item="TableField", is_custom=False, is_required=True)
         missing_fields = []
         for field in required_fields:
-            if find_dataValue(data, field.key_name) is None:
+            if data.get(field.key_name) is None:
                 missing_fields.append(field.key_name)
 
         if len(missing_fields) > 0:
@@ -773,16 +793,16 @@ class TableFieldsListCreateView(SchemaAPIView, generics.ListCreateAPIView):
             raise ValidationError({"template_id": f"Шаблон с TID {tk} не найден."})
 
         table_field = TableField.objects.get(
-            id=f"{find_dataValue(data, 'key_name')}__Table__{str(template.template_name).replace(' ', '_')}"
+            id=f"{data.get('key_name')}__Table__{str(template.template_name).replace(' ', '_')}"
         )
         if table_field:
-            table_field.name=find_dataValue(data, 'name')
+            table_field.name=data.get('name')
             table_field.is_required=True
-            table_field.type=find_dataValue(data, 'type')
-            table_field.is_autoincremental=find_dataValue(data, 'is_autoincremental') if find_dataValue(data, 'is_autoincremental') != None else table_field.is_autoincremental
-            table_field.validation_regex=find_dataValue(data, 'validation_regex') if find_dataValue(data, 'validation_regex') != "" else None
-            table_field.is_summable=find_dataValue(data, 'is_summable')
-            table_field.placeholder=f"Введите значение поля {str(find_dataValue(data, 'name')).upper()}"
+            table_field.type=data.get('type')
+            table_field.is_autoincremental=data.get('is_autoincremental') if data.get('is_autoincremental') != None else table_field.is_autoincremental
+            table_field.validation_regex=data.get('validation_regex') if data.get('validation_regex') != "" else None
+            table_field.is_summable=data.get('is_summable')
+            table_field.placeholder=f"Введите значение поля {str(data.get('name')).upper()}"
             table_field.save()
         else:
             raise ValidationError({"unknown": "Данное поле не найдено."})
@@ -795,6 +815,7 @@ class TemplateTableFieldsListView(SchemaAPIView, generics.ListAPIView):
     serializer_class = TableFieldSerializer
     details_serializer = TableFieldSerializer
     permission_classes = [permissions.AllowAny]
+    query_budget = 3
 
     def get_queryset(self):
         template_id = self.kwargs.get('tk')
@@ -822,6 +843,124 @@ class TemplateFieldsView(SchemaAPIView, generics.ListAPIView):
     details_serializer = FieldSerializer
     permission_classes = [permissions.AllowAny]
 
+    def get(self, request, *args, **kwargs):
+        return fields_schema_response(request, "Template")
+
+
+def parse_shown_date(value) -> date | None:
+    """Разбирает переданную вручную отображаемую дату документа. Пустое значение - дата по умолчанию."""
+    if value in (None, ""):
+        return None
+    try:
+        return date.fromisoformat(str(value))
+    except ValueError:
+        raise ValidationError({"shown_date": "Дата должна быть в формате ГГГГ-ММ-ДД."})
+
+
+def prepare_document(template: Template, data: Payload, shown_date: date | None = None, status: str = 'READY', document_number: int = 0) -> tuple:
+    """
+    Создаёт запись `Document` шаблона `template` вместе со значениями полей (`DocumentsValues`)
+    и строками таблицы (`TableValues`) и собирает всё необходимое для `fill_document`.
+    Данные `data` должны быть уже проверены через `field_validate`.
+
+    Вызывать внутри транзакции: при ошибке выбрасывается `ValidationError`, а созданные записи должны откатиться.
+
+    :param shown_date: Отображаемая дата документа. По умолчанию - первый рабочий день текущего месяца.
+    :param status: Состояние документа до генерации файла (`PENDING`, если файл будет заполнен позже).
+    :param document_number: Номер, выданный `Document.allocate_number` до транзакции. Без него номер выдаётся
+        при сохранении, и счётчик остаётся заблокированным до конца транзакции.
+    :return: `(doc, document_data, table, document_settings)`
+    """
+    shown_date = shown_date or current_shown_date()
+    # Создаём документ
+    try:
+        doc = Document.objects.create(
+            template=template,
+            shown_date=shown_date,
+            status=status,
+            document_number=document_number,
+        )
+    except Exception as e:
+        raise ValidationError({"unknown": f"Ошибка создания документа: ({e})"})
+    
+    # Заполняем DocumentValues
+    document_data = {}
+    document_settings = {}
+
+    # Все поля шаблона получаем одним запросом, а значения записываем одной пачкой
+    template_fields = {
+        field.key_name: field
+        for field in DocumentField.objects.filter(related_template=template, related_item="DocumentField")
+    }
+    values = []
+    for field in data:
+        if isinstance(field.get('value'), list):
+            continue
+        document_data[field.get('field_id')] = field.get("value")
+        if field.get('field_id') not in template_fields:
+            raise ValidationError({"unknown": f"Ошибка распределении значении полей документа: поле `{field.get('field_id')}` не найдено в шаблоне"})
+        values.append(DocumentsValues(
+            document_id=doc,
+            field_id=template_fields[field.get('field_id')],
+            value=field.get("value", ""),
+        ))
+    try:
+        DocumentsValues.objects.bulk_create(values)
+    except Exception as e:
+        raise ValidationError({"unknown": f"Ошибка распределении значении полей документа: {e}"})
+    
+    ## Дополняем также информацией о компаниях
+    # Информация о документе
+    #* order_date - в fill_document
+    document_data["order_number"] = doc.document_number
+    # Лицо заказчика
+    if template.related_contractor_person is not None:
+        document_data["contractor_person"] = template.related_contractor_person.set_initials()
+        document_data["contractor_post"] = template.related_contractor_person.post if template.related_contractor_person.post else f"Ответственное лицо {template.related_contractor_person.post}"
+        document_data["contractor_company_full"] = template.related_contractor_person.person_type
+        document_data["contractor_company"] = template.related_contractor_person.person_type
+        document_data["contractor_city"] = template.related_contractor_person.contractor_city
+        document_data["contract_number"] = template.related_contractor_person.contract_number
+        document_data["contract_date"] = template.related_contractor_person.contract_date.strftime("%d.%m.%Y")
+    # Лицо исполнителя
+    if template.related_executor_person is not None:
+        document_data["executor_person"] = template.related_executor_person.set_initials()
+        document_data["executor_post"] = template.related_executor_person.post if template.related_executor_person.post else f"Юридическое лицо {template.related_executor_person.person_type}"
+        document_data["executor_company_full"] = template.related_executor_person.person_type
+        document_data["executor_company"] = template.related_executor_person.person_type
+
+
+    # Все столбцы шаблона одним запросом, по возрастанию ORDER
+    built = build_table(list(TableField.objects.filter(related_template=template).order_by('order')), data)
+    table = built.rows
+
+    # Сохраняем строки таблицы одной пачкой: номер строки - её позиция в присланной таблице
+    try:
+        TableValues.objects.bulk_create([
+            TableValues(
+                row_number=row_number,
+                document_id=doc,
+                table_id=field,
+                value=str(value),
+            )
+            for row_number, rowlist in enumerate(table)
+            for field, value in zip(built.fields, rowlist)
+        ])
+    except Exception as e:
+        raise ValidationError({"unknown": f"Ошибка сохранения строк таблицы документа: {e}"})
+
+    if built.total is not None:
+        document_data["total_cost"] = built.total
+        document_settings["summable_type"] = built.summable.type
+
+    document_settings["shown_date"] = shown_date.isoformat()
+
+    # Файлы документов хранятся в папке компании исполнителя
+    if template.related_executor_person is not None:
+        document_settings["company_id"] = template.related_executor_person.company_id
+
+    return doc, document_data, table, document_settings
+
 
 # region DocumentFields_docs
 @extend_schema(tags=["Document"])
@@ -881,118 +1020,42 @@ class DocumentFieldsCreateView(SchemaAPIView, generics.ListCreateAPIView):
     serializer_class = DocumentFieldSerializer
     details_serializer = DocumentFieldSerializer
     permission_classes = [IsAuthedOrReadOnly]
+    query_budget = 3
 
     def get_queryset(self):
         self.details_serializer = DocumentFieldSerializer
-        tid = self.kwargs.get('tid')
-        return DocumentField.objects.filter(related_template=Template.objects.filter(id=tid).first())
+        return DocumentField.objects.filter(related_template_id=self.kwargs.get('tid'))
     
     def create(self, request, *args, **kwargs):
         data = load_data(request.data)
 
-        error = field_validate(data, "DocumentField")
-        if error is not None:
-            raise ValidationError({error["field_id"]: error["error"]})
-
-        listfields = [columns.get('field_id') for columns in data if isinstance(columns.get('value'), list)]
-        
         # Проверка что шаблон документа есть
         tid = self.kwargs.get('tid')
         template = Template.objects.filter(id=tid).first()
         if not template:
             raise ValidationError({"template_id": "Шаблон документа не найден"})
-        
-        # Создаём документ
-        try:
-            doc = Document.objects.get_or_create(
-                id=Document.objects.filter().count() + 1,
-                template=template,
-                shown_date=Russia().add_working_days(date(date.today().year, date.today().month, 1), 0).strftime("%Y-%m-%d"),
-                save_path=DOCUMENTS_FOLDER/template.template_file.name.split('/')[-1],
-            )[0]
-        except Exception as e:
-            raise ValidationError({"unknown": f"Ошибка создания документа: ({e})"})
-        
-        # Заполняем DocumentValues
-        document_data = {}
-        document_settings = {}
 
-        for field in data:
-            if isinstance(field.get('value'), list):
-                continue
-            document_data[field.get('field_id')] = field.get("value")
-            try:
-                DocumentsValues.objects.get_or_create(
-                    document_id=doc,
-                    field_id=DocumentField.objects.filter(key_name=field.get('field_id'), related_item="DocumentField").first(),
-                    value=field.get("value", ""),
-                )
-            except Exception as e:
-                doc.delete()   # Удаляем документ, если произошла ошибка
-                raise ValidationError({"unknown": f"Ошибка распределении значении полей документа: {e}"})
+        errors = field_validate(data, "DocumentField", template)
+        if errors is not None:
+            raise ValidationError(errors)
         
-        ## Дополняем также информацией о компаниях
-        locale.setlocale(locale.LC_ALL, 'ru_RU.UTF-8')
-        # Информация о документе
-        #* order_date - в fill_document
-        document_data["order_number"] = doc.document_number
-        # Лицо заказчика
-        if template.related_contractor_person is not None:
-            document_data["contractor_person"] = template.related_contractor_person.set_initials()
-            document_data["contractor_post"] = template.related_contractor_person.post if template.related_contractor_person.post else f"Ответственное лицо {template.related_contractor_person.post}"
-            document_data["contractor_company_full"] = template.related_contractor_person.person_type
-            document_data["contractor_company"] = template.related_contractor_person.person_type
-            document_data["contractor_city"] = template.related_contractor_person.contractor_city
-            document_data["contract_number"] = template.related_contractor_person.contract_number
-            document_data["contract_date"] = template.related_contractor_person.contract_date.strftime("%d.%m.%Y")
-        # Лицо исполнителя
-        if template.related_executor_person is not None:
-            document_data["executor_person"] = template.related_executor_person.set_initials()
-            document_data["executor_post"] = template.related_executor_person.post if template.related_executor_person.post else f"Юридическое лицо {template.related_executor_person.person_type}"
-            document_data["executor_company_full"] = template.related_executor_person.person_type
-            document_data["executor_company"] = template.related_executor_person.person_type
-
-
-        # Делаем так, чтобы столбцы таблицы располагались по возрастанию ORDER
-        ordered_lf = []
-        ordered = TableField.objects.filter(related_template=tid).order_by('order')
-        for row in ordered:
-            if row.key_name not in listfields and row.is_autoincremental == False:
-                continue
-            ordered_lf.append(row.key_name)
+        # Отображаемую дату можно передать явно: `{"data": [...], "shown_date": "ГГГГ-ММ-ДД"}`
+        shown_date = parse_shown_date(request.data.get("shown_date") if hasattr(request.data, "get") else None)
 
-        if TableField.objects.filter(related_template=tid, is_summable=True).count() > 1:
-            raise ValidationError({"unknown": "В таблице может быть только один суммируемый столбец"})
-        summable_index = ordered_lf.index(TableField.objects.filter(related_template=tid, is_summable=True).first().key_name) if TableField.objects.filter(related_template=tid, is_summable=True).exists() else None
-        
-        try:
-            ai_field = TableField.objects.filter(related_template=tid, is_autoincremental=True).first().key_name
-        except AttributeError:
-            ai_field = None
+        # Номер выдаётся до транзакции документа: счётчик не блокируется на время заполнения файла
+        document_number = Document.allocate_number(template)
+        # Документ, значения его полей и файл создаются целиком: при любой ошибке все записи откатываются
+        with transaction.atomic():
+            return self.create_document(request, template, data, shown_date, document_number)
 
-        maxlen = 0
-        for listfield in ordered_lf:
-            if listfield == ai_field:
-                continue
-            maxlen = max(maxlen, len(find_dataValue(data, listfield)))
-        
-        table = []
-        autoincrement = [i for i in range(1, maxlen + 1)]
-        for row in range(maxlen):
-            rowlist = []
-            for listfield in ordered_lf:
-                try:
-                    if listfield == ai_field:
-                        rowlist.append(autoincrement[row])
-                    else:
-                        rowlist.append(find_dataValue(data, listfield)[row])
-                except:
-                    rowlist.append("")
-            table.append(rowlist)
-
-        if summable_index is not None:
-            document_data["total_cost"] = round(sum([0 if rowlist[summable_index] == "" else float(rowlist[summable_index]) for rowlist in table]), 2)
-            document_settings["summable_type"] = TableField.objects.filter(related_template=tid, is_summable=True).first().type
+    def create_document(self, request, template: Template, data: Payload, shown_date: date | None, document_number: int) -> Response:
+        doc, document_data, table, document_settings = prepare_document(template, data, shown_date, document_number=document_number)
+
+        # Большие документы (или по запросу `?async=true`) генерируются в фоне
+        if self.is_async(request, table):
+            job = enqueue_job(doc, template.template_file.name, document_data, table, document_settings)
+            self.details_serializer = DocumentJobSerializer
+            return Response(DocumentJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
 
         # Создаём сам документ.
         try:
@@ -1000,17 +1063,152 @@ class DocumentFieldsCreateView(SchemaAPIView, generics.ListCreateAPIView):
             if info.get("error"):
                 raise ValidationError({"unknown": f"Ошибка создания документа: ({info['error']})"})
             doc.shown_date = info.get("shown_date")
-            if info.get("path"):
-                doc.save_path = info["path"]
+            if info.get("file"):
+                doc.attach_file(info["file"])
             doc.save()
         except Exception as e:
-            doc.delete()   # Удаляем документ, если произошла ошибка
             raise ValidationError({"unknown": f"Ошибка создания документа: ({e})."})
 
         #print(info)
         self.details_serializer = DocumentSerializer
         return Response(DocumentSerializer(doc).data, status=status.HTTP_201_CREATED)
 
+    def is_async(self, request, table: list) -> bool:
+        """
+        Нужно ли генерировать файл в фоне.
+        Параметр запроса `async` (`true`/`false`) имеет приоритет над порогом `DOCUMENT_ASYNC_MIN_ROWS`.
+        """
+        mode = str(request.query_params.get("async", "")).lower()
+        if mode in ("1", "true"):
+            return True
+        if mode in ("0", "false"):
+            return False
+        return bool(settings.DOCUMENT_ASYNC_MIN_ROWS) and len(table) >= settings.DOCUMENT_ASYNC_MIN_ROWS
+
+
+class DocumentBatchCreateView(SchemaAPIView, generics.GenericAPIView):
+    """
+    Пакетное создание документов: за один запрос создаётся документ для каждого элемента `items`.
+
+    Формат запроса:
+    ```
+    {
+        "items": [
+            {"template_id": 1, "data": [{"field_id": "...", "value": "..."}, ...], "shown_date": "ГГГГ-ММ-ДД" (необязательно)},
+            //...
+        ]
+    }
+    ```
+    Все элементы проверяются заранее, шаблоны и данные компаний загружаются один раз на пакет,
+    а файлы заполняются параллельно на пуле процессов. Ответ содержит результат по каждому элементу
+    в том же порядке. С параметром `?zip=true` вместо JSON потоком отдаётся ZIP-архив с документами
+    и файлом `results.json`.
+
+    Если хотя бы один элемент неверной формы (нет `template_id` или `data`, неверная дата),
+    пакет не выполняется: ответ 400 с ошибками по каждому элементу в `items`.
+    Документы создаются в состоянии PENDING и становятся READY только вместе с файлом; документ,
+    файл которого не удалось заполнить, помечается FAILED и возвращается в результате с ошибкой.
+    """
+    serializer_class = DocumentSerializer
+    details_serializer = DocumentSerializer
+    permission_classes = [IsAuthed]
+
+    def post(self, request, *args, **kwargs):
+        items = request.data.get("items") if isinstance(request.data, dict) else None
+        if not isinstance(items, list) or len(items) == 0:
+            raise ValidationError({"items": "Необходимо передать непустой список `items`."})
+        if len(items) > settings.DOCUMENT_BATCH_MAX_ITEMS:
+            raise ValidationError({"items": f"В одном запросе можно создать не более {settings.DOCUMENT_BATCH_MAX_ITEMS} документов."})
+
+        serializer = DocumentBatchItemSerializer(data=items, many=True)
+        if not serializer.is_valid():
+            raise ValidationError({"items": serializer.errors})
+        items = serializer.validated_data
+
+        # Без компании фильтр превратился бы в `IS NULL` и нашёл бы шаблоны без исполнителя
+        templates = {} if request.user.company_id is None else Template.objects.select_related(
+            'related_contractor_person', 'related_executor_person'
+        ).filter(related_executor_person__company_id=request.user.company_id).in_bulk({item["template_id"] for item in items})
+
+        results = [None] * len(items)
+        prepared = []
+        for index, item in enumerate(items):
+            template = templates.get(item["template_id"])
+            if template is None:
+                results[index] = {"document": None, "errors": {"template_id": "Шаблон документа не найден"}}
+                continue
+
+            data = load_data(item)
+            errors = field_validate(data, "DocumentField", template)
+            if errors is not None:
+                results[index] = {"document": None, "errors": errors}
+                continue
+
+            # Каждый элемент сохраняется в своей транзакции, ошибка одного не откатывает остальные
+            document_number = Document.allocate_number(template)
+            try:
+                with transaction.atomic():
+                    doc, document_data, table, document_settings = prepare_document(
+                        template, data, item.get("shown_date"), status='PENDING', document_number=document_number,
+                    )
+            except ValidationError as e:
+                results[index] = {"document": None, "errors": e.detail}
+                continue
+            prepared.append((index, doc, (template.template_file.name, document_data, table, document_settings)))
+
+        rendered = render_many([task for _, _, task in prepared])
+
+        archive_files = []
+        for (index, doc, task), info in zip(prepared, rendered):
+            if info.get("error"):
+                doc.status = 'FAILED'
+                doc.save(update_fields=["status"])
+                results[index] = {
+                    "document": DocumentSerializer(doc).data,
+                    "errors": {"unknown": f"Ошибка создания документа: ({info['error']})"},
+                }
+                continue
+
+            doc.attach_file(store_content(info.pop("content"), task[3].get("company_id")))
+            doc.shown_date = info.get("shown_date")
+            doc.status = 'READY'
+            doc.save(update_fields=["status", "save_path", "content_hash", "file_size", "mime_type", "shown_date"])
+            results[index] = {"document": DocumentSerializer(doc).data, "errors": None}
+            archive_files.append((doc.download_name(), doc.save_path))
+
+        if not prepared:
+            raise ValidationError({"items": results})
+
+        if str(request.query_params.get("zip", "")).lower() in ("1", "true"):
+            # Файлы уже лежат в хранилище: архив собирается из них на лету, без буфера в памяти
+            response = StreamingHttpResponse(
+                stream_zip(archive_files, extra=[("results.json", json.dumps(results, ensure_ascii=False, default=str).encode())]),
+                content_type="application/zip",
+            )
+            response["Content-Disposition"] = 'attachment; filename="documents.zip"'
+            return response
+
+        return Response({"items": results}, status=status.HTTP_201_CREATED)
+
+
+class DocumentJobView(SchemaAPIView, generics.RetrieveAPIView):
+    """
+    Состояние фоновой генерации документа: QUEUED, RUNNING, DONE или FAILED.
+    После выполнения в `save_path` будет путь к готовому файлу.
+    """
+    serializer_class = DocumentJobSerializer
+    details_serializer = DocumentJobSerializer
+    permission_classes = [IsAuthed]
+    query_budget = 3
+
+    def get_queryset(self):
+        # Без компании фильтр превратился бы в `IS NULL` и открыл бы задачи шаблонов без исполнителя
+        if self.request.user.company_id is None:
+            return DocumentJob.objects.none()
+        return DocumentJob.objects.select_related('document').filter(
+            document__template__related_executor_person__company_id=self.request.user.company_id
+        )
+
 
 # region TemplateOfCompany_docs
 @extend_schema(tags=["Template"])
@@ -1063,11 +1261,15 @@ class TemplateCompanyListView(SchemaAPIView, generics.ListAPIView):
     serializer_class = TemplateSerializer
     details_serializer = TemplateSerializer
     permission_classes = [permissions.AllowAny]
+    pagination_class = KeysetPagination
+    ordering = ('-id',)
+    query_budget = 3
 
     def get_queryset(self):
-        company_id = self.kwargs.get('company_id')
-        company = Executor.objects.filter(id=company_id).first()
-        return Template.objects.filter(related_executor_person__company=company)
+        return filter_templates(
+            Template.objects.filter(related_executor_person__company_id=self.kwargs.get('company_id')),
+            self.request.query_params,
+        )
 
 
 # region TemplateCurrCompany_docs
@@ -1125,44 +1327,278 @@ class TemplateCurrentCompanyListView(SchemaAPIView, generics.ListAPIView):
     serializer_class = TemplateSerializer
     details_serializer = TemplateSerializer
     permission_classes = [IsAuthed]
+    pagination_class = KeysetPagination
+    ordering = ('-id',)
+    query_budget = 3
 
     def get_queryset(self):
-        return Template.objects.filter(related_executor_person__company=self.request.user.company)
+        # Без компании фильтр превратился бы в `IS NULL` и вернул бы шаблоны без исполнителя
+        if self.request.user.company_id is None:
+            return Template.objects.none()
+        return filter_templates(
+            Template.objects.filter(related_executor_person__company_id=self.request.user.company_id),
+            self.request.query_params,
+        )
 
 
+def filter_templates(queryset, params):
+    """
+    Фильтрует шаблоны по параметрам запроса:
+    - `template_type` - тип шаблона (ACT, ORDER, REPORT);
+    - `contractor` - ID заказчика (компании).
+    """
+    if params.get("template_type"):
+        queryset = queryset.filter(template_type=params["template_type"])
+    if params.get("contractor"):
+        try:
+            queryset = queryset.filter(related_contractor_person__company_id=int(params["contractor"]))
+        except ValueError:
+            raise ValidationError({"contractor": "ID заказчика должен быть числом."})
+    return queryset
+
+
+def filter_documents(queryset, params):
+    """
+    Фильтрует документы по параметрам запроса:
+    - `template` - ID шаблона;
+    - `template_type` - тип шаблона (ACT, ORDER, REPORT);
+    - `date_from`, `date_to` - границы `shown_date` в формате ГГГГ-ММ-ДД (включительно);
+    - `contractor` - ID заказчика (компании), для которого составлен документ.
+    """
+    if params.get("template"):
+        try:
+            queryset = queryset.filter(template_id=int(params["template"]))
+        except ValueError:
+            raise ValidationError({"template": "ID шаблона должен быть числом."})
+    if params.get("template_type"):
+        queryset = queryset.filter(template__template_type=params["template_type"])
+    for param, lookup in (("date_from", "shown_date__gte"), ("date_to", "shown_date__lte")):
+        if params.get(param):
+            try:
+                queryset = queryset.filter(**{lookup: date.fromisoformat(params[param])})
+            except ValueError:
+                raise ValidationError({param: "Дата должна быть в формате ГГГГ-ММ-ДД."})
+    if params.get("contractor"):
+        try:
+            queryset = queryset.filter(template__related_contractor_person__company_id=int(params["contractor"]))
+        except ValueError:
+            raise ValidationError({"contractor": "ID заказчика должен быть числом."})
+    return queryset
+
+
+# region DocumentList_docs
+@extend_schema(tags=["Document"])
+@extend_schema_view(
+    get=extend_schema(
+        summary="Получить документы компании текущего пользователя постранично",
+        description="Документы отдаются от новых к старым страницами по `limit` штук. "
+                    "Следующая страница запрашивается с курсором `next` из ответа, пока `has_more` истинно.",
+        parameters=[
+            OpenApiParameter("template", type=int, description="ID шаблона"),
+            OpenApiParameter("template_type", type=str, description="Тип шаблона (ACT, ORDER, REPORT)"),
+            OpenApiParameter("date_from", type=date, description="Отображаемая дата не раньше (ГГГГ-ММ-ДД)"),
+            OpenApiParameter("date_to", type=date, description="Отображаемая дата не позже (ГГГГ-ММ-ДД)"),
+            OpenApiParameter("contractor", type=int, description="ID заказчика"),
+        ],
+    )
+)
+# endregion
 class DocumentListView(SchemaAPIView, generics.ListAPIView):
     serializer_class = DocumentSerializer
     details_serializer = DocumentSerializer
     permission_classes = [permissions.IsAuthenticated]
-    
+    pagination_class = KeysetPagination
+    ordering = ('-created_at', '-id')
+    query_budget = 3
+
     def get_queryset(self, *args, **kwargs):
-        return Document.objects.filter(template__related_executor_person__company=self.request.user.company)
-
-
-def DocumentDownloadView(request, did):
-    document = Document.objects.get(pk=did)
-    dir_path = os.path.dirname(document.save_path)
-    file_name = os.path.basename(document.save_path)
-    file_path = os.path.join(dir_path, file_name)
-    print(file_path)
-    if os.path.exists(file_path):
-        response = FileResponse(
-            open(file_path, 'rb'),
-            as_attachment=True,
-            filename=file_name
+        if self.request.user.company_id is None:
+            return Document.objects.none()
+        return filter_documents(
+            Document.objects.filter(template__related_executor_person__company_id=self.request.user.company_id),
+            self.request.query_params,
         )
+
+
+class DocumentExportView(SchemaAPIView, generics.GenericAPIView):
+    """
+    Выгрузка документов компании одним ZIP-архивом.
+    Поддерживает те же фильтры, что и `filter_documents`. Архив собирается на лету и отдаётся потоком,
+    поэтому расход памяти не зависит от его размера. В архив добавляется `manifest.csv` с номерами и датами документов.
+    """
+    permission_classes = [IsAuthed]
+
+    MANIFEST_HEADER = ["id", "document_number", "template", "template_type", "shown_date", "created_at", "file"]
+
+    def get(self, request, *args, **kwargs):
+        if request.user.company_id is None:
+            # Без компании фильтр превратился бы в `IS NULL` и выгрузил бы документы шаблонов без исполнителя
+            documents = Document.objects.none()
+        else:
+            documents = filter_documents(
+                Document.objects.filter(template__related_executor_person__company_id=request.user.company_id),
+                request.query_params,
+            ).order_by('shown_date', 'id')
+
+        def archive_name(doc_id, template_name):
+            # Имя как у `Document.download_name()`: в хранилище файлы называются по хэшу
+            return f"{doc_id}_{template_name}.docx"
+
+        manifest_rows = (
+            [
+                doc_id, number, template_name, template_type, shown_date, created_at.isoformat(),
+                archive_name(doc_id, template_name) if save_path and os.path.isfile(save_path) else "",
+            ]
+            for doc_id, number, template_name, template_type, shown_date, created_at, save_path in documents.values_list(
+                'id', 'document_number', 'template__template_name', 'template__template_type', 'shown_date', 'created_at', 'save_path'
+            ).iterator()
+        )
+        files = (
+            (archive_name(doc_id, template_name), save_path)
+            for doc_id, template_name, save_path in documents.values_list('id', 'template__template_name', 'save_path').iterator()
+            if save_path
+        )
+
+        response = StreamingHttpResponse(
+            stream_zip(files, self.MANIFEST_HEADER, manifest_rows),
+            content_type="application/zip",
+        )
+        response["Content-Disposition"] = 'attachment; filename="documents.zip"'
+        return response
+
+
+RANGE_PATTERN = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def parse_range(header: str, size: int):
+    """
+    Разбирает заголовок `Range` для файла размером `size`.
+
+    Поддерживается только один диапазон вида `bytes=start-end`, `bytes=start-` или `bytes=-suffix`.
+    Возвращает `(start, end)` включительно, `None` - если заголовок не распознан (отдаётся весь файл),
+    `False` - если диапазон не пересекается с файлом (ответ 416).
+    """
+    match = RANGE_PATTERN.match(header.strip())
+    if match is None:
+        return None
+    start, end = match.groups()
+    if not start and not end:
+        return None
+
+    if not start:
+        # Последние `end` байт файла
+        length = int(end)
+        if length == 0:
+            return False
+        return max(size - length, 0), size - 1
+
+    start = int(start)
+    if start >= size:
+        return False
+    end = int(end) if end else size - 1
+    if start > end:
+        return None
+    return start, min(end, size - 1)
+
+
+def iter_file_range(path, start: int, length: int, chunk_size: int = 64 * 1024):
+    """Читает из файла `path` `length` байт, начиная со `start`, блоками по `chunk_size`."""
+    with open(path, 'rb') as file:
+        file.seek(start)
+        while length > 0:
+            chunk = file.read(min(chunk_size, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+class DocumentDownloadView(APIView):
+    """
+    Скачивание файла документа. Доступно только пользователям компании-исполнителя документа,
+    для чужих и несуществующих документов возвращается 404.
+
+    Поддерживает условные запросы (`If-None-Match`, `If-Modified-Since` -> 304) по ETag из хэша
+    содержимого файла и загрузку по частям (`Range`, `If-Range` -> 206/416).
+    Если задан `DOCUMENT_SENDFILE`, отдачу файла выполняет веб-сервер по заголовку `X-Sendfile`/`X-Accel-Redirect`.
+    """
+    permission_classes = [IsAuthed]
+
+    def perform_content_negotiation(self, request, force=False):
+        # Ответ - файл, поэтому заголовок `Accept` (например, тип docx) не должен приводить к 406
+        return super().perform_content_negotiation(request, force=True)
+
+    def get(self, request, did):
+        # Без компании фильтр ниже превратился бы в `IS NULL` и нашёл бы документы шаблонов без исполнителя
+        if request.user.company_id is None:
+            raise Http404("Файл документа не найден.")
+        document = Document.objects.select_related('template').filter(
+            pk=did, template__related_executor_person__company_id=request.user.company_id
+        ).first()
+        if document is None or not document.save_path or not os.path.exists(document.save_path):
+            raise Http404("Файл документа не найден.")
+
+        file_path = document.save_path
+        file_name = document.download_name()
+        content_type = document.mime_type or DOCX_MIME_TYPE
+        stat = os.stat(file_path)
+        etag = quote_etag(document.get_content_hash())
+        last_modified = int(stat.st_mtime)
+
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = build_download_response(request, file_path, file_name, content_type, stat.st_size, etag, last_modified)
+
+        response.headers['ETag'] = etag
+        response.headers['Last-Modified'] = http_date(last_modified)
+        response.headers['Accept-Ranges'] = 'bytes'
+        return response
+
+
+def build_download_response(request, file_path, file_name: str, content_type: str, size: int, etag: str, last_modified: int):
+    """Формирует ответ с содержимым файла: целиком, диапазоном или через веб-сервер"""
+    sendfile = getattr(settings, 'DOCUMENT_SENDFILE', '')
+    if sendfile:
+        response = HttpResponse(content_type=content_type)
+        response.headers['Content-Disposition'] = content_disposition_header(True, file_name)
+        if sendfile == 'x-accel-redirect':
+            relative = os.path.relpath(file_path, MEDIA_ROOT)
+            response.headers['X-Accel-Redirect'] = settings.DOCUMENT_SENDFILE_PREFIX.rstrip('/') + '/' + relative.replace(os.sep, '/')
+        else:
+            response.headers['X-Sendfile'] = str(file_path)
         return response
 
+    range_header = request.headers.get('Range')
+    if_range = request.headers.get('If-Range')
+    if range_header and if_range and if_range not in (etag, http_date(last_modified)):
+        # Файл изменился с момента первой загрузки - диапазон не применяется
+        range_header = None
+
+    byte_range = parse_range(range_header, size) if range_header else None
+    if byte_range is False:
+        response = HttpResponse(status=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+        response.headers['Content-Range'] = f'bytes */{size}'
+        return response
+
+    if byte_range is None:
+        return FileResponse(open(file_path, 'rb'), as_attachment=True, filename=file_name, content_type=content_type)
+
+    start, end = byte_range
+    length = end - start + 1
+    response = StreamingHttpResponse(
+        iter_file_range(file_path, start, length),
+        status=status.HTTP_206_PARTIAL_CONTENT,
+        content_type=content_type,
+    )
+    response.headers['Content-Length'] = str(length)
+    response.headers['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response.headers['Content-Disposition'] = content_disposition_header(True, file_name)
+    return response
+
 # template_detail(pk)
 
 # TODO: Сделать тогда, когда будет сделан объект документа
 
-@api_view(['GET'])
-def document_list(request):
-    documents = Document.objects.all()
-    serializer = DocumentSerializer(documents, many=True)
-    return Response(serializer.data)
-
 @api_view(['POST'])
 def generate_document(request):
     if request.method == 'POST':
@@ -1,5 +1,10 @@
+import hashlib
+import json
 # rest
 from rest_framework import generics, status
+from rest_framework.response import Response
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response, patch_cache_control, quote_etag
 from api.views.schema import SchemaAPIView
 # Permissions
 from rest_framework.permissions import AllowAny
@@ -9,12 +14,61 @@ from rest_framework import status
 from api.serializers.field import FieldSerializer
 # models
 from backend.models.fields import Field
+from backend.scripts.field_cache import get_fields_version
 # autodocs
 from drf_spectacular.utils import (
     extend_schema, extend_schema_view,
     OpenApiResponse,
 )
 
+
+# Сериализованные описания полей: `(related_item, фильтры) -> (версия, данные, etag)`
+_schemas = {}
+
+
+def get_fields_schema(related_item: str, **filters) -> tuple[list, str]:
+    """
+    Возвращает сериализованные `FieldSerializer` поля `Field` с `related_item` (и доп. фильтрами) и их ETag.
+
+    Данные хранятся в памяти процесса и в кэше Django под текущей версией полей (см. `field_cache`):
+    при сохранении или удалении любого поля версия меняется и схема строится заново.
+    """
+    key = (related_item, tuple(sorted(filters.items())))
+    version = get_fields_version()
+
+    cached = _schemas.get(key)
+    if cached is not None and cached[0] == version:
+        return cached[1], cached[2]
+
+    # Ключ без пробелов и спецсимволов, чтобы подходил и для memcached
+    cache_key = f"fields:schema:{version}:{related_item}:" + ",".join(f"{name}={value}" for name, value in key[1])
+    shared = cache.get(cache_key)
+    if shared is None:
+        data = FieldSerializer(Field.objects.filter(related_item=related_item, **filters), many=True).data
+        data = json.loads(json.dumps(data))
+        etag = quote_etag(hashlib.sha256(json.dumps(data, sort_keys=True).encode()).hexdigest())
+        shared = (data, etag)
+        cache.set(cache_key, shared, timeout=None)
+
+    _schemas[key] = (version, *shared)
+    return shared
+
+
+def fields_schema_response(request, related_item: str, **filters):
+    """
+    Ответ со схемой полей `related_item` для форм фронтенда.
+    Поддерживает `If-None-Match`: если схема не менялась, возвращается пустой ответ 304.
+    """
+    data, etag = get_fields_schema(related_item, **filters)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = Response(data, status=status.HTTP_200_OK)
+    response.headers['ETag'] = etag
+    # Браузер хранит схему, но каждый раз сверяет её с сервером по ETag
+    patch_cache_control(response, no_cache=True)
+    return response
+
+
 @extend_schema(tags=['Field'])
 @extend_schema_view(
     get=extend_schema(
@@ -32,4 +86,7 @@ class FieldFieldsListView(SchemaAPIView, generics.ListAPIView):
     queryset = Field.objects.filter(related_item="Field", is_custom=False)
     serializer_class = FieldSerializer
     details_serializer = FieldSerializer
-    permission_classes = [AllowAny]
\ No newline at end of file
+    permission_classes = [AllowAny]
+
+    def get(self, request, *args, **kwargs):
+        return fields_schema_response(request, "Field", is_custom=False)
\ No newline at end of file
@@ -1,73 +1,40 @@
+from django.conf import settings
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from drf_spectacular.plumbing import build_object_type
+from backend.scripts.query_budget import query_budget
 
 class SchemaAPIView(APIView):
     """
-    Универсальный View с правильной обработкой:
-    - GET (один объект)
-    - GET (список)
-    - POST/PUT/PATCH (успех)
-    - Ошибки валидации
+    Универсальный View с ответом в конверте `{"details": ..., "errors": ...}`:
+    - успешные ответы (GET объекта или списка, POST/PUT/PATCH) - данные в `details`;
+    - ошибки клиента (4XX) - данные в `errors`.
+
+    Данные ответа уже сериализованы представлением: конверт только оборачивает их, без повторной
+    сериализации и валидации. Рендеринг выполняется один раз (`api.renderers.ORJSONRenderer`).
+    Потоковые и файловые ответы (не `Response`) отдаются без изменений.
     """
-    details_serializer_class = None  # Переименовано для ясности
     error_messages = None
+    # Максимум запросов к БД на один GET-ответ, включая сессию и пользователя (проверяется при QUERY_BUDGET_CHECKS)
+    query_budget = None
 
-    def finalize_response(self, request, response, *args, **kwargs):
-        if not isinstance(response, Response):
-            return super().finalize_response(request, response, *args, **kwargs)
-
-        original_data = response.data
-        result = {
-            "details": None,
-            "errors": None
-        }
+    def dispatch(self, request, *args, **kwargs):
+        if self.query_budget is None or not settings.QUERY_BUDGET_CHECKS or request.method != "GET":
+            return super().dispatch(request, *args, **kwargs)
+        with query_budget(self.query_budget, type(self).__name__):
+            return super().dispatch(request, *args, **kwargs)
 
-        # Обработка ошибок валидации (status_code 4XX)
-        if 400 <= response.status_code < 500:
-            result["errors"] = original_data
-            response.data = result
-            return super().finalize_response(request, response, *args, **kwargs)
+    def finalize_response(self, request, response, *args, **kwargs):
+        if isinstance(response, Response):
+            response.data = envelope(response.data, response.status_code)
+        return super().finalize_response(request, response, *args, **kwargs)
 
-        # Обработка успешных ответов
-        if self.details_serializer_class:
-            # Для списков
-            if isinstance(original_data, list):
-                serializer = self.details_serializer_class(
-                    original_data,
-                    many=True,
-                    context=self.get_serializer_context()
-                )
-                result["details"] = serializer.data
-            
-            # Для одного объекта
-            elif isinstance(original_data, dict):
-                # Проверяем, есть ли в данных поля сериализатора
-                serializer = self.details_serializer_class(
-                    data=original_data,
-                    context=self.get_serializer_context()
-                )
-                if serializer.is_valid(raise_exception=False):
-                    result["details"] = serializer.validated_data
-                else:
-                    result["details"] = original_data
-            
-            # Для QuerySet или других итерируемых объектов
-            else:
-                try:
-                    serializer = self.details_serializer_class(
-                        original_data,
-                        many=hasattr(original_data, '__iter__') and not isinstance(original_data, (dict, str)),
-                        context=self.get_serializer_context()
-                    )
-                    result["details"] = serializer.data
-                except Exception:
-                    result["details"] = original_data
-        else:
-            result["details"] = original_data
 
-        response.data = result
-        return super().finalize_response(request, response, *args, **kwargs)
+def envelope(data, status_code: int) -> dict:
+    """Оборачивает сериализованные данные ответа в конверт API. Данные не копируются."""
+    if 400 <= status_code < 500:
+        return {"details": None, "errors": data}
+    return {"details": data, "errors": None}
     
 
 def schema_response(success_serializer_class=None, has_errors:bool=False):
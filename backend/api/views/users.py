@@ -1,5 +1,6 @@
 from rest_framework import generics
 from api.views.schema import SchemaAPIView
+from api.views.field import fields_schema_response
 from rest_framework.views import APIView
 from rest_framework.exceptions import ValidationError
 # Permissions
@@ -31,7 +32,6 @@ from drf_spectacular.utils import (
 # Validation
 from backend.scripts.field_validate import field_validate
 # scripts
-from backend.scripts.find_datavalue import find_dataValue
 from backend.scripts.load_data import load_data
 
 import json
@@ -238,13 +238,13 @@ class UserAuthView(SchemaAPIView, generics.ListCreateAPIView):
 
     def get(self, request, *args, **kwargs):
         self.details_serializer = FieldSerializer
-        return generics.ListCreateAPIView.get(self, request, *args, **kwargs)
+        return fields_schema_response(request, "UserLogin")
 
     def post(self, request, *args, **kwargs):
         data = load_data(request.data)
 
-        username = find_dataValue(data, "username")
-        password = find_dataValue(data, "password")
+        username = data.get("username")
+        password = data.get("password")
 
         print(f"Пользователь {username} входит в систему под паролем {password}")
 
@@ -409,17 +409,17 @@ class UserRegisterView(SchemaAPIView, generics.ListCreateAPIView):
     
     def get(self, request, *args, **kwargs):
         self.serializer_class = FieldSerializer
-        return generics.ListCreateAPIView.get(self, request, *args, **kwargs)
+        return fields_schema_response(request, "User")
 
     def post(self, request, *args, **kwargs):
         data = load_data(request.data)
 
-        error = field_validate(data, "User")
-        if error is not None:
-            raise ValidationError({error["field_id"]: error["error"]})
+        errors = field_validate(data, "User")
+        if errors is not None:
+            raise ValidationError(errors)
 
-        username = find_dataValue(data, "username")
-        password = find_dataValue(data, "password")
+        username = data.get("username")
+        password = data.get("password")
 
         if User.objects.filter(username=username).count() > 0:
             raise ValidationError({"username": "Пользователь с таким именем ужее существует"})
@@ -436,7 +436,7 @@ class UserRegisterView(SchemaAPIView, generics.ListCreateAPIView):
                     is_staff=False  # для доступа к админке если нужно
                 )
             except Exception as e:
-                if "UNIQUE constraint" in str(e) and "username" in str(e):
+                if "unique constraint" in str(e).lower() and "username" in str(e):
                     raise ValidationError({"username": "Пользователь с таким именем уже существует"})
                 raise ValidationError({"unknown": "Ошибка при создании пользователя: " + str(e)})
 
@@ -619,15 +619,15 @@ class UserFieldListView(SchemaAPIView, generics.ListCreateAPIView):
         
         data = load_data(request.data)
 
-        error = field_validate(data, "User")
-        if error is not None:
-            raise ValidationError({error["field_id"]: error["error"]})
+        errors = field_validate(data, "User")
+        if errors is not None:
+            raise ValidationError(errors)
         
-        name = find_dataValue(data, "name")
-        key_name = find_dataValue(data, "key_name")
-        type = find_dataValue(data, "type")
-        placeholder = find_dataValue(data, "placeholder")
-        validation_regex = find_dataValue(data, "validation_regex")
+        name = data.get("name")
+        key_name = data.get("key_name")
+        type = data.get("type")
+        placeholder = data.get("placeholder")
+        validation_regex = data.get("validation_regex")
 
         if not all([name, key_name, type]):
             raise ValidationError({"name": "Не удалось создать поле пользователя - отсутствуют поля `name`, `key_name` или `type`"}, code=status.HTTP_400_BAD_REQUEST)
@@ -644,7 +644,7 @@ class UserFieldListView(SchemaAPIView, generics.ListCreateAPIView):
                 is_custom=True,
             )
         except Exception as e:
-            if "UNIQUE constraint" in str(e):
+            if "unique constraint" in str(e).lower():
                 raise ValidationError({"key_name": "Поле пользователя с таким именем уже существует"})
             raise ValidationError({"error": "Не удалось создать поле пользователя" + str(e)})
         
@@ -706,9 +706,10 @@ class UserCustomFieldsView(SchemaAPIView, generics.ListAPIView):
     serializer_class = FieldSerializer
     details_serializer = FieldSerializer
     permission_classes = [IsAuthed]
+    query_budget = 3
 
     def get(self, request):
-        fields = Field.objects.filter(id__endswith=f"__{request.user.company.id}", is_custom=True, related_item="User")
+        fields = Field.objects.filter(id__endswith=f"__{request.user.company_id}", is_custom=True, related_item="User")
         return Response(self.serializer_class(fields, many=True).data, status=status.HTTP_200_OK)
 
 
@@ -878,6 +879,7 @@ class UserFieldValueView(SchemaAPIView, generics.ListCreateAPIView):
     serializer_class = UserFieldValueSerializer
     details_serializer = UserFieldValueSerializer
     permission_classes = [IsAuthed]
+    query_budget = 3
 
     def get(self, request):
         users_values = UsersValues.objects.filter(user_id=request.user)
@@ -886,14 +888,14 @@ class UserFieldValueView(SchemaAPIView, generics.ListCreateAPIView):
     def create(self, request, *args, **kwargs):
         data = load_data(request.data)
 
-        error = field_validate(data, "User")
-        if error is not None:
-            raise ValidationError({error["field_id"]: error["error"]})
+        errors = field_validate(data, "User")
+        if errors is not None:
+            raise ValidationError(errors)
         
         serializer = self.serializer_class(
-            field_id=find_dataValue(data, "field_id"),
+            field_id=data.get("field_id"),
             user_id=request.user,
-            value=find_dataValue(data, "value"))
+            value=data.get("value"))
         
         if serializer.is_valid():
             serializer.save(user=request.user)
@@ -1134,9 +1136,9 @@ class UserFieldValueDetailView(SchemaAPIView, generics.RetrieveUpdateDestroyAPIV
         value = self.__get_user_value(kwargs.get("pk"), request.user)
 
         data = load_data(request.data)
-        error = field_validate(data, "User")
-        if error is not None:
-            raise ValidationError({error["field_id"]: error["error"]})
+        errors = field_validate(data, "User")
+        if errors is not None:
+            raise ValidationError(errors)
         
         to_change = {}
         for item in data:
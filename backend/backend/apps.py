@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class BackendConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'backend'
+
+    def ready(self):
+        # Подключает сброс кэшей описаний полей при их изменении
+        from backend.scripts import field_cache  # noqa: F401
@@ -1,28 +1,104 @@
+import hashlib
+import json
+
 from django.core.management import BaseCommand
+from django.db import transaction
 from backend.scripts import initial_fields as ini
-from backend.models.fields import Field
+from backend.models.fields import Field, InitialFieldsState
+from backend.scripts.field_cache import bump_fields_version
 
 class Command(BaseCommand):
-    help = "Load initial fields from backend.scripts.initial_fields into Fields model."
+    help = (
+        "Load initial fields from backend.scripts.initial_fields into Fields model. "
+        "Does nothing if the definitions have not changed since the last run "
+        "(unless --force or --prune is given)."
+    )
+
+    # Поля, которые задаются описаниями и обновляются при их изменении
+    KEY_FIELDS = ('key_name', 'related_item')
+    SKIPPED_FIELDS = ('id', 'is_custom') + KEY_FIELDS
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Compare and apply definitions even if their hash has not changed.",
+        )
+        parser.add_argument(
+            "--prune",
+            action="store_true",
+            help="Delete standard fields that were removed from initial_fields (by default they are only listed).",
+        )
 
     def handle(self, *args, **options):
-        for i, dic in enumerate(ini.ALL_ITEMS):
-            print(f"Cheching values from {ini.STR_ITEMS[i]}:", end='\t')
-            added_fields = []
+        update_fields = [
+            field.name for field in Field._meta.concrete_fields if field.name not in self.SKIPPED_FIELDS
+        ]
+        content_hash = self.definitions_hash(update_fields)
+
+        # Описания не менялись - один запрос вместо обхода всех полей
+        state = InitialFieldsState.objects.first()
+        if state is not None and state.content_hash == content_hash and not options["force"] and not options["prune"]:
+            self.stdout.write(self.style.SUCCESS("Стандартные поля не изменились"))
+            return
+
+        definitions = {}
+        for dic in ini.ALL_ITEMS:
             for field in dic:
-                # Так как могут быть добавлены новые поля, `get_or_create` не подходит. 
-                # Вмето этого нужно овершать проверку по ключевым полям и создавать поля только если они есть.
-                if not Field.objects.filter(key_name=field['key_name'], related_item=field['related_item']).exists():
-                    Field.objects.create(
-                        id=f"{field['key_name']}__{field['related_item']}",
-                        is_custom=False,
-                        **field)
-                    print("1", end='')
-                    added_fields.append(f"{field['key_name']}__{field['related_item']}")
-                else:
-                    obj = Field.objects.filter(key_name=field['key_name'], related_item=field['related_item']).update(**field)
-            self.stdout.write(self.style.SUCCESS('\tDone'))
-            if len(added_fields) > 0:
-                for x in added_fields:
-                    print(f"\tДобавлено поле: {x}.")
-                
\ No newline at end of file
+                obj = Field(id=f"{field['key_name']}__{field['related_item']}", is_custom=False, **field)
+                definitions[(obj.key_name, obj.related_item)] = obj
+
+        # Пользовательские поля командой не сравниваются, не обновляются и не удаляются
+        custom = set(Field.objects.filter(is_custom=True).values_list(*self.KEY_FIELDS))
+        skipped = [obj for key, obj in definitions.items() if key in custom]
+        existing = {
+            (row['key_name'], row['related_item']): row
+            for row in Field.objects.filter(is_custom=False).values(*self.KEY_FIELDS, *update_fields)
+        }
+        added = [obj for key, obj in definitions.items() if key not in existing and key not in custom]
+        changed = [
+            obj for key, obj in definitions.items()
+            if key in existing and any(getattr(obj, name) != existing[key][name] for name in update_fields)
+        ]
+        removed = [key for key in existing if key not in definitions]
+
+        with transaction.atomic():
+            if added or changed:
+                Field.objects.bulk_create(
+                    added + changed,
+                    update_conflicts=True,
+                    unique_fields=list(self.KEY_FIELDS),
+                    update_fields=update_fields,
+                )
+            if removed and options["prune"]:
+                for key_name, related_item in removed:
+                    Field.objects.filter(key_name=key_name, related_item=related_item, is_custom=False).delete()
+            if state is None:
+                state = InitialFieldsState()
+            # Хэш - только от описаний: оставшиеся в базе удалённые поля выводятся сейчас,
+            # а удаляются запуском с --prune (он всегда сравнивает описания с базой)
+            state.content_hash = content_hash
+            state.save()
+
+        for obj in added:
+            self.stdout.write(f"\tДобавлено поле: {obj.id}.")
+        for obj in changed:
+            self.stdout.write(f"\tОбновлено поле: {obj.id}.")
+        for obj in skipped:
+            self.stdout.write(self.style.WARNING(f"\tПропущено (есть пользовательское поле с таким key_name): {obj.id}."))
+        for key_name, related_item in removed:
+            action = "Удалено" if options["prune"] else "Нет в initial_fields (удалите с --prune)"
+            self.stdout.write(self.style.WARNING(f"\t{action}: {key_name}__{related_item}."))
+
+        if added or changed or (removed and options["prune"]):
+            # `bulk_create()` не вызывает сигналы моделей, поэтому кэши полей сбрасываются явно
+            bump_fields_version()
+        self.stdout.write(self.style.SUCCESS(
+            f"Стандартные поля: добавлено {len(added)}, обновлено {len(changed)}, удалённых из описаний {len(removed)}"
+        ))
+
+    @staticmethod
+    def definitions_hash(update_fields: list) -> str:
+        """Хэш описаний полей и набора обновляемых столбцов: новый столбец модели тоже требует повторной загрузки."""
+        content = json.dumps([update_fields, ini.ALL_ITEMS], sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(content.encode()).hexdigest()
@@ -0,0 +1,42 @@
+import time
+
+from django.core.management import BaseCommand
+from backend.scripts.document_queue import reset_stale_jobs, run_queued_jobs
+
+class Command(BaseCommand):
+    help = (
+        "Run queued background document generation jobs (DocumentJob) in this process. "
+        "Jobs left RUNNING by a dead worker for longer than DOCUMENT_JOB_TIMEOUT are queued again first."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--limit",
+            type=int,
+            default=None,
+            help="Maximum number of jobs to run.",
+        )
+        parser.add_argument(
+            "--stale-after",
+            type=int,
+            default=None,
+            help="Seconds after which a RUNNING job is considered abandoned (default: DOCUMENT_JOB_TIMEOUT).",
+        )
+        parser.add_argument(
+            "--interval",
+            type=int,
+            default=0,
+            help="Repeat every N seconds instead of running once (for a scheduler container).",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            reset = reset_stale_jobs(options["stale_after"])
+            if reset:
+                self.stdout.write(self.style.WARNING(f"Возвращено в очередь зависших задач: {reset}"))
+            done = run_queued_jobs(options["limit"])
+            self.stdout.write(self.style.SUCCESS(f"Выполнено задач: {done}"))
+
+            if not options["interval"]:
+                return
+            time.sleep(options["interval"])
@@ -0,0 +1,48 @@
+import os
+import time
+
+from django.core.management import BaseCommand
+from backend.models.documents import Document
+from core.settings.base import DOCUMENTS_FOLDER
+
+class Command(BaseCommand):
+    help = "Delete files in DOCUMENTS_FOLDER that no Document refers to (deleted documents, interrupted writes)."
+
+    # Файлы моложе этого возраста не трогаем: временный файл может дописываться прямо сейчас,
+    # а готовый - быть уже записанным, но ещё не сохранённым в Document (транзакция не завершена)
+    TEMP_FILE_MIN_AGE = 60 * 60
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only print the files that would be deleted.",
+        )
+
+    def handle(self, *args, **options):
+        referenced = {
+            os.path.abspath(path)
+            for path in Document.objects.exclude(save_path__isnull=True).values_list('save_path', flat=True).iterator()
+            if path
+        }
+
+        removed = 0
+        freed = 0
+        now = time.time()
+        for root, dirs, files in os.walk(DOCUMENTS_FOLDER):
+            for name in files:
+                path = os.path.abspath(os.path.join(root, name))
+                if path in referenced:
+                    continue
+                stat = os.stat(path)
+                if now - stat.st_mtime < self.TEMP_FILE_MIN_AGE:
+                    continue
+                if options["dry_run"]:
+                    self.stdout.write(path)
+                else:
+                    os.remove(path)
+                removed += 1
+                freed += stat.st_size
+
+        action = "Будет удалено" if options["dry_run"] else "Удалено"
+        self.stdout.write(self.style.SUCCESS(f"{action} файлов: {removed} ({freed} байт)"))
@@ -0,0 +1,45 @@
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.management import BaseCommand
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = "Delete expired sessions in batches (replaces clearsessions for large django_session tables)."
+
+    # Движки, которые хранят сессии в таблице django_session
+    DB_ENGINES = (
+        'django.contrib.sessions.backends.db',
+        'django.contrib.sessions.backends.cached_db',
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=5000,
+            help="Number of sessions deleted per query.",
+        )
+
+    def handle(self, *args, **options):
+        if settings.SESSION_ENGINE not in self.DB_ENGINES:
+            # Кэш и подписанные куки удаляют просроченные сессии сами
+            import_module(settings.SESSION_ENGINE).SessionStore.clear_expired()
+            self.stdout.write(self.style.SUCCESS("Просроченные сессии очищены"))
+            return
+
+        # Удаление пачками, чтобы не держать долгую блокировку таблицы сессий
+        now = timezone.now()
+        removed = 0
+        while True:
+            keys = list(
+                Session.objects.filter(expire_date__lt=now)
+                .values_list('session_key', flat=True)[:options["batch_size"]]
+            )
+            if not keys:
+                break
+            removed += Session.objects.filter(session_key__in=keys).delete()[0]
+
+        self.stdout.write(self.style.SUCCESS(f"Удалено сессий: {removed}"))
@@ -0,0 +1,31 @@
+from django.core.management import BaseCommand
+from backend.models.documents import Template
+from backend.scripts.fill_document import find_fields, find_table_columns
+
+class Command(BaseCommand):
+    help = "Fill Template.found_fields and Template.table_headers from template files for templates uploaded before they existed."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Rescan every template, not only the ones with empty found_fields.",
+        )
+
+    def handle(self, *args, **options):
+        templates = Template.objects.exclude(template_file="").exclude(template_file__isnull=True)
+        if not options["all"]:
+            templates = templates.filter(found_fields__isnull=True)
+
+        scanned = 0
+        for template in templates.iterator():
+            try:
+                template.found_fields = find_fields(template.template_file)
+                template.table_headers = find_table_columns(template.template_file)
+            except Exception as e:
+                self.stdout.write(self.style.WARNING(f"Шаблон {template.id} ({template.template_name}) пропущен: {e}"))
+                continue
+            template.save(update_fields=["found_fields", "table_headers"])
+            scanned += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Обработано шаблонов: {scanned}"))
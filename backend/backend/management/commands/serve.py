@@ -0,0 +1,134 @@
+import multiprocessing
+import os
+
+from django.core.management import BaseCommand, CommandError
+
+from backend.scripts.warmup import warm_up
+
+
+def available_cpus() -> int:
+    """Число ядер, доступных процессу: учитывает привязку к ядрам и квоту CPU контейнера (cgroup v2)."""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = multiprocessing.cpu_count()
+
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as fh:
+            quota, period = fh.read().split()
+        if quota != "max":
+            cpus = min(cpus, max(1, int(quota) // int(period)))
+    except (OSError, ValueError):
+        pass
+    return cpus
+
+
+def default_workers(asgi: bool) -> int:
+    """
+    Число воркеров по умолчанию (переопределяется `WEB_CONCURRENCY`).
+
+    Синхронные воркеры большую часть запроса ждут БД и диск, поэтому их берётся `2 * ядра + 1`.
+    Воркеры uvicorn обслуживают запросы конкурентно, им хватает одного на ядро.
+    """
+    if os.environ.get("WEB_CONCURRENCY"):
+        return int(os.environ["WEB_CONCURRENCY"])
+    cpus = available_cpus()
+    return cpus if asgi else cpus * 2 + 1
+
+
+class Command(BaseCommand):
+    help = (
+        "Run the production server: gunicorn with threaded WSGI workers (or uvicorn ASGI workers with --asgi). "
+        "The app and document templates are loaded once before fork. "
+        "SIGHUP restarts workers gracefully; static and media files are left to the reverse proxy."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--bind",
+            default=os.environ.get("SERVER_BIND", "0.0.0.0:8000"),
+            help="Address to listen on (default: SERVER_BIND or 0.0.0.0:8000).",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help="Number of worker processes (default: WEB_CONCURRENCY or a CPU-based policy).",
+        )
+        parser.add_argument(
+            "--threads",
+            type=int,
+            default=int(os.environ.get("SERVER_THREADS", 4)),
+            help="Threads per WSGI worker (default: SERVER_THREADS or 4).",
+        )
+        parser.add_argument(
+            "--asgi",
+            action="store_true",
+            help="Serve core.asgi with uvicorn workers instead of core.wsgi.",
+        )
+        parser.add_argument(
+            "--timeout",
+            type=int,
+            default=int(os.environ.get("SERVER_TIMEOUT", 120)),
+            help="Seconds before a silent worker is killed and restarted (default: SERVER_TIMEOUT or 120).",
+        )
+        parser.add_argument(
+            "--max-requests",
+            type=int,
+            default=int(os.environ.get("SERVER_MAX_REQUESTS", 2000)),
+            help="Restart a worker after this many requests, 0 to disable (default: SERVER_MAX_REQUESTS or 2000).",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            from gunicorn.app.base import BaseApplication
+        except ImportError:
+            raise CommandError("gunicorn не установлен: pip install -r requirements.txt")
+
+        asgi = options["asgi"]
+        if asgi:
+            from core.asgi import application
+        else:
+            from core.wsgi import application
+
+        # Прогрев до fork: воркеры получают импортированный код и разобранные шаблоны готовыми
+        warmed = warm_up()
+        self.stdout.write(
+            f"Прогрето: маршрутов {warmed['urls']}, HTML-шаблонов {warmed['templates']}, "
+            f"шаблонов документов {warmed['documents']}"
+        )
+
+        config = {
+            "bind": options["bind"],
+            "workers": options["workers"] or default_workers(asgi),
+            "worker_class": "uvicorn.workers.UvicornWorker" if asgi else "gthread",
+            "threads": 1 if asgi else options["threads"],
+            "preload_app": True,
+            "timeout": options["timeout"],
+            # SIGHUP/SIGTERM: воркеры дообрабатывают текущие запросы в течение этого времени
+            "graceful_timeout": 30,
+            "keepalive": 5,
+            # Перезапуск воркеров по счётчику ограничивает рост памяти; разброс не даёт им перезапуститься одновременно
+            "max_requests": options["max_requests"],
+            "max_requests_jitter": options["max_requests"] // 10,
+            # Запросы приходят через обратный прокси (nginx), заголовки X-Forwarded-* ему доверяются
+            "forwarded_allow_ips": os.environ.get("FORWARDED_ALLOW_IPS", "*"),
+            "accesslog": "-",
+            "errorlog": "-",
+            "worker_tmp_dir": "/dev/shm" if os.path.isdir("/dev/shm") else None,
+        }
+
+        class Server(BaseApplication):
+            def load_config(self):
+                for key, value in config.items():
+                    if value is not None:
+                        self.cfg.set(key, value)
+
+            def load(self):
+                return application
+
+        self.stdout.write(
+            f"Запуск {'ASGI' if asgi else 'WSGI'} на {config['bind']}: "
+            f"воркеров {config['workers']}, потоков {config['threads']}"
+        )
+        Server().run()
@@ -0,0 +1,32 @@
+import time
+
+from django.conf import settings
+
+
+class SessionRefreshMiddleware:
+    """
+    Продлевает срок жизни сессии не на каждом запросе, а не чаще, чем раз в
+    `SESSION_REFRESH_FRACTION * SESSION_COOKIE_AGE` секунд.
+
+    Заменяет `SESSION_SAVE_EVERY_REQUEST`: чтения (проверка авторизации, схемы полей) больше не
+    записывают сессию в базу. Время последнего продления хранится в самой сессии.
+    Должен стоять после `SessionMiddleware`.
+    """
+    REFRESHED_AT_KEY = "_refreshed_at"
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+
+        session = getattr(request, "session", None)
+        if session is None or session.is_empty() or session.modified:
+            return response
+
+        now = int(time.time())
+        refreshed_at = session.get(self.REFRESHED_AT_KEY, 0)
+        if now - refreshed_at >= settings.SESSION_COOKIE_AGE * settings.SESSION_REFRESH_FRACTION:
+            # Изменение сессии заставляет SessionMiddleware сохранить её с новым сроком и обновить куку
+            session[self.REFRESHED_AT_KEY] = now
+        return response
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.6 on 2026-10-18 07:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0034_document_document_number'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='template',
+            name='found_fields',
+            field=models.JSONField(editable=False, null=True, verbose_name='Найденные в файле шаблона плейсхолдеры (заполняется программно)'),
+        ),
+        migrations.AddField(
+            model_name='template',
+            name='table_headers',
+            field=models.JSONField(editable=False, null=True, verbose_name='Заголовки столбцов таблицы в файле шаблона (заполняется программно)'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.6 on 2026-10-18 07:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0035_template_found_fields_table_headers'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='tablevalues',
+            index=models.Index(fields=['document_id', 'row_number'], name='table_values_document_row_idx'),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.1.6 on 2026-10-18 07:11
+
+from django.db import migrations, models
+
+
+def seed_document_counters(apps, schema_editor):
+    """Продолжаем нумерацию уже существующих документов в каждой области."""
+    Document = apps.get_model('backend', 'Document')
+    DocumentCounter = apps.get_model('backend', 'DocumentCounter')
+    db_alias = schema_editor.connection.alias
+
+    groups = (
+        Document.objects.using(db_alias)
+        .values(
+            'template__related_contractor_person',
+            'template__related_executor_person',
+            'template__template_type',
+        )
+        .annotate(total=models.Count('id'), last=models.Max('document_number'))
+    )
+    DocumentCounter.objects.using(db_alias).bulk_create([
+        DocumentCounter(
+            scope=f"document_number:{group['template__related_contractor_person']}:{group['template__related_executor_person']}:{group['template__template_type']}",
+            value=max(group['total'], group['last'] or 0),
+        )
+        for group in groups
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0036_tablevalues_document_row_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(max_length=255, unique=True, verbose_name='Область нумерации')),
+                ('value', models.BigIntegerField(default=0, verbose_name='Последний выданный номер')),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='document',
+            name='id',
+            field=models.BigAutoField(primary_key=True, serialize=False, verbose_name='Номер документа'),
+        ),
+        migrations.RunPython(seed_document_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.1.6 on 2026-10-18 07:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0037_document_counter'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='document',
+            name='status',
+            field=models.CharField(choices=[('PENDING', 'Ожидает генерации'), ('READY', 'Готов'), ('FAILED', 'Ошибка генерации')], default='READY', max_length=10, verbose_name='Состояние генерации'),
+        ),
+        migrations.CreateModel(
+            name='DocumentJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('QUEUED', 'В очереди'), ('RUNNING', 'Выполняется'), ('DONE', 'Выполнена'), ('FAILED', 'Ошибка')], default='QUEUED', max_length=10, verbose_name='Состояние задачи')),
+                ('payload', models.JSONField(verbose_name='Данные для заполнения шаблона')),
+                ('error', models.TextField(blank=True, null=True, verbose_name='Текст ошибки')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Начало выполнения')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Окончание выполнения')),
+                ('document', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='job', to='backend.document', verbose_name='Документ')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'created_at'], name='document_job_status_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-18 07:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0038_document_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='document',
+            name='content_hash',
+            field=models.CharField(blank=True, max_length=64, null=True, verbose_name='SHA-256 содержимого файла документа'),
+        ),
+    ]
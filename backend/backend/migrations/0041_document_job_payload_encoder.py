@@ -0,0 +1,19 @@
+# Generated by Django 5.1.6 on 2026-10-18 07:21
+
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0040_document_file_metadata'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='documentjob',
+            name='payload',
+            field=models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder, verbose_name='Данные для заполнения шаблона'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.1.6 on 2026-10-18 07:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0042_document_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InitialFieldsState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_hash', models.CharField(max_length=64, verbose_name='SHA-256 применённых описаний полей')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата применения')),
+            ],
+        ),
+    ]
@@ -0,0 +1,17 @@
+from django.db import migrations
+
+
+def remove_fields_version_counter(apps, schema_editor):
+    # Версия описаний полей теперь хранится в кэше Django (см. `backend.scripts.field_cache`)
+    apps.get_model('backend', 'DocumentCounter').objects.filter(scope='fields:version').delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0044_create_cache_table'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_fields_version_counter, migrations.RunPython.noop),
+    ]
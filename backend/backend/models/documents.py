@@ -1,7 +1,9 @@
-from django.db import models
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models, transaction
 from .company import ContractorPerson, ExecutorPerson
 from .fields import AbstractField
 from core.settings.base import TEMPLATES_FOLDER, DOCUMENTS_FOLDER
+from backend.scripts.document_storage import StoredFile, file_sha256
 
 class Template(models.Model):
     """
@@ -18,6 +20,8 @@ class Template(models.Model):
     template_file = models.FileField(upload_to='templates/', verbose_name="Файл шаблона", null=True, blank=True)
     related_contractor_person = models.ForeignKey(ContractorPerson, on_delete=models.CASCADE, verbose_name="Представитель (юридическое лицо) заказчика", null=True, blank=True)
     related_executor_person = models.ForeignKey(ExecutorPerson, on_delete=models.CASCADE, verbose_name="Представитель (юридическое лицо) исполнителя", null=True, blank=True)
+    found_fields = models.JSONField(null=True, editable=False, verbose_name="Найденные в файле шаблона плейсхолдеры (заполняется программно)")
+    table_headers = models.JSONField(null=True, editable=False, verbose_name="Заголовки столбцов таблицы в файле шаблона (заполняется программно)")
     
     def __str__(self):
         return self.template_name
@@ -74,27 +78,159 @@ class Document(models.Model):
         - id - уникальный номер документа
         - created_at - дата создания документа
         - showDate - дата, которая отображается в документе (фактически, первая рабочая неделя месяца)
-        - doc - путь к сохранённому документу
-        - table - данные таблицы, если она там имеется с определёнными данными.
-            check TODO
+        - doc - путь к сохранённому документу (файл в хранилище по хэшу содержимого, см. `document_storage`)
+        - table - данные таблицы хранятся построчно в `TableValues`, см. `get_table()`.
+        - status - состояние генерации файла документа (см. `DocumentJob`).
     """
+    STATUSES = [
+        ('PENDING', 'Ожидает генерации'),
+        ('READY', 'Готов'),
+        ('FAILED', 'Ошибка генерации'),
+    ]
     
-    id = models.BigIntegerField(primary_key=True, verbose_name='Номер документа')
+    id = models.BigAutoField(primary_key=True, verbose_name='Номер документа')
     template = models.ForeignKey(Template, on_delete=models.CASCADE, verbose_name="Шаблон")
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
     shown_date = models.DateField(verbose_name="Отображаемая дата")
     save_path = models.CharField(max_length=255, verbose_name=f"Путь к сохранённому документу относительно {DOCUMENTS_FOLDER}", null=True, blank=True)
     document_number = models.IntegerField(verbose_name="Номер документа в шаблоне", default=0)
+    status = models.CharField(max_length=10, choices=STATUSES, default='READY', verbose_name="Состояние генерации")
+    content_hash = models.CharField(max_length=64, null=True, blank=True, verbose_name="SHA-256 содержимого файла документа")
+    file_size = models.BigIntegerField(null=True, blank=True, verbose_name="Размер файла документа в байтах")
+    mime_type = models.CharField(max_length=100, null=True, blank=True, verbose_name="MIME-тип файла документа")
+
+    class Meta:
+        indexes = [
+            # Ключ постраничной выдачи (см. api.pagination.KeysetPagination)
+            models.Index(fields=['template', 'created_at', 'id'], name='document_template_created_idx'),
+            models.Index(fields=['created_at', 'id'], name='document_created_idx'),
+        ]
 
     def save(self, *args, **kwargs):
-        if not self.id:
-            self.document_number = Document.objects.filter(
-                template__related_contractor_person=self.template.related_contractor_person,
-                template__related_executor_person=self.template.related_executor_person,
-                template__template_type=self.template.template_type
-                ).count() + 1
+        # Номер лучше выдать заранее (`allocate_number`): здесь он выдаётся в транзакции сохранения документа
+        if self._state.adding and not self.document_number:
+            self.document_number = DocumentCounter.next_value(self.number_scope())
         super().save(*args, **kwargs)
-        #return documents.Document.objects.filter(template=obj.template).count() + 1
+
+    @classmethod
+    def allocate_number(cls, template: 'Template') -> int:
+        """
+        Выдаёт следующий номер документа шаблона `template`.
+
+        Вызывать до транзакции, в которой создаётся документ: счётчик обновляется в своей короткой
+        транзакции, и его строка не остаётся заблокированной, пока заполняется файл документа.
+        Если документ затем не будет создан, номер пропускается (номера не повторяются, но могут идти с пропусками).
+        """
+        return DocumentCounter.next_value(cls(template=template).number_scope())
+
+    def attach_file(self, stored: StoredFile):
+        """
+        Привязывает к документу файл из хранилища документов (см. `document_storage.store_content`).
+        Запись в базу не выполняется - вызовите `save()`.
+        """
+        self.save_path = stored.path
+        self.content_hash = stored.content_hash
+        self.file_size = stored.size
+        self.mime_type = stored.mime_type
+
+    def download_name(self) -> str:
+        """Имя файла для скачивания: в хранилище файлы называются по хэшу содержимого."""
+        return f"{self.id}_{self.template.template_name}.docx"
+
+    def get_content_hash(self) -> str:
+        """Хэш содержимого файла. Для документов, созданных до появления хэша, вычисляется и сохраняется один раз."""
+        if not self.content_hash:
+            self.content_hash = file_sha256(self.save_path)
+            Document.objects.filter(pk=self.pk).update(content_hash=self.content_hash)
+        return self.content_hash
+
+    def number_scope(self) -> str:
+        """Область нумерации документа: лицо заказчика, лицо исполнителя и тип шаблона."""
+        return DocumentCounter.document_number_scope(
+            self.template.related_contractor_person_id,
+            self.template.related_executor_person_id,
+            self.template.template_type,
+        )
+
+    def get_table(self) -> list[list[str]]:
+        """
+        Восстанавливает таблицу документа из сохранённых `TableValues`.
+        Строки идут по `row_number`, столбцы - по `TableField.order`.
+        """
+        table = []
+        for value in TableValues.objects.filter(document_id=self).order_by('row_number', 'table_id__order'):
+            if not table or table[-1][0] != value.row_number:
+                table.append((value.row_number, []))
+            table[-1][1].append(value.value)
+        return [row for _, row in table]
+
+
+class DocumentCounter(models.Model):
+    """
+    Счётчик для выдачи последовательных номеров документов.
+
+    Одна строка на область нумерации (`scope`). Значение увеличивается атомарным UPDATE,
+    поэтому номер выдаётся за константное время и не повторяется при параллельных сохранениях
+    или после удаления документов.
+    """
+
+    scope = models.CharField(max_length=255, unique=True, verbose_name="Область нумерации")
+    value = models.BigIntegerField(default=0, verbose_name="Последний выданный номер")
+
+    def __str__(self):
+        return f"{self.scope}: {self.value}"
+
+    @staticmethod
+    def document_number_scope(contractor_person_id, executor_person_id, template_type) -> str:
+        return f"document_number:{contractor_person_id}:{executor_person_id}:{template_type}"
+
+    @classmethod
+    def next_value(cls, scope: str) -> int:
+        """
+        Увеличивает счётчик `scope` на единицу и возвращает новое значение.
+
+        Строка счётчика блокируется UPDATE до конца транзакции: внутри внешней транзакции
+        (`transaction.atomic`) блокировка держится до её завершения, поэтому номера документов
+        выдаются до неё, см. `Document.allocate_number`.
+        """
+        counters = cls.objects.filter(scope=scope)
+        with transaction.atomic():
+            if not counters.update(value=models.F('value') + 1):
+                _, created = cls.objects.get_or_create(scope=scope, defaults={'value': 1})
+                if not created:
+                    counters.update(value=models.F('value') + 1)
+            return counters.values_list('value', flat=True).get()
+
+
+class DocumentJob(models.Model):
+    """
+    Задача фоновой генерации файла документа.
+
+    Хранит всё, что нужно для `fill_document`, поэтому задачу может выполнить любой процесс
+    приложения без внешнего брокера: см. `backend.scripts.document_queue`.
+    """
+    STATUSES = [
+        ('QUEUED', 'В очереди'),
+        ('RUNNING', 'Выполняется'),
+        ('DONE', 'Выполнена'),
+        ('FAILED', 'Ошибка'),
+    ]
+
+    document = models.OneToOneField(Document, on_delete=models.CASCADE, related_name='job', verbose_name="Документ")
+    status = models.CharField(max_length=10, choices=STATUSES, default='QUEUED', verbose_name="Состояние задачи")
+    payload = models.JSONField(encoder=DjangoJSONEncoder, verbose_name="Данные для заполнения шаблона")
+    error = models.TextField(null=True, blank=True, verbose_name="Текст ошибки")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name="Начало выполнения")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="Окончание выполнения")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='document_job_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.document_id}: {self.status}"
 
 
 class DocumentsValues(models.Model):
@@ -145,13 +281,9 @@ class TableValues(models.Model):
 
     class Meta:
         unique_together = ('row_number', 'document_id', 'table_id')
+        indexes = [
+            models.Index(fields=['document_id', 'row_number'], name='table_values_document_row_idx'),
+        ]
 
     def __str__(self):
         return f"{self.document_id} - {self.table_id}[{self.row_number}]: {self.value}"
-    
-    def save(self, *args, **kwargs):
-        # Autoincremental row_number
-        if not self.order_number:
-            last_entry = TableValues.objects.order_by('row_number').last()
-            self.order_number = (last_entry.order_number + 1) if last_entry else 0
-        super().save(*args, **kwargs)
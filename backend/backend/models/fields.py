@@ -42,4 +42,15 @@ class Field(AbstractField):
             models.UniqueConstraint(
                 fields=['key_name', 'related_item'], name='field_key_name_related_item_combination'
             )
-        ]
\ No newline at end of file
+        ]
+
+class InitialFieldsState(models.Model):
+    """
+    Состояние загрузки стандартных полей из `backend.scripts.initial_fields` (одна строка).
+    Хранит хэш применённых описаний: если он не изменился, `create_initial_fields` ничего не делает.
+    """
+    content_hash = models.CharField(max_length=64, verbose_name="SHA-256 применённых описаний полей")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата применения")
+
+    def __str__(self):
+        return self.content_hash
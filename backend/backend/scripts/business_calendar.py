@@ -0,0 +1,46 @@
+from datetime import date, timedelta
+from functools import lru_cache
+import threading
+
+from workalendar.europe import Russia
+
+
+_calendar = Russia()
+# `workalendar` кэширует праздники внутри объекта календаря без блокировок
+_calendar_lock = threading.Lock()
+
+
+@lru_cache(maxsize=64)
+def month_working_days(year: int, month: int) -> tuple[date, ...]:
+    """Рабочие дни месяца по производственному календарю РФ. Таблица считается один раз на месяц."""
+    first = date(year, month, 1)
+    next_month = date(year + month // 12, month % 12 + 1, 1)
+    with _calendar_lock:
+        return tuple(
+            first + timedelta(days=offset)
+            for offset in range((next_month - first).days)
+            if _calendar.is_working_day(first + timedelta(days=offset))
+        )
+
+
+def nth_working_day(year: int, month: int, n: int) -> date:
+    """
+    `n`-й (с 1) рабочий день месяца.
+
+    :raises ValueError: если в месяце меньше `n` рабочих дней.
+    """
+    days = month_working_days(year, month)
+    if not 1 <= n <= len(days):
+        raise ValueError(f"В {month:02d}.{year} нет {n}-го рабочего дня (рабочих дней: {len(days)}).")
+    return days[n - 1]
+
+
+def first_working_day(year: int, month: int) -> date:
+    """Первый рабочий день месяца."""
+    return nth_working_day(year, month, 1)
+
+
+def current_shown_date() -> date:
+    """Дата, отображаемая в документах текущего месяца: первый рабочий день месяца."""
+    today = date.today()
+    return first_working_day(today.year, today.month)
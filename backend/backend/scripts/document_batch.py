@@ -0,0 +1,87 @@
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import io
+import multiprocessing
+import os
+import threading
+
+from django.conf import settings
+
+from backend.scripts.fill_document import fill_document
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ProcessPoolExecutor:
+    """
+    Пул процессов для пакетной генерации, общий для всех запросов процесса сервера.
+
+    Размер пула фиксирован и мал (`DOCUMENT_BATCH_PROCESSES`, по умолчанию 2), а не "по числу ядер":
+    пул есть у каждого воркера gunicorn, а воркеров уже `2 * ядра + 1` (см. `serve`).
+    Процессы пула не настраивают Django и не открывают соединений с БД - `render_to_bytes` работает только с файлами.
+
+    Создаётся при первом обращении, то есть уже в воркере после fork (`preload_app` в `serve`):
+    унаследованный от мастера пул неработоспособен, поэтому пул привязан к PID создавшего процесса.
+    Дочерние процессы запускаются через forkserver (или spawn, где его нет) и не копируют
+    потоки и открытые соединения воркера.
+    """
+    global _pool, _pool_pid
+    if _pool is None or _pool_pid != os.getpid():
+        with _pool_lock:
+            if _pool is None or _pool_pid != os.getpid():
+                method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+                _pool = ProcessPoolExecutor(
+                    max_workers=settings.DOCUMENT_BATCH_PROCESSES,
+                    mp_context=multiprocessing.get_context(method),
+                )
+                _pool_pid = os.getpid()
+    return _pool
+
+
+def reset_pool(broken: ProcessPoolExecutor):
+    """Убирает сломанный пул (процесс пула аварийно завершился), следующий вызов `get_pool()` создаст новый."""
+    global _pool
+    with _pool_lock:
+        if _pool is broken:
+            _pool = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+
+def render_to_bytes(task: tuple) -> dict:
+    """
+    Заполняет шаблон в памяти. Выполняется в дочернем процессе, поэтому не обращается к базе данных.
+
+    :param task: `(filename, data, table_data, document_settings)` - аргументы `fill_document`.
+    :return: результат `fill_document`, дополненный ключом `content` с байтами документа.
+    """
+    filename, data, table_data, document_settings = task
+    buffer = io.BytesIO()
+    try:
+        result = fill_document(filename, data, table_data, document_settings, output=buffer)
+    except Exception as e:
+        return {'code': 0, 'error': str(e), 'path': '', 'warnings': [], 'shown_date': None, 'content': None}
+    result['content'] = buffer.getvalue() if not result.get('error') else None
+    return result
+
+
+def render_many(tasks: list[tuple]) -> list[dict]:
+    """
+    Заполняет шаблоны для всех `tasks` на общем пуле процессов (`get_pool()`). Порядок результатов
+    совпадает с порядком задач. Процессы пула живут между запросами и держат свой кэш разобранных шаблонов.
+    При `DOCUMENT_BATCH_PROCESSES` не больше 1 и для пакета из одного документа пул не используется.
+    """
+    if settings.DOCUMENT_BATCH_PROCESSES <= 1 or len(tasks) <= 1:
+        return [render_to_bytes(task) for task in tasks]
+
+    pool = get_pool()
+    try:
+        return list(pool.map(render_to_bytes, tasks))
+    except BrokenProcessPool as e:
+        reset_pool(pool)
+        return [
+            {'code': 0, 'error': f"процесс генерации завершился аварийно ({e})", 'path': '', 'warnings': [], 'shown_date': None, 'content': None}
+            for _ in tasks
+        ]
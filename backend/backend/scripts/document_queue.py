@@ -0,0 +1,116 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from backend.models.documents import Document, DocumentJob
+from backend.scripts.fill_document import fill_document
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """Пул потоков процесса для фоновой генерации документов (создаётся при первом обращении)."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.DOCUMENT_WORKERS,
+                    thread_name_prefix="document-job",
+                )
+    return _executor
+
+
+def enqueue_job(document: Document, filename: str, data: dict, table_data: list[list[str]], document_settings: dict) -> DocumentJob:
+    """
+    Ставит генерацию файла документа `document` в очередь.
+
+    Задача сохраняется в таблицу `DocumentJob` и отправляется в локальный пул потоков
+    после фиксации текущей транзакции. Если процесс завершится раньше, задачу доберёт
+    команда `process_document_jobs`.
+    """
+    document.status = 'PENDING'
+    document.save(update_fields=["status"])
+    job = DocumentJob.objects.create(
+        document=document,
+        payload={
+            'filename': filename,
+            'data': data,
+            'table_data': table_data,
+            'settings': document_settings,
+        },
+    )
+    transaction.on_commit(lambda: get_executor().submit(run_job, job.id))
+    return job
+
+
+def run_job(job_id: int) -> bool:
+    """
+    Выполняет задачу `job_id`, если она ещё в очереди.
+    Возвращает `True`, если задача была взята этим вызовом.
+    """
+    close_old_connections()
+    try:
+        # Захват задачи атомарным UPDATE: одну задачу не выполнят два воркера
+        claimed = DocumentJob.objects.filter(id=job_id, status='QUEUED').update(status='RUNNING', started_at=timezone.now())
+        if not claimed:
+            return False
+
+        job = DocumentJob.objects.select_related('document').get(id=job_id)
+        document = job.document
+        payload = job.payload
+        try:
+            info = fill_document(payload['filename'], payload['data'], payload['table_data'], payload['settings'])
+            if info.get("error"):
+                raise ValueError(info["error"])
+        except Exception as e:
+            job.status = 'FAILED'
+            job.error = str(e)
+            document.status = 'FAILED'
+        else:
+            job.status = 'DONE'
+            document.status = 'READY'
+            document.shown_date = info.get("shown_date")
+            if info.get("file"):
+                document.attach_file(info["file"])
+
+        job.finished_at = timezone.now()
+        with transaction.atomic():
+            document.save(update_fields=["status", "shown_date", "save_path", "content_hash", "file_size", "mime_type"])
+            job.save(update_fields=["status", "error", "finished_at"])
+        return True
+    finally:
+        close_old_connections()
+
+
+def reset_stale_jobs(timeout: int | None = None) -> int:
+    """
+    Возвращает в очередь задачи, оставшиеся в RUNNING дольше `timeout` секунд (по умолчанию `DOCUMENT_JOB_TIMEOUT`).
+
+    Такие задачи захватил воркер, который завершился (перезапуск, OOM) до записи результата:
+    сами они из RUNNING не выйдут. Возвращает количество сброшенных задач.
+    """
+    timeout = settings.DOCUMENT_JOB_TIMEOUT if timeout is None else timeout
+    return DocumentJob.objects.filter(
+        status='RUNNING',
+        started_at__lt=timezone.now() - timedelta(seconds=timeout),
+    ).update(status='QUEUED', started_at=None)
+
+
+def run_queued_jobs(limit: int | None = None) -> int:
+    """Синхронно выполняет задачи из очереди в порядке создания. Возвращает количество выполненных задач."""
+    jobs = DocumentJob.objects.filter(status='QUEUED').order_by('created_at').values_list('id', flat=True)
+    if limit is not None:
+        jobs = jobs[:limit]
+
+    done = 0
+    for job_id in list(jobs):
+        if run_job(job_id):
+            done += 1
+    return done
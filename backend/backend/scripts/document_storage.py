@@ -0,0 +1,92 @@
+import hashlib
+import io
+import os
+import tempfile
+import zipfile
+from typing import NamedTuple
+
+from core.settings.base import DOCUMENTS_FOLDER
+
+
+HASH_CHUNK_SIZE = 1024 * 1024
+DOCX_MIME_TYPE = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+# Папка для документов, у шаблона которых не указано лицо исполнителя
+COMMON_SHARD = "common"
+# Время изменения всех частей .docx: zipfile иначе пишет текущее время, и одинаковые документы дают разные файлы
+ZIP_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+
+
+class StoredFile(NamedTuple):
+    """Файл, сохранённый в хранилище документов."""
+    path: str
+    content_hash: str
+    size: int
+    mime_type: str
+
+
+def content_sha256(content: bytes) -> str:
+    """SHA-256 содержимого документа в шестнадцатеричном виде."""
+    return hashlib.sha256(content).hexdigest()
+
+
+def file_sha256(path) -> str:
+    """SHA-256 файла `path`, файл читается блоками по `HASH_CHUNK_SIZE`."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        while chunk := file.read(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def normalize_docx(content: bytes) -> bytes:
+    """
+    Пересобирает архив .docx с фиксированным временем изменения частей (`ZIP_DATE_TIME`).
+
+    python-docx записывает части с текущим временем, поэтому один и тот же документ, сохранённый дважды,
+    давал разные байты и разный хэш. После нормализации одинаковое содержимое всегда даёт одинаковый файл,
+    и дедупликация в `store_content` срабатывает (например, при повторной генерации того же документа).
+    """
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(io.BytesIO(content)) as source, zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as target:
+        for item in source.infolist():
+            info = zipfile.ZipInfo(item.filename, date_time=ZIP_DATE_TIME)
+            info.compress_type = zipfile.ZIP_DEFLATED
+            info.external_attr = item.external_attr
+            target.writestr(info, source.read(item))
+    return buffer.getvalue()
+
+
+def storage_path(content_hash: str, company_id: int | None = None, extension: str = ".docx"):
+    """
+    Путь файла с хэшем `content_hash` в хранилище:
+    `DOCUMENTS_FOLDER/<компания исполнителя>/<ab>/<cd>/<хэш><расширение>`.
+
+    Два уровня подпапок по первым символам хэша держат в каждой папке не больше нескольких сотен файлов.
+    """
+    shard = f"company_{company_id}" if company_id is not None else COMMON_SHARD
+    return DOCUMENTS_FOLDER / shard / content_hash[:2] / content_hash[2:4] / f"{content_hash}{extension}"
+
+
+def store_content(content: bytes, company_id: int | None = None, extension: str = ".docx", mime_type: str = DOCX_MIME_TYPE) -> StoredFile:
+    """
+    Сохраняет содержимое документа в хранилище под его хэшем.
+
+    Одинаковые файлы одной компании хранятся один раз: если файл с таким хэшем уже есть, он не перезаписывается.
+    Хэш считается по байтам, поэтому .docx нужно сохранять через `normalize_docx`. Документы с разными номерами
+    или данными различаются содержимым, так что совпадают только повторные генерации одного и того же документа.
+    Запись идёт через временный файл и `os.replace`, поэтому читатели никогда не видят недописанный документ.
+    """
+    content_hash = content_sha256(content)
+    path = storage_path(content_hash, company_id, extension)
+    if not path.exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                file.write(content)
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+    return StoredFile(str(path), content_hash, len(content), mime_type)
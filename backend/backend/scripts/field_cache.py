@@ -0,0 +1,41 @@
+import time
+
+from django.core.cache import cache
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from backend.models.fields import Field
+from backend.models.documents import DocumentField, TableField
+
+
+FIELDS_VERSION_KEY = "fields:version"
+
+
+def get_fields_version() -> int:
+    """
+    Текущая версия описаний полей (`Field`, `DocumentField`, `TableField`).
+    Хранится в кэше Django (Redis или таблица кэша, см. `CACHES`), поэтому одна на все процессы
+    и воркеры сервера, а также на management-команды. Кэши, построенные по описаниям полей,
+    включают версию в ключ и устаревают при её смене в любом процессе.
+    """
+    version = cache.get(FIELDS_VERSION_KEY)
+    if version is None:
+        # Ключ потерян (кэш очищен) или ещё не создан: новая версия больше всех выданных ранее
+        cache.add(FIELDS_VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(FIELDS_VERSION_KEY)
+    return version
+
+
+def bump_fields_version():
+    """Сбрасывает все кэши, построенные по описаниям полей. Вызывать после любого изменения полей."""
+    try:
+        cache.incr(FIELDS_VERSION_KEY)
+    except ValueError:
+        cache.add(FIELDS_VERSION_KEY, time.time_ns(), timeout=None)
+
+
+@receiver([post_save, post_delete], sender=Field)
+@receiver([post_save, post_delete], sender=DocumentField)
+@receiver([post_save, post_delete], sender=TableField)
+def fields_changed(sender, **kwargs):
+    bump_fields_version()
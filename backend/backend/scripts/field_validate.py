@@ -1,66 +1,112 @@
+from functools import lru_cache
+from typing import NamedTuple
+
 from backend.models.fields import Field
 from backend.models.documents import DocumentField, TableField
-import regex 
-import json
+from backend.scripts.field_cache import get_fields_version
+import regex
 
+# Порядок важен: при совпадении `key_name` используется поле из модели, стоящей раньше
 FIELDS_DB = [
     Field,
-    DocumentField, 
+    DocumentField,
     TableField,
 ]
 
-def field_validate(data: list[dict], type:str):
+DEFAULT_ERROR = "Неверный формат по validation_regex"
+NOT_FOUND_ERROR = "Поле не было найдено в списке полей"
+
+
+class FieldValidator(NamedTuple):
+    """Скомпилированное правило проверки значения поля."""
+    key_name: str
+    pattern: "regex.Pattern | None"
+    error_text: str
+    regex_error: str | None = None
+
+    def check(self, value) -> str | None:
+        """Возвращает текст ошибки или `None`, если значение подходит."""
+        if self.regex_error is not None:
+            return self.regex_error
+        if self.pattern is None or self.pattern.match("" if value is None else str(value)) is not None:
+            return None
+        return self.error_text
+
+
+@lru_cache(maxsize=512)
+def compile_validators(related_item: str, template_id: int | None, version: int) -> dict[str, FieldValidator]:
     """
-    Принимает значения поля и проверяет их валидность через `validation_regex`.
-    Возвращает ошибку если валидация провалена или None.
+    Загружает описания полей `related_item` и компилирует их регулярные выражения.
+    Собственные поля шаблонов (`DocumentField`, `TableField`) учитываются только для шаблона `template_id`.
+
+    Результат кэшируется по `(related_item, template_id, version)`: при изменении полей версия меняется
+    (см. `field_cache`), и старые записи больше не используются.
     """
-    error = None
+    validators = {}
+    for model in FIELDS_DB:
+        fields = model.objects.filter(related_item=related_item)
+        if model is not Field:
+            if template_id is None:
+                continue
+            fields = fields.filter(related_template=template_id)
+
+        for key_name, validation_regex, error_text in fields.values_list('key_name', 'validation_regex', 'error_text'):
+            if key_name in validators:
+                continue
+            pattern, regex_error = None, None
+            if validation_regex:
+                try:
+                    pattern = regex.compile(validation_regex)
+                except regex.error as e:
+                    regex_error = f"Некорректное validation_regex поля: {e}"
+            validators[key_name] = FieldValidator(key_name, pattern, error_text or DEFAULT_ERROR, regex_error)
+    return validators
+
+
+def get_validators(related_item: str, template=None) -> dict[str, FieldValidator]:
+    """Скомпилированные правила проверки полей `related_item` (и полей шаблона `template`), по `key_name`."""
+    template_id = getattr(template, 'pk', template)
+    return compile_validators(related_item, template_id, get_fields_version())
 
-    print(data)
+
+def field_validate(data: list[dict], type: str, template=None) -> dict[str, list[str]] | None:
+    """
+    Принимает значения полей и проверяет их валидность через `validation_regex`.
+    Значения-списки относятся к столбцам таблицы (`TableField`) - проверяется каждая ячейка.
+
+    Проверяются все значения сразу, без остановки на первой ошибке.
+    Возвращает словарь ошибок `{field_id: [текст ошибки, ...]}` (подходит для `ValidationError`) или `None`.
+
+    :param template: Шаблон (или его id), собственные поля которого нужно учитывать.
+    """
+    errors = {}
+    validators = get_validators(type, template)
+    table_validators = None
 
     for item in data:
-        #print(item)
         field_id = item.get("field_id")
         value = item.get("value")
 
         if isinstance(value, list):
-            type = "TableField"
-
-        print("value = ", value)
-        
-        for x in FIELDS_DB:
-            field = x.objects.filter(key_name=field_id, related_item=type).first()
-            if field is not None:
-                break
-        if field is None:
-            error = {
-                "field_id": field_id,
-                "error": "Поле не было найдено в списке полей"
-            }
-            return error
-        
-        validation_regex = field.validation_regex
-        
+            # Списки могут быть только для TableField
+            if table_validators is None:
+                table_validators = get_validators("TableField", template)
+            validator = table_validators.get(field_id)
+        else:
+            validator = validators.get(field_id)
+
+        if validator is None:
+            errors.setdefault(field_id, []).append(NOT_FOUND_ERROR)
+            continue
+
         if isinstance(value, list):
-            for item_v in value:
-                # Списки могут быть только для TableField
-                if validation_regex is not None:
-                    re = regex.compile(validation_regex)
-                    if re.match(value) is None:
-                        error = {
-                            "field_id": field_id,
-                            "error": "Неверный формат по validation_regex"
-                        }
-                        break
-            return error
+            for row, cell in enumerate(value, start=1):
+                error = validator.check(cell)
+                if error is not None:
+                    errors.setdefault(field_id, []).append(f"Строка {row}: {error}")
         else:
-            if validation_regex is not None:
-                re = regex.compile(validation_regex)
-                if re.match(value) is None:
-                    error = {
-                        "field_id": field_id,
-                        "error": "Неверный формат по validation_regex"
-                    }
-                    break
-
-    return error
\ No newline at end of file
+            error = validator.check(value)
+            if error is not None:
+                errors.setdefault(field_id, []).append(error)
+
+    return errors or None
@@ -1,22 +1,25 @@
 from docx import *
 from docxtpl import *
 import os
-from workalendar.europe import Russia
-import locale
+import io
+import copy
 from datetime import date
-from random import randint
-import re
-from django.core.exceptions import ValidationError
+from decimal import Decimal
+from typing import IO
 
-from core.settings.base import DOCUMENTS_FOLDER, TEMPLATES_FOLDER, MEDIA_ROOT
+from core.settings.base import TEMPLATES_FOLDER, MEDIA_ROOT
 
-from backend.scripts.money_to_words import money_to_words
+from backend.scripts.money_to_words import amount_in_words
+from backend.scripts.template_cache import get_compiled_template
+from backend.scripts.document_storage import normalize_docx, store_content
+from backend.scripts.business_calendar import current_shown_date
+from backend.scripts.ru_format import format_date, format_number
 
 
-def fill_document(filename: str, data: dict, table_data: list[list[str]], settings: dict = {}) -> dict:
+def fill_document(filename: str, data: dict, table_data: list[list[str]], settings: dict = {}, output: IO[bytes] | None = None) -> dict:
     """
     Выполняет заполнение документа шаблона `filename` необходимыми данными. 
-    Итоговый файл сохранятся в `DOCUMENTS_FOLDER`.
+    Итоговый файл сохраняется в хранилище документов (`DOCUMENTS_FOLDER`, см. `document_storage`), либо записывается в `output`, если он передан.
     Заполнение шаблонов происходит согласно подстановке значений по необходимым ключам в плейсхолдеры в шаблоне.
     Заполнение таблицы происходит с помощью добавления строк в таблицу согласно данным в списке списков `table_data`.
     
@@ -25,9 +28,9 @@ def fill_document(filename: str, data: dict, table_data: list[list[str]], settin
     - Шаблон должен быть настроен на добавление таблиц, имея единственную строку с заполненными ячейками, начинающимися на "RC".
     
     :return: 
-    Возвращает словарь результата: `{'code': int, 'error': str | None, 'path': str, 'warnings': list[str]}`.
+    Возвращает словарь результата: `{'code': int, 'error': str | None, 'path': str, 'file': StoredFile | None, 'warnings': list[str]}`.
 
-    Code - внутренний код результата. 10 в случае успеха (файл сохранён как `templatename_%m-%y`), иначе:
+    Code - внутренний код результата. 10 в случае успеха (файл сохранён под хэшем своего содержимого), иначе:
     - 21 - файл не найден в папке шаблонов;
     - 22 - поле `order_date` не найдено в шаблоне документа;
     - 23 - не найдена строка для заполнения таблицы;
@@ -36,89 +39,68 @@ def fill_document(filename: str, data: dict, table_data: list[list[str]], settin
     :param filename: Имя файла шаблона. Файл должен располагаться в `TEMPLATES_FOLDER`.
     :param data: Словарь, содержащий данные для заполнения. Предполагается, что ключи содержатся в самом документе.
     :param table_data: Список списков, содержащий данные для заполнения таблицы.
+    :param settings: Настройки документа. `company_id` - компания исполнителя, в папке которой сохраняется файл;
+    `shown_date` - дата документа в ISO-формате (по умолчанию первый рабочий день текущего месяца).
+    :param output: Файлоподобный объект (например, `io.BytesIO`), в который будет записан документ. 
+    В этом случае файл на диск не сохраняется, а `path` в результате остаётся пустым.
 
     :see: core.settings
     """
 
-    def find_placeholders(template: DocxTemplate) -> set:
-        """Находит все плейсхолдеры в документе"""
-        placeholders = set()
-        pattern = re.compile(r'\{\{.*?\}\}')
-
-        for paragraph in template.get_docx().paragraphs:
-            matches = pattern.findall(paragraph.text)
-            placeholders.update(matches)
-        
-        for table in template.get_docx().tables:
-            for row in table.rows:
-                for cell in row.cells:
-                    matches = pattern.findall(cell.text)
-                    placeholders.update(matches)
-
-            return sorted(placeholders)
-
-    def find_empty_row(table):
-        """Находит первую полностью пустую строку в таблице"""
-        for i, row in enumerate(table.rows):
-            if all(cell.text.startswith('RC') for cell in row.cells):
-                return i
-        return None  # Если пустой строки нет
-
-    def copy_row_formatting(source_row, target_row):
-        """Копирует все параметры форматирования из исходной строки в целевую"""
-        for source_cell, target_cell in zip(source_row.cells, target_row.cells):
-            # Копируем параметры абзаца
-            source_paragraph = source_cell.paragraphs[0]
+    def apply_row_formatting(row_formatting: list, target_row):
+        """Применяет сохранённое в шаблоне форматирование строки "RC" к целевой строке"""
+        for formatting, target_cell in zip(row_formatting, target_row.cells):
             target_paragraph = target_cell.paragraphs[0]
-            
+
             # Шрифт
-            source_font = source_paragraph.runs[0].font if source_paragraph.runs else None
+            source_font = formatting['font']
 
             target_run = target_paragraph.add_run()
             if source_font:
-                target_run.font.name = source_font.name
-                target_run.font.size = source_font.size
-                target_run.font.bold = source_font.bold
-                target_run.font.italic = source_font.italic
-                target_run.font.underline = source_font.underline
-                target_run.font.color.rgb = source_font.color.rgb
+                target_run.font.name = source_font['name']
+                target_run.font.size = source_font['size']
+                target_run.font.bold = source_font['bold']
+                target_run.font.italic = source_font['italic']
+                target_run.font.underline = source_font['underline']
+                target_run.font.color.rgb = source_font['color']
             
             # Выравнивание
-            target_paragraph.alignment = source_paragraph.alignment
-            
-            # Границы ячеек (если нужно)
-            #target_cell._tc.tcPr = deepcopy(source_cell._tc.tcPr)
+            target_paragraph.alignment = formatting['alignment']
 
     result = {
         'code': 0,
         'error': None,
         'path': '',
+        'file': None,
         'warnings': [],
         'shown_date': None,
     }
 
-    # Для русскоязычных дат
-    locale.setlocale(locale.LC_ALL, 'ru_RU.UTF-8')
-
     # Сделать место сохранение документа
     if "/" in filename:
         filename = filename.split("/")[-1]
 
-    # Получить первый рабочий день текущего месяца и текущего года
-    data["order_date"] = Russia().add_working_days(date(date.today().year, date.today().month, 1), 0).strftime("%d %B %Y")
-    result['shown_date'] = Russia().add_working_days(date(date.today().year, date.today().month, 1), 0).strftime("%Y-%m-%d")
+    # Дата документа: переданная в настройках, либо первый рабочий день текущего месяца
+    shown_date = date.fromisoformat(settings["shown_date"]) if settings.get("shown_date") else current_shown_date()
+    data["order_date"] = format_date(shown_date)
+    result['shown_date'] = shown_date.isoformat()
 
     if data.get("total_cost") is not None:
-        rubles, ruble_word, kopecks = money_to_words(data["total_cost"])
-        data["total_cost"] = f"{int(data['total_cost'])} ({rubles}) {ruble_word} {kopecks}" if settings.get("summable_type") == "CURRENCY" else data["total_cost"]
+        # Итог приходит как `Decimal`, а из очереди задач (JSON) - строкой
+        total = Decimal(str(data["total_cost"]))
+        if settings.get("summable_type") == "CURRENCY":
+            data["total_cost"] = amount_in_words(total)
+        else:
+            data["total_cost"] = format_number(total)
 
     if os.path.exists(TEMPLATES_FOLDER / filename) is False:
         result['code'] = 21
         result['error'] = f"Файл {TEMPLATES_FOLDER / filename} не найден."
         return result
 
-    doc = DocxTemplate(TEMPLATES_FOLDER / filename)
-    placeholders = find_placeholders(doc)
+    compiled = get_compiled_template(TEMPLATES_FOLDER / filename)
+    doc = compiled.new_template()
+    placeholders = compiled.placeholders
     if "{{ order_date }}" not in placeholders:
         result['code'] = 22
         result['error'] = f"В шаблоне {TEMPLATES_FOLDER / filename} должно быть поле `order_date` для указания даты, но оно не было найдено."
@@ -130,110 +112,70 @@ def fill_document(filename: str, data: dict, table_data: list[list[str]], settin
         if placeholder not in placeholders:
             result['warnings'].append(f"В шаблоне {TEMPLATES_FOLDER / filename} не найдено поле `{placeholder}`, но оно было представлено в данных. Данный плейсхолдер не был использован.")
 
-    doc.render(data)
-
-    # Сохранить в папку документах
-    randcode = randint(0, 1000000)
-    if not os.path.exists(MEDIA_ROOT / "temp"):
-        os.mkdir(MEDIA_ROOT / "temp")
-    template_folder = MEDIA_ROOT / "temp"
-    # Сохраняем измененный шаблон во временную папку
-    doc.save(template_folder / f"~$tmp{randcode}.docx")
-
-    # Работаем с таблицами
-
-    doc = Document(template_folder / f"~$tmp{randcode}.docx")
-    table = doc.tables[0]
-    empty_row_idx = find_empty_row(table)
+    empty_row_idx = compiled.table_row_index
     if empty_row_idx is None:
-        os.remove(template_folder / f"~$tmp{randcode}.docx")
         result['code'] = 23
         result['error'] = "В документе должна быть строка для заполнения таблицы, но она не была найдена."
+        return result
+
+    # Подстановка значений и заполнение таблицы выполняются над одним и тем же документом в памяти
+    doc.render(data)
+
+    # Работаем с таблицами.
+    # После рендера тело документа заменено, поэтому берём свежую обёртку над ним, а не закэшированную в `doc.docx`.
+    table = doc.docx.part.document.tables[0]
 
     empty_row = table.rows[empty_row_idx]
 
-    table._tbl.remove(empty_row._element)
+    # Строка-образец: пустая строка с форматированием строки "RC". 
+    # Новые строки - её копии, вставляемые перед строкой "RC", поэтому стоимость вставки не зависит от размера таблицы.
+    prototype = table.add_row()
+    apply_row_formatting(compiled.row_formatting, prototype)
+    prototype_tr = prototype._element
+    table._tbl.remove(prototype_tr)
 
     for row_data in table_data:
-        new_row = table.add_row()
-        table.rows[empty_row_idx]._element.addprevious(new_row._element)
-        
-        copy_row_formatting(empty_row, new_row)
-        
+        new_tr = copy.deepcopy(prototype_tr)
+        empty_row._element.addprevious(new_tr)
+
         # Заполняем данными
-        for col_idx, value in enumerate(row_data):
-            new_row.cells[col_idx].paragraphs[0].runs[0].text = str(value)
-        
-        empty_row_idx += 1
+        for tc, value in zip(new_tr.tc_lst, row_data):
+            tc.p_lst[0].r_lst[0].text = str(value)
+
+    table._tbl.remove(empty_row._element)
 
-    os.remove(template_folder / f"~$tmp{randcode}.docx")
-    # TODO: сохранять в директории комании - получать название компании в data
     result['code'] = 10
-    result['path'] = DOCUMENTS_FOLDER / f"{filename}_{date(date.today().year, date.today().month, 1).strftime('%m-%y')}.docx"
-    doc.save(result['path'])
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    content = normalize_docx(buffer.getvalue())
+    if output is not None:
+        output.write(content)
+        return result
+
+    result['file'] = store_content(content, settings.get("company_id"))
+    result['path'] = result['file'].path
     
     return result
 
 
-def find_table_columns(filename):
-    """Находит все колонки таблицы, которые являются счетчиками"""
+def find_table_columns(filename) -> list:
+    """Находит заголовки всех столбцов первой таблицы шаблона"""
 
-    doc = Document(MEDIA_ROOT / filename.name) #! Теперь файлы загружать именно так!
-    table = doc.tables[0]
-
-    columns_count = max(len(row.cells) for row in table.rows)
-    
-    # Инициализируем список для каждого столбца
-    columns = [[] for _ in range(columns_count)]
-    
-    # Собираем данные всех столбцов
-    for row_idx, row in enumerate(table.rows):
-        for col_idx in range(columns_count):
-            if col_idx < len(row.cells):  # На случай, если в строке меньше ячеек
-                cell_text = row.cells[col_idx].text.strip()
-                columns[col_idx].append(cell_text)
-    
-    headers = []
-    #print(columns)
-    for x in range(columns_count):
-        headers.append(columns[x][0])
-
-    return headers
+    compiled = get_compiled_template(MEDIA_ROOT / filename.name) #! Теперь файлы загружать именно так!
+    return list(compiled.table_headers)
 
 
 def find_fields(filename) -> list:
     """Находит все плейсхолдеры в документе"""
 
-    def reformat_placeholder_names(placeholders: set) -> list:
+    def reformat_placeholder_names(placeholders: list) -> list:
         """Форматирует имена плейсхолдеров для использования в шаблоне"""
         if placeholders is None:
             return []
         return [placeholder.replace("{{", "").replace("}}", "").strip() for placeholder in placeholders]
     
-    def find_placeholders(template: DocxTemplate) -> set:
-        """Находит все плейсхолдеры в документе"""
-        # if not template or not hasattr(template, 'docx') or template.docx is None:
-        #     print(template.get_docx())
-        #     raise ValidationError("Не удалось загрузить документ или документ поврежден")
-
-        placeholders = set()
-        pattern = re.compile(r'\{\{.*?\}\}')
-
-        for paragraph in template.get_docx().paragraphs:
-            matches = pattern.findall(paragraph.text)
-            placeholders.update(matches)
-        
-        for table in template.get_docx().tables:
-            for row in table.rows:
-                for cell in row.cells:
-                    matches = pattern.findall(cell.text)
-                    placeholders.update(matches)
-
-        return sorted(placeholders)
-    
-    doc = DocxTemplate(MEDIA_ROOT / filename.name) #! Теперь файлы загружать именно так!
-    placeholders = find_placeholders(doc)
-    reformated = reformat_placeholder_names(placeholders)
+    compiled = get_compiled_template(MEDIA_ROOT / filename.name) #! Теперь файлы загружать именно так!
+    reformated = reformat_placeholder_names(compiled.placeholders)
 
     PREORDER_FIELDS = [
         "contract_number",
@@ -1,9 +1,13 @@
-import json
+from collections.abc import Mapping
 
-def load_data(request_data):
-    try:
-        return json.loads(json.dumps(request_data["data"]))
-    except TypeError:
-        # list indices must be integers or slices, not str
-        return json.loads(json.dumps(request_data))
-    
\ No newline at end of file
+from backend.scripts.payload import Payload
+
+
+def load_data(request_data) -> Payload:
+    """
+    Достаёт из тела запроса список значений полей (из ключа `data`, либо всё тело, если это уже список)
+    и строит по нему `Payload`. Данные не копируются: DRF уже разобрал JSON в новые объекты.
+    """
+    if isinstance(request_data, Mapping):
+        return Payload(request_data["data"])
+    return Payload(request_data)
@@ -1,78 +1,134 @@
+from decimal import Decimal, ROUND_HALF_UP
+from functools import lru_cache
 
-def number_to_words(num):
+
+UNITS = ['', 'один', 'два', 'три', 'четыре', 'пять', 'шесть', 'семь', 'восемь', 'девять']
+UNITS_FEMALE = ['', 'одна', 'две'] + UNITS[3:]
+TEENS = ['десять', 'одиннадцать', 'двенадцать', 'тринадцать', 'четырнадцать',
+         'пятнадцать', 'шестнадцать', 'семнадцать', 'восемнадцать', 'девятнадцать']
+TENS = ['', '', 'двадцать', 'тридцать', 'сорок', 'пятьдесят',
+        'шестьдесят', 'семьдесят', 'восемьдесят', 'девяносто']
+HUNDREDS = ['', 'сто', 'двести', 'триста', 'четыреста', 'пятьсот',
+            'шестьсот', 'семьсот', 'восемьсот', 'девятьсот']
+
+# Разряды: формы для 1, 2-4, 5-20 и род (True - женский)
+SCALES = [
+    (('', '', ''), False),
+    (('тысяча', 'тысячи', 'тысяч'), True),
+    (('миллион', 'миллиона', 'миллионов'), False),
+    (('миллиард', 'миллиарда', 'миллиардов'), False),
+    (('триллион', 'триллиона', 'триллионов'), False),
+]
+MAX_NUMBER = 1000 ** len(SCALES) - 1
+
+# Валюты: формы целой и дробной части и их род
+CURRENCIES = {
+    'RUB': ((('рубль', 'рубля', 'рублей'), False), (('копейка', 'копейки', 'копеек'), True)),
+    'USD': ((('доллар', 'доллара', 'долларов'), False), (('цент', 'цента', 'центов'), False)),
+    'EUR': ((('евро', 'евро', 'евро'), False), (('цент', 'цента', 'центов'), False)),
+}
+
+
+def plural(n: int, forms: tuple[str, str, str]) -> str:
+    """Форма слова для числа `n`: `forms` - формы для 1, 2-4 и 5-20 (`рубль`, `рубля`, `рублей`)."""
+    n = abs(n)
+    if 11 <= n % 100 <= 14:
+        return forms[2]
+    if n % 10 == 1:
+        return forms[0]
+    if 2 <= n % 10 <= 4:
+        return forms[1]
+    return forms[2]
+
+
+def _chunk_to_words(n: int, is_female: bool) -> str:
+    words = [HUNDREDS[n // 100]]
+    n %= 100
+    if 10 <= n < 20:
+        words.append(TEENS[n - 10])
+    else:
+        words.append(TENS[n // 10])
+        words.append((UNITS_FEMALE if is_female else UNITS)[n % 10])
+    return ' '.join(word for word in words if word)
+
+
+# Все числа 0-999 прописью в мужском и женском роде: считаются один раз при импорте
+CHUNKS = {
+    is_female: tuple(_chunk_to_words(n, is_female) for n in range(1000))
+    for is_female in (False, True)
+}
+
+
+def number_to_words(num: int, is_female: bool = False) -> str:
+    """
+    Целое число прописью: `1234` -> `одна тысяча двести тридцать четыре`.
+
+    :param is_female: Согласовать с существительным женского рода (`одна`, `две`).
+    :raises ValueError: если число больше `MAX_NUMBER` (триллионы).
+    """
+    num = int(num)
     if num == 0:
         return 'ноль'
-    
-    units = ['', 'один', 'два', 'три', 'четыре', 'пять', 'шесть', 'семь', 'восемь', 'девять']
-    teens = ['десять', 'одиннадцать', 'двенадцать', 'тринадцать', 'четырнадцать', 
-             'пятнадцать', 'шестнадцать', 'семнадцать', 'восемнадцать', 'девятнадцать']
-    tens = ['', '', 'двадцать', 'тридцать', 'сорок', 'пятьдесят', 
-            'шестьдесят', 'семьдесят', 'восемьдесят', 'девяносто']
-    hundreds = ['', 'сто', 'двести', 'триста', 'четыреста', 'пятьсот',
-                'шестьсот', 'семьсот', 'восемьсот', 'девятьсот']
-    
-    def convert_less_than_thousand(n, is_female=False):
-        if n == 0:
-            return ''
-        words = []
-        if n >= 100:
-            words.append(hundreds[n // 100])
-            n %= 100
-        if n >= 20:
-            words.append(tens[n // 10])
-            n %= 10
-        if 10 <= n < 20:
-            words.append(teens[n - 10])
-        elif n > 0:
-            if is_female and n in [1, 2]:
-                words.append(['одна', 'две'][n - 1])
-            else:
-                words.append(units[n])
-        return ' '.join(words)
-    
-    scales = [
-        ('', '', '', False),
-        ('тысяча', 'тысячи', 'тысяч', True),
-        ('миллион', 'миллиона', 'миллионов', False),
-        ('миллиард', 'миллиарда', 'миллиардов', False),
-    ]
-    
+    if num < 0:
+        return f"минус {number_to_words(-num, is_female)}"
+    if num > MAX_NUMBER:
+        raise ValueError(f"Число {num} слишком большое для записи прописью.")
+
     words = []
-    scale_index = 0
-    remaining = num
-    
-    for scale in scales:
-        scale_name_one, scale_name_few, scale_name_many, is_female = scale
-        chunk = remaining % 1000
-        remaining = remaining // 1000
-        
-        if chunk > 0:
-            chunk_words = convert_less_than_thousand(chunk, is_female)
-            if chunk_words:
-                if 11 <= chunk % 100 <= 19 or chunk % 10 in [0, 5, 6, 7, 8, 9]:
-                    scale_word = scale_name_many
-                elif chunk % 10 == 1:
-                    scale_word = scale_name_one
-                else:
-                    scale_word = scale_name_few
-                words.append(f"{chunk_words} {scale_word}" if scale_word else chunk_words)
-    
-    return ' '.join(reversed(words)).strip()
-
-def money_to_words(amount):
-    rubles = int(amount)
-    kopecks = round((amount - rubles) * 100)
-    
-    ruble_words = number_to_words(rubles)
-    ruble_format = None
-    kopek_num = f"{kopecks:02d}"  # Копейки числом (двузначный формат)
-    
-    # Склонение рублей
-    if rubles % 100 in [11, 12, 13, 14] or rubles % 10 in [0, 5, 6, 7, 8, 9]:
-        ruble_format = 'рублей'
-    elif rubles % 10 == 1:
-        ruble_format = 'рубль'
-    else:
-        ruble_format = 'рубля'
-    
-    return f"{ruble_words}", ruble_format, f"{kopek_num} копеек"  # Копейки числом
\ No newline at end of file
+    for index, (forms, scale_female) in enumerate(SCALES):
+        chunk = num % 1000
+        num //= 1000
+        if chunk == 0:
+            continue
+        chunk_words = CHUNKS[is_female if index == 0 else scale_female][chunk]
+        words.append(f"{chunk_words} {plural(chunk, forms)}" if index else chunk_words)
+        if num == 0:
+            break
+
+    return ' '.join(reversed(words))
+
+
+@lru_cache(maxsize=4096)
+def _money_to_words(amount: Decimal, currency: str) -> tuple[str, str, str]:
+    (major_forms, major_female), (minor_forms, _) = CURRENCIES[currency]
+    amount = amount.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+    major = int(amount)
+    minor = int(abs(amount - major) * 100)
+    return (
+        number_to_words(major, major_female),
+        plural(major, major_forms),
+        f"{minor:02d} {plural(minor, minor_forms)}",  # Копейки числом (двузначный формат)
+    )
+
+
+def money_to_words(amount, currency: str = 'RUB') -> tuple[str, str, str]:
+    """
+    Денежная сумма прописью: `1234.5` -> `('одна тысяча двести тридцать четыре', 'рубля', '50 копеек')`.
+
+    Сумма переводится в `Decimal` (float - через строку, без накопленной ошибки) и округляется до сотых.
+    Результаты кэшируются, повторные суммы не пересчитываются.
+
+    :param currency: Код валюты из `CURRENCIES` (`RUB`, `USD`, `EUR`).
+    """
+    if currency not in CURRENCIES:
+        raise ValueError(f"Неизвестная валюта {currency}.")
+    return _money_to_words(Decimal(str(amount)), currency)
+
+
+def many_to_words(amounts, currency: str = 'RUB') -> list[tuple[str, str, str]]:
+    """`money_to_words` для списка сумм (например, итогов пакета документов или столбца таблицы). Одинаковые суммы считаются один раз."""
+    done = {}
+    result = []
+    for amount in amounts:
+        key = Decimal(str(amount))
+        if key not in done:
+            done[key] = money_to_words(key, currency)
+        result.append(done[key])
+    return result
+
+
+def amount_in_words(amount, currency: str = 'RUB') -> str:
+    """Сумма для документа: `1234 (одна тысяча двести тридцать четыре) рубля 50 копеек`."""
+    words, major_word, minor = money_to_words(amount, currency)
+    major = int(Decimal(str(amount)).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP))
+    return f"{major} ({words}) {major_word} {minor}"
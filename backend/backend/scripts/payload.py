@@ -0,0 +1,46 @@
+class Payload(list):
+    """
+    Значения полей из запроса в формате
+    ```
+    [
+        {
+            "field_id": "name",
+            "value": "returning_this"
+        },
+        //...
+    ]
+    ```
+    Остаётся списком (его можно передавать в `field_validate` и перебирать как раньше),
+    но дополнительно хранит индекс `field_id -> value`, поэтому поиск значения не проходит весь список.
+    Если `field_id` повторяется, используется первое значение.
+    """
+
+    def __init__(self, items=()):
+        super().__init__(items)
+        self._index = {}
+        for item in self:
+            self._index.setdefault(item.get("field_id"), item.get("value"))
+
+    def append(self, item: dict):
+        super().append(item)
+        self._index.setdefault(item.get("field_id"), item.get("value"))
+
+    def get(self, name: str, default=None):
+        """Значение поля `name` или `default`, если такого поля нет."""
+        return self._index.get(name, default)
+
+    def has(self, name: str) -> bool:
+        return name in self._index
+
+    def column(self, name: str) -> list:
+        """Значения столбца таблицы `name`. Если поле не передано или не является списком, возвращается пустой список."""
+        value = self._index.get(name)
+        return value if isinstance(value, list) else []
+
+    def columns(self) -> dict[str, list]:
+        """Все столбцы таблицы (поля со значением-списком) в порядке передачи."""
+        return {name: value for name, value in self._index.items() if isinstance(value, list)}
+
+    def scalars(self) -> dict:
+        """Все поля, значения которых не являются списками, в порядке передачи."""
+        return {name: value for name, value in self._index.items() if not isinstance(value, list)}
@@ -0,0 +1,29 @@
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import CaptureQueriesContext
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Код выполнил больше запросов к базе, чем разрешено бюджетом."""
+
+
+@contextmanager
+def query_budget(limit: int, label: str = "", using: str = DEFAULT_DB_ALIAS):
+    """
+    Проверяет, что код внутри блока выполняет не больше `limit` запросов к базе `using`.
+
+    Бюджет ловит N+1: список из 100 элементов должен укладываться в то же число запросов, что и список из одного.
+    Для проверки запросы записываются (как при `DEBUG`), поэтому в production бюджет не включается:
+    см. `SchemaAPIView.query_budget` и настройку `QUERY_BUDGET_CHECKS`.
+
+    :raises QueryBudgetExceeded: с текстом всех выполненных запросов, если бюджет превышен.
+    """
+    with CaptureQueriesContext(connections[using]) as captured:
+        yield captured
+
+    if len(captured) > limit:
+        queries = "\n".join(f"{n}. {query['sql']}" for n, query in enumerate(captured.captured_queries, start=1))
+        raise QueryBudgetExceeded(
+            f"{label or 'Блок'}: выполнено {len(captured)} запросов к БД при бюджете {limit}:\n{queries}"
+        )
@@ -0,0 +1,45 @@
+from datetime import date
+from decimal import Decimal, ROUND_HALF_UP
+
+
+# Названия месяцев в родительном падеже: "14 марта 2025"
+MONTHS_GENITIVE = (
+    "января", "февраля", "марта", "апреля", "мая", "июня",
+    "июля", "августа", "сентября", "октября", "ноября", "декабря",
+)
+# Разделитель разрядов - неразрывный пробел, чтобы число не переносилось в документе
+THOUSANDS_SEPARATOR = " "
+DECIMAL_SEPARATOR = ","
+
+
+def format_date(value: date) -> str:
+    """Дата прописью по-русски: `14 марта 2025`. Не зависит от `locale`, безопасна для потоков."""
+    return f"{value.day:02d} {MONTHS_GENITIVE[value.month - 1]} {value.year}"
+
+
+def format_number(value, places: int | None = None) -> str:
+    """
+    Число в русской записи: `1 234 567,5`.
+
+    :param places: Количество знаков после запятой (с округлением половины вверх).
+    По умолчанию выводятся все значащие знаки числа.
+    """
+    number = value if isinstance(value, Decimal) else Decimal(str(value))
+    if places is not None:
+        number = number.quantize(Decimal(1).scaleb(-places), rounding=ROUND_HALF_UP)
+
+    sign = "-" if number < 0 else ""
+    integer, _, fraction = f"{abs(number):f}".partition(".")
+    groups = []
+    while len(integer) > 3:
+        groups.insert(0, integer[-3:])
+        integer = integer[:-3]
+    groups.insert(0, integer)
+
+    result = sign + THOUSANDS_SEPARATOR.join(groups)
+    return f"{result}{DECIMAL_SEPARATOR}{fraction}" if fraction else result
+
+
+def format_money(value) -> str:
+    """Денежная сумма с копейками: `1 234,50`."""
+    return format_number(value, places=2)
@@ -0,0 +1,71 @@
+from decimal import Decimal, InvalidOperation
+from typing import NamedTuple
+
+from rest_framework.exceptions import ValidationError
+
+from backend.scripts.payload import Payload
+
+
+class DocumentTable(NamedTuple):
+    """
+    Собранная таблица документа.
+
+    - `fields` - столбцы (`TableField`) в порядке `order`;
+    - `rows` - строки таблицы, значения в порядке `fields`;
+    - `summable` - суммируемый столбец или `None`;
+    - `total` - точная сумма суммируемого столбца (`Decimal`) или `None`.
+    """
+    fields: list
+    rows: list[list]
+    summable: object | None
+    total: Decimal | None
+
+
+def build_table(table_fields: list, data: Payload) -> DocumentTable:
+    """
+    Собирает таблицу документа по столбцам.
+
+    В таблицу попадают столбцы из `table_fields` (уже отсортированные по `order`), которые переданы в `data`,
+    и все автоинкрементные столбцы. Короткие столбцы дополняются пустыми строками до длины самого длинного,
+    автоинкрементные столбцы нумеруются с 1. Сумма суммируемого столбца считается в `Decimal` без округлений float.
+
+    :raises ValidationError: если суммируемых столбцов больше одного или в суммируемом столбце не число.
+    """
+    summable_fields = [field for field in table_fields if field.is_summable]
+    if len(summable_fields) > 1:
+        raise ValidationError({"unknown": "В таблице может быть только один суммируемый столбец"})
+    summable = summable_fields[0] if summable_fields else None
+
+    passed = data.columns()
+    fields = [field for field in table_fields if field.key_name in passed or field.is_autoincremental]
+    length = max((len(passed[field.key_name]) for field in fields if not field.is_autoincremental), default=0)
+
+    columns = []
+    for field in fields:
+        if field.is_autoincremental:
+            columns.append(range(1, length + 1))
+        else:
+            column = passed[field.key_name]
+            columns.append(column + [""] * (length - len(column)))
+
+    total = None
+    if summable is not None and summable in fields:
+        total = column_total(summable.key_name, columns[fields.index(summable)])
+
+    return DocumentTable(fields, [list(row) for row in zip(*columns)], summable, total)
+
+
+def column_total(key_name: str, column) -> Decimal:
+    """Сумма значений столбца. Пустые ячейки считаются нулём."""
+    total = Decimal(0)
+    for row, value in enumerate(column, start=1):
+        if value is None or value == "":
+            continue
+        try:
+            number = Decimal(str(value).strip())
+        except InvalidOperation:
+            number = None
+        if number is None or not number.is_finite():
+            raise ValidationError({key_name: f"Строка {row}: значение `{value}` не является числом"})
+        total += number
+    return total
@@ -0,0 +1,136 @@
+from docx import Document
+from docxtpl import DocxTemplate
+import copy
+import os
+import re
+import threading
+
+
+PLACEHOLDER_PATTERN = re.compile(r'\{\{.*?\}\}')
+
+
+class CompiledTemplate:
+    """
+    Разобранный один раз шаблон документа.
+
+    Хранит:
+    - `document` - разобранное XML-дерево документа (`docx.Document`), с которого снимаются копии;
+    - `placeholders` - отсортированный список плейсхолдеров вида `{{ name }}`;
+    - `table_row_index` - индекс строки "RC" в первой таблице документа (или `None`);
+    - `row_formatting` - форматирование ячеек строки "RC" (шрифт и выравнивание);
+    - `table_headers` - заголовки столбцов первой таблицы документа.
+
+    Объект неизменяем после создания: каждая генерация работает с копией дерева через `new_template()`.
+    """
+
+    def __init__(self, path, mtime_ns: int, size: int):
+        self.path = path
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.document = Document(path)
+        self.placeholders = self._find_placeholders()
+        self.table_row_index = self._find_table_row()
+        self.row_formatting = self._capture_row_formatting()
+        self.table_headers = self._find_table_headers()
+
+    def is_actual(self, mtime_ns: int, size: int) -> bool:
+        return self.mtime_ns == mtime_ns and self.size == size
+
+    def new_template(self) -> DocxTemplate:
+        """Возвращает `DocxTemplate` с собственной копией разобранного дерева, без повторного чтения файла."""
+        template = DocxTemplate(self.path)
+        template.docx = copy.deepcopy(self.document)
+        return template
+
+    def _find_placeholders(self) -> list:
+        """Находит все плейсхолдеры в абзацах и таблицах документа"""
+        placeholders = set()
+
+        for paragraph in self.document.paragraphs:
+            placeholders.update(PLACEHOLDER_PATTERN.findall(paragraph.text))
+
+        for table in self.document.tables:
+            for row in table.rows:
+                for cell in row.cells:
+                    placeholders.update(PLACEHOLDER_PATTERN.findall(cell.text))
+
+        return sorted(placeholders)
+
+    def _find_table_row(self):
+        """Находит в первой таблице строку, все ячейки которой начинаются на "RC" """
+        if not self.document.tables:
+            return None
+        for i, row in enumerate(self.document.tables[0].rows):
+            if all(cell.text.startswith('RC') for cell in row.cells):
+                return i
+        return None
+
+    def _find_table_headers(self) -> list:
+        """Находит заголовки (первое значение) каждого столбца первой таблицы документа"""
+        if not self.document.tables:
+            return []
+
+        headers = []
+        for row in self.document.tables[0].rows:
+            cells = row.cells
+            # Строки могут содержать разное количество ячеек, заголовок берётся из первой строки со столбцом
+            for col_idx in range(len(headers), len(cells)):
+                headers.append(cells[col_idx].text.strip())
+        return headers
+
+    def _capture_row_formatting(self) -> list:
+        """Сохраняет параметры шрифта и выравнивания каждой ячейки строки "RC" """
+        if self.table_row_index is None:
+            return []
+
+        formatting = []
+        for cell in self.document.tables[0].rows[self.table_row_index].cells:
+            paragraph = cell.paragraphs[0]
+            font = paragraph.runs[0].font if paragraph.runs else None
+            formatting.append({
+                'font': {
+                    'name': font.name,
+                    'size': font.size,
+                    'bold': font.bold,
+                    'italic': font.italic,
+                    'underline': font.underline,
+                    'color': font.color.rgb,
+                } if font else None,
+                'alignment': paragraph.alignment,
+            })
+        return formatting
+
+
+_cache: dict = {}
+_lock = threading.Lock()
+
+
+def get_compiled_template(path) -> CompiledTemplate:
+    """
+    Возвращает скомпилированный шаблон `path` из кэша процесса.
+    Шаблон перечитывается только если изменились время модификации или размер файла.
+
+    :raises FileNotFoundError: если файла шаблона не существует.
+    """
+    path = str(path)
+    stat = os.stat(path)
+
+    compiled = _cache.get(path)
+    if compiled is not None and compiled.is_actual(stat.st_mtime_ns, stat.st_size):
+        return compiled
+
+    with _lock:
+        compiled = _cache.get(path)
+        if compiled is None or not compiled.is_actual(stat.st_mtime_ns, stat.st_size):
+            compiled = CompiledTemplate(path, stat.st_mtime_ns, stat.st_size)
+            _cache[path] = compiled
+    return compiled
+
+
+def invalidate_template(path=None):
+    """Удаляет шаблон `path` из кэша. Без аргументов очищает весь кэш."""
+    with _lock:
+        if path is None:
+            _cache.clear()
+        else:
+            _cache.pop(str(path), None)
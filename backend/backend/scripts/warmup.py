@@ -0,0 +1,57 @@
+import logging
+from pathlib import Path
+
+import docx
+from django.db import connections
+from django.template import engines
+from django.urls import get_resolver
+
+from core.settings.base import TEMPLATES_FOLDER
+
+from backend.scripts.business_calendar import current_shown_date
+from backend.scripts.template_cache import get_compiled_template
+
+
+logger = logging.getLogger(__name__)
+
+
+def warm_up() -> dict:
+    """
+    Прогревает процесс перед обработкой запросов, чтобы первый запрос не платил за холодный старт.
+
+    - импортирует все представления, сериализаторы и схемы через разбор URLconf;
+    - загружает шаблоны Django (Swagger UI) и стандартный шаблон `python-docx`;
+    - разбирает все шаблоны документов из `TEMPLATES_FOLDER` в кэш `template_cache`;
+    - считает производственный календарь текущего месяца.
+
+    Вызывается в мастер-процессе сервера до создания воркеров: прогретые объекты достаются
+    воркерам через fork без копирования. Соединения с БД после прогрева закрываются,
+    чтобы воркеры не унаследовали общий сокет.
+
+    :return: Количество прогретых объектов: `{'urls': int, 'templates': int, 'documents': int}`.
+    """
+    resolver = get_resolver()
+    urls = len(resolver.reverse_dict)  # Импортирует все модули представлений и строит таблицу reverse()
+
+    templates = 0
+    for engine in engines.all():
+        for directory in map(Path, engine.dirs):
+            for path in directory.rglob("*.html"):
+                engine.get_template(path.relative_to(directory).as_posix())
+                templates += 1
+
+    docx.Document()
+    current_shown_date()
+
+    documents = 0
+    for path in TEMPLATES_FOLDER.rglob("*.docx"):
+        try:
+            get_compiled_template(path)
+            documents += 1
+        except Exception:
+            # Битый шаблон не должен мешать запуску: ошибку получит запрос, который его использует
+            logger.warning("Не удалось разобрать шаблон %s", path, exc_info=True)
+
+    connections.close_all()
+    return {'urls': urls, 'templates': templates, 'documents': documents}
+
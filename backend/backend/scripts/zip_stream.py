@@ -0,0 +1,73 @@
+import csv
+import io
+import os
+import zipfile
+
+
+CHUNK_SIZE = 64 * 1024
+
+
+class _ZipBuffer(io.RawIOBase):
+    """
+    Несмещаемый (non-seekable) поток, в который пишет `zipfile`.
+    Записанные байты забираются через `pop()` и сразу отдаются клиенту, поэтому в памяти
+    одновременно находится не больше одного блока архива.
+    """
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def pop(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def stream_zip(files, manifest_header: list[str] | None = None, manifest_rows=None, extra: list[tuple[str, bytes]] | None = None):
+    """
+    Генератор, по частям отдающий ZIP-архив.
+
+    :param files: Итерируемый набор пар `(имя_в_архиве, путь_к_файлу)`. Отсутствующие файлы пропускаются.
+    :param manifest_header: Заголовок CSV-файла `manifest.csv`. Если не передан, манифест не добавляется.
+    :param manifest_rows: Итерируемый набор строк манифеста.
+    :param extra: Небольшие файлы из памяти `(имя_в_архиве, содержимое)`, добавляются в конец архива.
+
+    Ни архив, ни файлы целиком в память не загружаются: файлы читаются блоками по `CHUNK_SIZE`.
+    """
+    buffer = _ZipBuffer()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        if manifest_header is not None:
+            with archive.open("manifest.csv", 'w') as raw:
+                text = io.TextIOWrapper(raw, encoding="utf-8-sig", newline="")
+                writer = csv.writer(text)
+                writer.writerow(manifest_header)
+                for row in manifest_rows or []:
+                    writer.writerow(row)
+                    text.flush()
+                    yield buffer.pop()
+                text.flush()
+                text.detach()
+            yield buffer.pop()
+
+        for name, path in files:
+            if not path or not os.path.isfile(path):
+                continue
+            info = zipfile.ZipInfo.from_file(path, name)
+            info.compress_type = zipfile.ZIP_DEFLATED
+            with open(path, 'rb') as src, archive.open(info, 'w') as dst:
+                while chunk := src.read(CHUNK_SIZE):
+                    dst.write(chunk)
+                    yield buffer.pop()
+            yield buffer.pop()
+
+        for name, content in extra or []:
+            archive.writestr(name, content)
+            yield buffer.pop()
+    yield buffer.pop()
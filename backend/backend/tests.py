@@ -0,0 +1,430 @@
+import copy
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from decimal import Decimal
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase, TestCase
+from docx import Document as Docx
+from rest_framework.exceptions import ValidationError
+
+from backend.models.documents import TableField, Template
+from backend.models.fields import Field, InitialFieldsState
+from backend.management.commands import serve
+from backend.scripts import document_storage, initial_fields as ini
+from backend.scripts.business_calendar import first_working_day, month_working_days, nth_working_day
+from backend.scripts.field_cache import get_fields_version
+from backend.scripts.field_validate import DEFAULT_ERROR, NOT_FOUND_ERROR, field_validate
+from backend.scripts.money_to_words import MAX_NUMBER, amount_in_words, many_to_words, money_to_words, number_to_words
+from backend.scripts.payload import Payload
+from backend.scripts.ru_format import format_date, format_money, format_number
+from backend.scripts.table_builder import build_table
+from backend.scripts.template_cache import get_compiled_template, invalidate_template
+
+
+class DatabaseSettingsTests(SimpleTestCase):
+    """Настройки БД из переменных окружения, как их передаёт docker-compose (незаданные - пустыми строками)."""
+
+    def load_databases(self, **env) -> dict:
+        # Настройки читаются один раз при импорте, поэтому вычисляются в отдельном процессе
+        code = (
+            "import json; from core.settings import base; "
+            "print(json.dumps(base.DATABASES['default'], default=str))"
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", code],
+            cwd=settings.BASE_DIR.parent,
+            env={**os.environ, **env},
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        return json.loads(result.stdout)
+
+    def test_postgres_profile_empty_variables_use_defaults(self):
+        database = self.load_databases(
+            DB_ENGINE="postgresql",
+            DB_NAME="",
+            DB_USER="",
+            DB_HOST="",
+            DB_PORT="",
+            DB_CONN_MAX_AGE="",
+        )
+        self.assertEqual(database["ENGINE"], "django.db.backends.postgresql")
+        self.assertEqual(database["NAME"], "reportcreator")
+        self.assertEqual(database["USER"], "reportcreator")
+        self.assertEqual(database["HOST"], "localhost")
+        self.assertEqual(database["PORT"], "5432")
+        self.assertEqual(database["CONN_MAX_AGE"], 60)
+
+    def test_postgres_profile_variables(self):
+        database = self.load_databases(
+            DB_ENGINE="postgresql",
+            DB_NAME="reports",
+            DB_USER="app",
+            DB_PASSWORD="secret",
+            DB_HOST="postgres",
+            DB_PORT="6432",
+        )
+        self.assertEqual(
+            [database["NAME"], database["USER"], database["PASSWORD"], database["HOST"], database["PORT"]],
+            ["reports", "app", "secret", "postgres", "6432"],
+        )
+
+    def test_sqlite_empty_name_uses_project_file(self):
+        database = self.load_databases(DB_ENGINE="sqlite", DB_NAME="", DB_TIMEOUT="")
+        self.assertEqual(database["ENGINE"], "django.db.backends.sqlite3")
+        self.assertEqual(database["NAME"], str(settings.BASE_DIR / "db.sqlite3"))
+        self.assertEqual(database["OPTIONS"]["timeout"], 20)
+
+
+class MoneyToWordsTests(SimpleTestCase):
+
+    def test_declension(self):
+        cases = {
+            "1.01": ("один", "рубль", "01 копейка"),
+            "2.02": ("два", "рубля", "02 копейки"),
+            "5.05": ("пять", "рублей", "05 копеек"),
+            "11.11": ("одиннадцать", "рублей", "11 копеек"),
+            "21.21": ("двадцать один", "рубль", "21 копейка"),
+            "1000": ("одна тысяча", "рублей", "00 копеек"),
+            "2000": ("две тысячи", "рублей", "00 копеек"),
+        }
+        for amount, expected in cases.items():
+            with self.subTest(amount=amount):
+                self.assertEqual(money_to_words(Decimal(amount)), expected)
+
+    def test_trillions(self):
+        self.assertEqual(money_to_words(10 ** 12)[0], "один триллион")
+        self.assertEqual(number_to_words(2 * 10 ** 12 + 5), "два триллиона пять")
+        with self.assertRaises(ValueError):
+            number_to_words(MAX_NUMBER + 1)
+
+    def test_currencies(self):
+        self.assertEqual(money_to_words("1.01", "USD"), ("один", "доллар", "01 цент"))
+        self.assertEqual(money_to_words(2, "EUR"), ("два", "евро", "00 центов"))
+        with self.assertRaises(ValueError):
+            money_to_words(1, "GBP")
+
+    def test_decimal_input(self):
+        # Половина копейки округляется вверх, float переводится через строку без накопленной ошибки
+        self.assertEqual(money_to_words(Decimal("0.285")), ("ноль", "рублей", "29 копеек"))
+        self.assertEqual(money_to_words(0.1 + 0.2)[2], "30 копеек")
+        self.assertEqual(money_to_words(Decimal("-3.5")), ("минус три", "рубля", "50 копеек"))
+        self.assertEqual(amount_in_words(Decimal("1234.5")), "1234 (одна тысяча двести тридцать четыре) рубля 50 копеек")
+
+    def test_many_to_words(self):
+        amounts = [1, Decimal("1.00"), "2.5", 1]
+        self.assertEqual(many_to_words(amounts), [money_to_words(amount) for amount in amounts])
+        self.assertEqual(many_to_words([3], "USD"), [("три", "доллара", "00 центов")])
+        self.assertEqual(many_to_words([]), [])
+
+
+class FieldValidateTests(TestCase):
+
+    def setUp(self):
+        self.template = Template.objects.create(template_name="Акт", template_type="ACT", found_fields=[])
+        self.inn = Field.objects.create(
+            id="test_inn", name="ИНН", key_name="inn", related_item="Test", type="TEXT",
+            validation_regex=r"^\d{10}$", error_text="ИНН - 10 цифр",
+        )
+        self.code = Field.objects.create(id="test_code", name="Код", key_name="code", related_item="Test", type="TEXT", validation_regex=r"^[A-Z]+$")
+        self.price = TableField.objects.create(
+            id="test_price", name="Цена", key_name="price", related_item="TableField", type="NUMBER",
+            validation_regex=r"^\d+$", order=1, related_template=self.template,
+        )
+
+    def test_valid(self):
+        self.assertIsNone(field_validate([
+            {"field_id": "inn", "value": "1234567890"},
+            {"field_id": "code", "value": "AB"},
+            {"field_id": "price", "value": ["1", "20"]},
+        ], "Test", self.template))
+
+    def test_all_errors_collected(self):
+        errors = field_validate([
+            {"field_id": "inn", "value": "12"},
+            {"field_id": "code", "value": "ab"},
+            {"field_id": "price", "value": ["1", "x", "y"]},
+            {"field_id": "missing", "value": "1"},
+        ], "Test", self.template)
+        self.assertEqual(errors, {
+            "inn": ["ИНН - 10 цифр"],
+            "code": [DEFAULT_ERROR],
+            "price": [f"Строка 2: {DEFAULT_ERROR}", f"Строка 3: {DEFAULT_ERROR}"],
+            "missing": [NOT_FOUND_ERROR],
+        })
+
+    def test_repeated_field_errors(self):
+        # Ошибки одного поля накапливаются в его списке: формат `{field_id: [..]}` для ValidationError
+        errors = field_validate([{"field_id": "inn", "value": "1"}, {"field_id": "inn", "value": "2"}], "Test")
+        self.assertEqual(errors, {"inn": ["ИНН - 10 цифр", "ИНН - 10 цифр"]})
+
+    def test_invalid_regex(self):
+        self.code.validation_regex = "[A-"
+        self.code.save()
+        errors = field_validate([{"field_id": "code", "value": "A"}, {"field_id": "inn", "value": "1234567890"}], "Test")
+        self.assertEqual(list(errors), ["code"])
+        self.assertTrue(errors["code"][0].startswith("Некорректное validation_regex поля"))
+
+    def test_cache_invalidated_after_field_edit(self):
+        data = [{"field_id": "code", "value": "ab"}]
+        self.assertIn("code", field_validate(data, "Test"))
+        version = get_fields_version()
+
+        self.code.validation_regex = r"^[a-z]+$"
+        self.code.save()
+        self.assertGreater(get_fields_version(), version)
+        self.assertIsNone(field_validate(data, "Test"))
+
+        self.code.delete()
+        self.assertEqual(field_validate(data, "Test"), {"code": [NOT_FOUND_ERROR]})
+
+
+class CreateInitialFieldsTests(TestCase):
+
+    def setUp(self):
+        self.load()
+
+    def load(self, *args, items=None) -> str:
+        out = io.StringIO()
+        with mock.patch.object(ini, "ALL_ITEMS", ini.ALL_ITEMS if items is None else items):
+            call_command("create_initial_fields", *args, stdout=out)
+        return out.getvalue()
+
+    def definition(self, **changes) -> dict:
+        return {**ini.USER[0], **changes}
+
+    def test_skip_unchanged(self):
+        with self.assertNumQueries(1):
+            self.assertIn("не изменились", self.load())
+
+    def test_upsert(self):
+        items = copy.deepcopy(ini.ALL_ITEMS)
+        items[0][0]["name"] = "Имя входа"
+        items.append([self.definition(key_name="nickname", name="Псевдоним")])
+
+        output = self.load(items=items)
+        self.assertIn("добавлено 1, обновлено 1, удалённых из описаний 0", output)
+        self.assertEqual(Field.objects.get(key_name="username", related_item="User").name, "Имя входа")
+        self.assertEqual(Field.objects.get(key_name="nickname", related_item="User").name, "Псевдоним")
+        self.assertIn("не изменились", self.load(items=items))
+
+    def test_prune(self):
+        Field.objects.create(id="old__User", key_name="old", name="Старое", related_item="User", type="TEXT")
+        Field.objects.create(id="mine__User", key_name="mine", name="Своё", related_item="User", type="TEXT", is_custom=True)
+
+        output = self.load("--force")
+        self.assertIn("old__User", output)
+        self.assertNotIn("mine__User", output)
+        self.assertIn("удалённых из описаний 1", output)
+        self.assertTrue(Field.objects.filter(key_name="old").exists())
+        # Хэш сохранён, несмотря на неудалённые поля: следующий запуск идёт по быстрому пути
+        self.assertIn("не изменились", self.load())
+
+        self.load("--prune")
+        self.assertFalse(Field.objects.filter(key_name="old").exists())
+        self.assertTrue(Field.objects.filter(key_name="mine", is_custom=True).exists())
+
+    def test_custom_field_not_overwritten(self):
+        Field.objects.create(id="mine__User", key_name="mine", name="Своё", related_item="User", type="TEXT", is_custom=True)
+        output = self.load(items=ini.ALL_ITEMS + [[self.definition(key_name="mine", name="Стандартное")]])
+        self.assertIn("Пропущено", output)
+        self.assertEqual(Field.objects.get(key_name="mine", related_item="User").name, "Своё")
+        self.assertEqual(InitialFieldsState.objects.count(), 1)
+
+
+class TemplateCacheTests(SimpleTestCase):
+
+    def setUp(self):
+        files = tempfile.TemporaryDirectory()
+        self.addCleanup(files.cleanup)
+        self.path = os.path.join(files.name, "act.docx")
+        self.addCleanup(invalidate_template, self.path)
+        self.save("{{ b }} {{ a }}")
+
+    def save(self, text: str):
+        document = Docx()
+        document.add_paragraph(text)
+        table = document.add_table(rows=2, cols=2)
+        table.rows[0].cells[0].text, table.rows[0].cells[1].text = "Работа", "Цена"
+        table.rows[1].cells[0].text, table.rows[1].cells[1].text = "RC1", "RC2 {{ c }}"
+        document.save(self.path)
+
+    def test_parsed_once(self):
+        compiled = get_compiled_template(self.path)
+        self.assertIs(get_compiled_template(self.path), compiled)
+        self.assertEqual(compiled.placeholders, ["{{ a }}", "{{ b }}", "{{ c }}"])
+        self.assertEqual(compiled.table_row_index, 1)
+        self.assertEqual(compiled.table_headers, ["Работа", "Цена"])
+
+    def test_reloaded_after_change(self):
+        compiled = get_compiled_template(self.path)
+        self.save("{{ changed_placeholder }}")
+        reloaded = get_compiled_template(self.path)
+        self.assertIsNot(reloaded, compiled)
+        self.assertIn("{{ changed_placeholder }}", reloaded.placeholders)
+
+        invalidate_template(self.path)
+        self.assertIsNot(get_compiled_template(self.path), reloaded)
+
+    def test_copies_are_independent(self):
+        compiled = get_compiled_template(self.path)
+        first = compiled.new_template()
+        first.docx.paragraphs[0].text = "изменено"
+        self.assertEqual(compiled.new_template().docx.paragraphs[0].text, "{{ b }} {{ a }}")
+
+    def test_missing_file(self):
+        with self.assertRaises(FileNotFoundError):
+            get_compiled_template(self.path + ".missing")
+
+
+class PayloadTests(SimpleTestCase):
+
+    def test_index(self):
+        payload = Payload([
+            {"field_id": "name", "value": "первое"},
+            {"field_id": "price", "value": ["1", "2"]},
+            {"field_id": "name", "value": "второе"},
+        ])
+        self.assertEqual(payload.get("name"), "первое")
+        self.assertEqual(payload.get("missing", "-"), "-")
+        self.assertTrue(payload.has("price"))
+        self.assertEqual(payload.column("price"), ["1", "2"])
+        self.assertEqual(payload.column("name"), [])
+        self.assertEqual(payload.columns(), {"price": ["1", "2"]})
+        self.assertEqual(payload.scalars(), {"name": "первое"})
+        self.assertEqual(len(payload), 3)
+
+        payload.append({"field_id": "date", "value": "2025-01-01"})
+        self.assertEqual(payload.get("date"), "2025-01-01")
+
+
+class TableBuilderTests(SimpleTestCase):
+
+    @staticmethod
+    def column(key_name: str, summable: bool = False, autoincremental: bool = False):
+        return SimpleNamespace(key_name=key_name, is_summable=summable, is_autoincremental=autoincremental)
+
+    def test_build(self):
+        number, work, price = self.column("n", autoincremental=True), self.column("work"), self.column("price", summable=True)
+        table = build_table([number, work, price], Payload([
+            {"field_id": "work", "value": ["Разработка", "Тестирование", "Поддержка"]},
+            {"field_id": "price", "value": ["0.1", "0.2"]},
+        ]))
+        self.assertEqual(table.fields, [number, work, price])
+        self.assertEqual(table.rows, [[1, "Разработка", "0.1"], [2, "Тестирование", "0.2"], [3, "Поддержка", ""]])
+        self.assertIs(table.summable, price)
+        # Сумма точная, без ошибки float
+        self.assertEqual(table.total, Decimal("0.3"))
+
+    def test_columns_not_passed(self):
+        table = build_table([self.column("work"), self.column("price", summable=True)], Payload([{"field_id": "name", "value": "x"}]))
+        self.assertEqual((table.fields, table.rows, table.total), ([], [], None))
+
+    def test_errors(self):
+        with self.assertRaises(ValidationError):
+            build_table([self.column("a", summable=True), self.column("b", summable=True)], Payload())
+        with self.assertRaises(ValidationError) as error:
+            build_table([self.column("price", summable=True)], Payload([{"field_id": "price", "value": ["1", "abc"]}]))
+        self.assertIn("Строка 2", str(error.exception.detail["price"]))
+
+
+class BusinessCalendarTests(SimpleTestCase):
+
+    def test_working_days(self):
+        # Новогодние каникулы и выходные пропускаются
+        self.assertEqual(first_working_day(2025, 1), date(2025, 1, 9))
+        self.assertEqual(first_working_day(2025, 3), date(2025, 3, 3))
+        self.assertEqual(nth_working_day(2025, 3, 2), date(2025, 3, 4))
+        self.assertEqual(first_working_day(2024, 12), date(2024, 12, 2))
+        self.assertIs(month_working_days(2025, 1), month_working_days(2025, 1))
+        with self.assertRaises(ValueError):
+            nth_working_day(2025, 1, 40)
+
+    def test_threads(self):
+        months = [(year, month) for year in (2023, 2024) for month in range(1, 13)]
+        with ThreadPoolExecutor(8) as pool:
+            parallel = list(pool.map(lambda key: first_working_day(*key), months))
+        self.assertEqual(parallel, [first_working_day(*key) for key in months])
+
+
+class RuFormatTests(SimpleTestCase):
+
+    def test_format(self):
+        # Разряды разделяются неразрывным пробелом
+        self.assertEqual(format_date(date(2025, 3, 4)), "04 марта 2025")
+        self.assertEqual(format_number(1234567.5), "1\u00a0234\u00a0567,5")
+        self.assertEqual(format_number(Decimal("-1000")), "-1\u00a0000")
+        self.assertEqual(format_number("0.125", places=2), "0,13")
+        self.assertEqual(format_money(Decimal("1234.5")), "1\u00a0234,50")
+        self.assertEqual(format_money(7), "7,00")
+
+    def test_threads(self):
+        # Форматирование не меняет `locale` процесса, поэтому результат не зависит от параллельных вызовов
+        dates = [date(2025, month, 1) for month in range(1, 13)] * 20
+        with ThreadPoolExecutor(8) as pool:
+            self.assertEqual(list(pool.map(format_date, dates)), [format_date(value) for value in dates])
+
+
+class DocumentStorageTests(SimpleTestCase):
+
+    def setUp(self):
+        files = tempfile.TemporaryDirectory()
+        self.addCleanup(files.cleanup)
+        patcher = mock.patch.object(document_storage, "DOCUMENTS_FOLDER", Path(files.name))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.root = Path(files.name)
+
+    def test_deduplicated_by_content(self):
+        first = document_storage.store_content(b"content", company_id=1)
+        second = document_storage.store_content(b"content", company_id=1)
+        self.assertEqual(first, second)
+        self.assertEqual(first.content_hash, document_storage.content_sha256(b"content"))
+        self.assertEqual(Path(first.path).relative_to(self.root).parts[:3], ("company_1", first.content_hash[:2], first.content_hash[2:4]))
+        self.assertEqual(len([path for path in self.root.rglob("*") if path.is_file()]), 1)
+
+        # Файлы разных компаний и разного содержимого хранятся отдельно
+        self.assertNotEqual(document_storage.store_content(b"content", company_id=2).path, first.path)
+        self.assertIn(document_storage.COMMON_SHARD, document_storage.store_content(b"content").path)
+        self.assertNotEqual(document_storage.store_content(b"other", company_id=1).path, first.path)
+        self.assertEqual(document_storage.file_sha256(first.path), first.content_hash)
+
+    def test_normalize_docx(self):
+        def archive(date_time) -> bytes:
+            buffer = io.BytesIO()
+            with zipfile.ZipFile(buffer, "w") as file:
+                file.writestr(zipfile.ZipInfo("word/document.xml", date_time=date_time), "<w:document/>")
+            return buffer.getvalue()
+
+        first, second = archive((2025, 1, 1, 10, 0, 0)), archive((2025, 2, 2, 12, 30, 0))
+        self.assertNotEqual(first, second)
+        self.assertEqual(document_storage.normalize_docx(first), document_storage.normalize_docx(second))
+
+
+class ServeCommandTests(SimpleTestCase):
+
+    def test_default_workers(self):
+        with mock.patch.dict(os.environ, {"WEB_CONCURRENCY": ""}), mock.patch.object(serve, "available_cpus", return_value=4):
+            self.assertEqual(serve.default_workers(asgi=False), 9)
+            self.assertEqual(serve.default_workers(asgi=True), 4)
+        with mock.patch.dict(os.environ, {"WEB_CONCURRENCY": "3"}):
+            self.assertEqual(serve.default_workers(asgi=False), 3)
+        self.assertGreaterEqual(serve.available_cpus(), 1)
+
+    def test_gunicorn_required(self):
+        with mock.patch.dict(sys.modules, {"gunicorn": None, "gunicorn.app.base": None}):
+            with self.assertRaises(CommandError):
+                call_command("serve", stdout=io.StringIO())
@@ -59,6 +59,7 @@ MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'backend.middleware.SessionRefreshMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -89,6 +90,10 @@ REST_FRAMEWORK = {
     ],
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
     "EXCEPTION_HANDLER": "api.exceptions.custom_exception_handler",
+    "DEFAULT_RENDERER_CLASSES": [
+        'api.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
 }
 
 SPECTACULAR_SETTINGS = {
@@ -129,12 +134,47 @@ WSGI_APPLICATION = 'core.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# Профиль выбирается переменной окружения DB_ENGINE: `sqlite` (по умолчанию) или `postgresql`.
+
+DB_ENGINE = os.environ.get('DB_ENGINE', 'sqlite')
+
+if DB_ENGINE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            # `or`, а не значение по умолчанию `get()`: docker-compose и .env передают незаданные переменные пустыми
+            'NAME': os.environ.get('DB_NAME') or 'reportcreator',
+            'USER': os.environ.get('DB_USER') or 'reportcreator',
+            'PASSWORD': os.environ.get('DB_PASSWORD') or '',
+            'HOST': os.environ.get('DB_HOST') or 'localhost',
+            'PORT': os.environ.get('DB_PORT') or '5432',
+            # Постоянные соединения с проверкой перед использованием
+            'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE') or 60),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'connect_timeout': int(os.environ.get('DB_CONNECT_TIMEOUT') or 5),
+            },
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('DB_NAME') or BASE_DIR / 'db.sqlite3',
+            'OPTIONS': {
+                # Сколько секунд ждать снятия блокировки, прежде чем вернуть "database is locked"
+                'timeout': int(os.environ.get('DB_TIMEOUT') or 20),
+                # Пишущие транзакции сразу берут блокировку записи, а не пытаются повысить её посреди транзакции
+                'transaction_mode': 'IMMEDIATE',
+                # WAL: читатели не блокируют писателя; NORMAL безопасен в режиме WAL
+                'init_command': (
+                    'PRAGMA journal_mode=WAL;'
+                    'PRAGMA synchronous=NORMAL;'
+                    f"PRAGMA mmap_size={int(os.environ.get('DB_MMAP_SIZE') or 128 * 1024 * 1024)};"
+                ),
+            },
+        }
     }
-}
 
 
 # Password validation
@@ -193,9 +233,49 @@ TEMPLATES_FOLDER = MEDIA_ROOT / "templates"
 if not TEMPLATES_FOLDER.exists():
     TEMPLATES_FOLDER.mkdir()
 
+# Фоновая генерация документов (см. backend.scripts.document_queue)
+DOCUMENT_WORKERS = int(os.environ.get('DOCUMENT_WORKERS', 2))  # Потоков генерации в каждом процессе
+DOCUMENT_JOB_TIMEOUT = int(os.environ.get('DOCUMENT_JOB_TIMEOUT', 600))  # Через сколько секунд задача RUNNING считается брошенной упавшим воркером
+DOCUMENT_ASYNC_MIN_ROWS = int(os.environ.get('DOCUMENT_ASYNC_MIN_ROWS', 0))  # С какого числа строк таблицы генерировать в фоне (0 - только по `?async=true`)
+DOCUMENT_BATCH_PROCESSES = int(os.environ.get('DOCUMENT_BATCH_PROCESSES', 2))  # Процессов пакетной генерации в каждом воркере (0 или 1 - без пула)
+DOCUMENT_BATCH_MAX_ITEMS = int(os.environ.get('DOCUMENT_BATCH_MAX_ITEMS', 500))  # Максимум документов в одном пакетном запросе
+DOCUMENT_SENDFILE = os.environ.get('DOCUMENT_SENDFILE', '')  # Отдача файлов веб-сервером: '', 'x-sendfile' (Apache) или 'x-accel-redirect' (nginx)
+DOCUMENT_SENDFILE_PREFIX = os.environ.get('DOCUMENT_SENDFILE_PREFIX', '/protected-media/')  # internal location nginx для MEDIA_ROOT
+
+# Общий для всех процессов кэш (схемы полей, сессии `cached_db`/`cache`): таблица в базе, создаётся миграцией.
+# С REDIS_URL (например redis://redis:6379/0) используется Redis - нужен пакет `redis`.
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'django_cache',
+        }
+    }
+
+# Проверка бюджета запросов к БД у представлений (`SchemaAPIView.query_budget`): для тестов и отладки N+1
+QUERY_BUDGET_CHECKS = os.environ.get('QUERY_BUDGET_CHECKS', '').lower() in ('1', 'true', 'yes')
+
 SESSION_COOKIE_NAME = 'sessionid'  # Стандартное имя куки
 SESSION_COOKIE_AGE = 1209600  # Время жизни сессии (2 недели, по умолчанию)
 SESSION_COOKIE_SECURE = False  # True для HTTPS в production
 SESSION_COOKIE_SAMESITE = 'Lax'  # 'None' для кросс-доменных запросов (требует Secure=True)
 SESSION_COOKIE_HTTPONLY = True  # Защита от XSS
-SESSION_SAVE_EVERY_REQUEST = True  # Обновлять сессию при каждом запросе
\ No newline at end of file
+SESSION_SAVE_EVERY_REQUEST = False  # Срок сессии продлевает SessionRefreshMiddleware, а не запись на каждый запрос
+# Продлевать сессию, когда с прошлого продления прошла эта доля её времени жизни (0.1 - раз в ~1.4 дня)
+SESSION_REFRESH_FRACTION = float(os.environ.get('SESSION_REFRESH_FRACTION', 0.1))
+
+# Хранилище сессий: db (по умолчанию), cached_db, cache или signed_cookies
+SESSION_BACKENDS = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'cache': 'django.contrib.sessions.backends.cache',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}
+SESSION_ENGINE = SESSION_BACKENDS[os.environ.get('SESSION_BACKEND', 'db')]
\ No newline at end of file